@@ -0,0 +1,59 @@
+"""
+Benchmark: file context for a question about a large file.
+
+For a generated Python file of `--lines` lines, compares the prompt size of
+pasting the whole file with core.context_packer.pack_file under `--budget`
+tokens, and times the packing (chunking, ranking, packing). Runs with line
+windows when the Python grammar is not built.
+
+Usage:
+    python benchmarks/bench_context_packer.py [--lines 5000] [--budget 3000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import context_packer, parser  # noqa: E402
+from core.tokenizer import get_token_counter  # noqa: E402
+
+
+def generate(lines):
+    parts = []
+    for i in range(lines // 6):
+        parts.append(f"def handle_{i}(request, retries=3):\n"
+                     f"    \"\"\"Handle request kind {i}.\"\"\"\n"
+                     f"    payload = request.json().get('value_{i}')\n"
+                     f"    if payload is None:\n"
+                     f"        raise ValueError('missing value_{i}')\n"
+                     f"    return payload\n")
+    return "".join(parts)
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    args_parser.add_argument("--lines", type=int, default=5000)
+    args_parser.add_argument("--budget", type=int, default=3000)
+    args = args_parser.parse_args()
+
+    content = generate(args.lines)
+    counter = get_token_counter()
+    question = f"Why does handle_{args.lines // 12} raise ValueError for an empty payload?"
+    start = time.perf_counter()
+    whole = counter(content)
+    count_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    packed = context_packer.pack_file("bench.py", content, question, budget=args.budget, token_counter=counter)
+    pack_ms = (time.perf_counter() - start) * 1000
+    chunking = "symbols" if parser.grammar_available("python") else "line windows"
+    print(f"whole file   {whole:>8} tokens   (counted in {count_ms:.1f} ms)")
+    print(f"packed       {packed.tokens:>8} tokens   {len(packed.chunks)} of {packed.total_chunks} chunks "
+          f"({chunking}) in {pack_ms:.1f} ms")
+    target = f"handle_{args.lines // 12}"
+    print(f"{target} included: {any(chunk.label == target for chunk in packed.chunks)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: per-turn cost of SQLiteSessionMemory as the stored history grows.
+
+For each history size a database is bulk-filled with turns, then every
+measured turn does what the REPL does: select the context window and append
+the new turn. With the cumulative token index the cost should stay flat from
+a hundred to a million stored turns; `--baseline` also times the old
+approach (read every row and re-estimate its tokens) for comparison.
+
+Usage:
+    python benchmarks/bench_context_window.py [--sizes 100,10000,100000,1000000] [--turns 200] [--baseline]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.sqlite_memory import SQLiteSessionMemory  # noqa: E402
+
+USER = "How do I read a file line by line in Python?"
+RESPONSE = "Use `with open(path) as f:` and iterate: `for line in f: print(line.rstrip())`. " * 3
+
+
+def _fill(memory, size):
+    memory.add_turn(USER, RESPONSE)  # creates the session
+    tokens = memory._count_turn(USER, RESPONSE)
+    with sqlite3.connect(memory.db_path) as conn:
+        conn.executemany(
+            'INSERT INTO turns (session_id, user, response, tokens, cum_tokens, created) VALUES (?, ?, ?, ?, ?, 0)',
+            ((memory.session_id, USER, RESPONSE, tokens, tokens * (i + 2)) for i in range(size - 1))
+        )
+    memory.get_context_turns()  # settle the window at the end of the history
+
+
+def _baseline_turn(memory):
+    with sqlite3.connect(memory.db_path) as conn:
+        rows = conn.execute('SELECT user, response FROM turns WHERE session_id = ? ORDER BY id ASC',
+                            (memory.session_id,)).fetchall()
+    total = 0
+    for user, response in reversed(rows):
+        total += int(len(f"User: {user}\nModel: {response}\n".split()) * 1.3)
+        if total > memory.max_token_budget:
+            break
+
+
+def _time(fn, turns):
+    samples = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(name, size, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<10} {size:>9,} turns   mean {statistics.mean(samples):7.3f} ms   "
+          f"p50 {statistics.median(samples):7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="100,10000,100000,1000000")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            memory = SQLiteSessionMemory(os.path.join(tmpdir, "memory.db"))
+            _fill(memory, size)
+
+            def turn():
+                memory.get_context_turns()
+                memory.add_turn(USER, RESPONSE)
+            _report("indexed", size, _time(turn, args.turns))
+            if args.baseline:
+                _report("full scan", size, _time(lambda: _baseline_turn(memory), min(args.turns, 20)))
+
+
+if __name__ == "__main__":
+    main()
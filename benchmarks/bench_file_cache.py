@@ -0,0 +1,78 @@
+"""
+Benchmark: reading the same file again with /read.
+
+Generates a Python module of about `--kb` kilobytes and shows it with
+`core.repl.read_file_content` (into an off-screen console) several times:
+
+  cold   first read: decode, highlight and render the panel
+  warm   file unchanged: decoded text and rendered segments from the file cache
+  edited file touched: the stamp check misses and the file is rendered again
+
+Also prints the file cache's memory use for the entries.
+
+Usage:
+    python benchmarks/bench_file_cache.py [--kb 500] [--reads 5]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rich.console import Console  # noqa: E402
+
+from core import repl  # noqa: E402
+from core.file_cache import get_file_cache  # noqa: E402
+
+FUNCTION = '''def handler_{i}(request, retries={i}):
+    """Handle request {i}, retrying on failure."""
+    for attempt in range(retries):
+        response = request.send(timeout=attempt * 2)
+        if response.ok:
+            return response.json()
+    raise RuntimeError("request {i} failed after %d attempts" % retries)
+
+
+'''
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    args_parser.add_argument("--kb", type=int, default=500)
+    args_parser.add_argument("--reads", type=int, default=5)
+    args = args_parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "module.py")
+        with open(path, "w") as f:
+            i = 0
+            while f.tell() < args.kb * 1000:
+                f.write(FUNCTION.format(i=i))
+                i += 1
+        print(f"{path}: {os.path.getsize(path) / 1000:.0f} KB, {i} functions")
+        repl.console = Console(file=io.StringIO(), width=120, force_terminal=True)
+
+        def read():
+            repl.console.file = io.StringIO()
+            repl.read_file_content(path)
+
+        print(f"cold    {timed(read):8.1f} ms")
+        warm = [timed(read) for _ in range(args.reads)]
+        print(f"warm    {sum(warm) / len(warm):8.1f} ms   (mean of {args.reads})")
+        os.utime(path)
+        print(f"edited  {timed(read):8.1f} ms")
+        stats = get_file_cache().stats()
+        print(f"cache   {stats.entries} entries, {stats.bytes / 2**20:.1f} MiB, "
+              f"{stats.hits} hits / {stats.misses} misses, {stats.invalidations} invalidated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: showing pages of a large log file.
+
+Compared, on a generated log of `--mb` megabytes:
+
+  read_text   the previous /read: decode the whole file, then slice lines
+  FileView    core.file_viewer: mmap, sparse block index, decode one window
+
+Reports the time to the first page, to a page in the middle and at the end
+(the first far request extends the index; later pages near it are cheap),
+and peak Python heap use (tracemalloc; mapped file pages are page cache).
+
+Usage:
+    python benchmarks/bench_file_viewer.py [--mb 200] [--path /tmp/codez_bench.log]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import file_viewer  # noqa: E402
+
+LINE = "2026-01-01T00:00:00Z INFO worker-%d request %d handled in 12ms path=/api/v1/items\n"
+
+
+def generate(path, mb):
+    if os.path.exists(path) and os.path.getsize(path) >= mb * 1_000_000:
+        return
+    with open(path, "w") as f:
+        i = 0
+        while f.tell() < mb * 1_000_000:
+            f.write("".join(LINE % (n % 8, n) for n in range(i, i + 10000)))
+            i += 10000
+
+
+def timed(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    args_parser.add_argument("--mb", type=int, default=200)
+    args_parser.add_argument("--path", default="/tmp/codez_bench.log")
+    args = args_parser.parse_args()
+    generate(args.path, args.mb)
+    print(f"{args.path}: {os.path.getsize(args.path) / 1e6:.0f} MB")
+
+    def read_text(start):
+        with open(args.path, encoding="utf-8") as f:
+            return f.read().split("\n")[start - 1:start + file_viewer.PAGE_LINES - 1]
+
+    lines, elapsed, peak = timed(lambda: len(read_text(1)))
+    print(f"read_text   first page  {elapsed:8.1f} ms   peak heap {peak:8.1f} MB")
+
+    view = file_viewer.FileView(args.path)
+    page = file_viewer.PAGE_LINES
+    middle = os.path.getsize(args.path) // len(LINE % (0, 0)) // 2
+
+    def show(label, start):
+        window, elapsed, peak = timed(lambda: view.window(start, start + page - 1))
+        shown = f"lines {window.start_line}-{window.end_line}" if window else "past the end"
+        print(f"FileView    {label:<11} {elapsed:8.1f} ms   peak heap {peak:8.1f} MB   {shown}")
+
+    show("first page", 1)
+    show("middle", middle)
+    show("next page", middle + page)
+    # Past the end: indexes the rest of the file, after which the line count is known
+    show("index all", 10 ** 12)
+    show("last page", view.line_count - page + 1)
+    view.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: `/history search` latency over a large turn store.
+
+A database is filled with `--turns` turns spread over sessions of 200 turns,
+drawn from a small vocabulary so common and rare words both occur, then
+the same queries are run against:
+
+  fts5    SQLiteSessionMemory.search: the FTS5 index, BM25-ranked
+  like    a scan with `LIKE '%word%'` on both columns, the alternative
+          without an index (unranked)
+
+Usage:
+    python benchmarks/bench_history_search.py [--turns 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.sqlite_memory import SQLiteSessionMemory  # noqa: E402
+
+WORDS = ("parser cache token window session socket thread async import module class function error "
+         "traceback deploy config yaml json toml sqlite index query table column migration test fixture "
+         "mock patch retry timeout request response header stream buffer encoding unicode path file").split()
+QUERIES = ["parser", "sqlite migration", "unicode encoding error", "websocket"]
+SESSION_TURNS = 200
+
+
+def fill(memory, turns, rng):
+    with memory.batch():
+        for i in range(turns):
+            if i % SESSION_TURNS == 0:
+                memory.new_session()
+            user = " ".join(rng.choices(WORDS, k=12))
+            response = " ".join(rng.choices(WORDS, k=60))
+            if i % 5000 == 0:
+                response += " websocket"
+            memory.add_turn(user, response)
+
+
+def like_search(memory, text, limit=20):
+    clauses, params = [], []
+    for word in text.split():
+        clauses.append("(user LIKE ? OR response LIKE ?)")
+        params += [f"%{word}%"] * 2
+    sql = f"SELECT id FROM turns WHERE {' AND '.join(clauses)} LIMIT ?"
+    return memory._conn.execute(sql, params + [limit]).fetchall()
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        memory = SQLiteSessionMemory(os.path.join(tmpdir, "m.db"), token_estimator=lambda s: len(s.split()))
+        start = time.perf_counter()
+        fill(memory, args.turns, random.Random(1))
+        print(f"{args.turns:,} turns written in {time.perf_counter() - start:.1f} s (index maintained by triggers)")
+        for query in QUERIES:
+            hits = len(memory.search(query))
+            fts = _time(lambda: memory.search(query), args.repeat)
+            like = _time(lambda: like_search(memory, query), args.repeat)
+            print(f"{query!r:<28} {hits:>3} hits   fts5 {fts:8.2f} ms   like {like:8.2f} ms")
+        memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: re-parsing a large file after a small edit.
+
+Compared, on a generated Python file of `--lines` lines and `--edits`
+single-method edits spread through it:
+
+  full         core.parser.extract_symbols on the whole new file
+  incremental  core.parser.ParseCache.parse: the edit is applied to the
+               previous tree, tree-sitter re-parses what it touched, and only
+               that region is queried again for symbols
+
+Also checks that both produce the same symbols.
+Needs the Python grammar (see build_grammars.sh).
+
+Usage:
+    python benchmarks/bench_incremental_parse.py [--lines 20000] [--edits 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import parser  # noqa: E402
+
+
+def generate(lines):
+    parts = []
+    for i in range(lines // 5):
+        if i % 20 == 0:
+            parts.append(f"class Handlers{i}:\n")
+        parts.append(f"    def handle_{i}(self, request):\n"
+                     f"        # Handle request {i}\n"
+                     f"        value = request.get('value_{i}')\n"
+                     f"        return value\n\n")
+    return "".join(parts).encode()
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    args_parser.add_argument("--lines", type=int, default=20000)
+    args_parser.add_argument("--edits", type=int, default=50)
+    args = args_parser.parse_args()
+    if not parser.grammar_available("python"):
+        sys.exit("No grammar built for python: run build_grammars.sh first")
+
+    source = generate(args.lines)
+    functions = args.lines // 5
+    versions = []
+    for n in range(args.edits):
+        i = (n * 7919) % functions
+        source = source.replace(f"request.get('value_{i}')".encode(), f"request.get('value_{i}', {n})".encode())
+        versions.append(source)
+
+    parser.warm_up(["python"])
+    start = time.perf_counter()
+    full = [parser.extract_symbols(version, "python") for version in versions]
+    full_ms = (time.perf_counter() - start) * 1000 / args.edits
+
+    cache = parser.ParseCache()
+    cache.parse("bench.py", generate(args.lines))
+    start = time.perf_counter()
+    results = [cache.parse("bench.py", version) for version in versions]
+    incremental_ms = (time.perf_counter() - start) * 1000 / args.edits
+
+    assert [result.symbols for result in results] == full
+    changed = sum(len(result.changes.changed) for result in results)
+    print(f"{args.lines} lines, {len(full[-1])} symbols, {args.edits} edits ({changed} changed symbols reported)")
+    print(f"full         {full_ms:8.2f} ms/edit")
+    print(f"incremental  {incremental_ms:8.2f} ms/edit   ({full_ms / incremental_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: per-turn overhead of the subprocess backend vs the pooled HTTP backend.
+
+Both backends talk to stand-ins that answer instantly, so the numbers are pure
+transport overhead (process spawn + argv marshalling vs one keep-alive request).
+The fake `ollama` executable is a small Python script, which makes the
+subprocess figure a lower bound: the real CLI also has to dial the server.
+
+Usage:
+    python benchmarks/bench_ollama_backend.py [--turns 50] [--prompt-kb 4]
+"""
+import argparse
+import os
+import statistics
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import model, ollama_client  # noqa: E402
+from tests.fake_ollama import FakeOllamaServer  # noqa: E402
+
+FAKE_CLI = f"""#!{sys.executable}
+import sys
+print("echo: " + sys.argv[-1][:16])
+"""
+
+
+def _time_turns(turns, prompt):
+    samples = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        model.query_ollama(prompt, "test-model")
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<12} mean {statistics.mean(samples):8.2f} ms   p50 {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--prompt-kb", type=int, default=4)
+    args = parser.parse_args()
+    prompt = "x" * (args.prompt_kb * 1024)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cli = os.path.join(tmpdir, "ollama")
+        with open(cli, "w") as f:
+            f.write(FAKE_CLI)
+        os.chmod(cli, os.stat(cli).st_mode | stat.S_IEXEC)
+        os.environ["PATH"] = tmpdir + os.pathsep + os.environ.get("PATH", "")
+        os.environ[model.BACKEND_ENV] = "subprocess"
+        subprocess_samples = _time_turns(args.turns, prompt)
+
+    with FakeOllamaServer(responder=lambda p: "echo: " + p[:16]) as server:
+        os.environ[model.BACKEND_ENV] = "http"
+        ollama_client.reset_client(ollama_client.OllamaClient(host=server.url))
+        http_samples = _time_turns(args.turns, prompt)
+        ollama_client.reset_client()
+
+    print(f"{args.turns} turns, {args.prompt_kb} KB prompt")
+    _report("subprocess", subprocess_samples)
+    _report("http", http_samples)
+    print(f"speedup      {statistics.median(subprocess_samples) / statistics.median(http_samples):.1f}x (p50)")
+
+
+if __name__ == "__main__":
+    main()
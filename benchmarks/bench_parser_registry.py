@@ -0,0 +1,66 @@
+"""
+Benchmark: per-call overhead of parsing many small snippets.
+
+Compared, for `--snippets` small functions:
+
+  per call    the previous behaviour: a new Language (dlopen + symbol lookup)
+              and a new Parser for every call, after an os.path.exists probe
+  registry    core.parser.get_parser: grammar loaded once, one parser per thread
+
+The parse itself is the same in both; the difference is pure setup cost.
+Needs a built grammar for `--language` (see build_grammars.sh).
+
+Usage:
+    python benchmarks/bench_parser_registry.py [--snippets 5000] [--language python]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tree_sitter import Language, Parser  # noqa: E402
+
+from core import parser  # noqa: E402
+
+SNIPPETS = {
+    "python": "def handler_{i}(request):\n    return request.json()['value_{i}']\n",
+    "javascript": "function handler_{i}(request) {{\n  return request.body.value_{i};\n}}\n",
+    "go": "package main\nfunc handler_{i}(r int) int {{\n\treturn r + {i}\n}}\n",
+}
+
+
+def per_call(language, source):
+    so_path, ts_lang = parser.LANGUAGES[language]
+    if not os.path.exists(so_path):
+        raise FileNotFoundError(so_path)
+    p = Parser()
+    p.set_language(Language(so_path, ts_lang))
+    return p.parse(source)
+
+
+def registry(language, source):
+    return parser.get_parser(language).parse(source)
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    args_parser.add_argument("--snippets", type=int, default=5000)
+    args_parser.add_argument("--language", default="python", choices=sorted(SNIPPETS))
+    args = args_parser.parse_args()
+    if not parser.grammar_available(args.language):
+        sys.exit(f"No grammar built for {args.language}: run build_grammars.sh first")
+
+    sources = [SNIPPETS[args.language].format(i=i).encode() for i in range(args.snippets)]
+    for name, fn in (("per call", per_call), ("registry", registry)):
+        start = time.perf_counter()
+        for source in sources:
+            fn(args.language, source)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<9} {args.snippets:>6} snippets   {elapsed * 1000:8.1f} ms   "
+              f"{elapsed / args.snippets * 1e6:7.1f} us/snippet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: SQLiteSessionMemory write and read throughput under concurrency.
+
+A writer thread appends turns while a reader thread, with its own memory
+object on the same file, keeps selecting the context window. Compared:
+
+  per-op connect   the previous behaviour: a new connection per operation,
+                   rollback journal, one synchronous commit per turn
+  wal, batch=1     persistent connection in WAL mode, commit every turn
+  wal, batch=N     the same with group commit (`--batch`, default 32)
+
+Usage:
+    python benchmarks/bench_sqlite_memory.py [--seconds 3] [--batch 32]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.sqlite_memory import SQLiteSessionMemory  # noqa: E402
+
+USER = "How do I read a file line by line in Python?"
+RESPONSE = "Use `with open(path) as f:` and iterate over `f`. " * 3
+
+
+class PerOpConnectMemory:
+    """The previous access pattern: connect, run one statement, commit, close."""
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('PRAGMA journal_mode=DELETE')
+            conn.execute('CREATE TABLE IF NOT EXISTS session (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'user TEXT NOT NULL, response TEXT NOT NULL)')
+
+    def add_turn(self, user, response):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('INSERT INTO session (user, response) VALUES (?, ?)', (user, response))
+
+    def get_context_turns(self):
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            return conn.execute('SELECT user, response FROM session ORDER BY id DESC LIMIT 20').fetchall()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _run(make_memory, seconds):
+    writer = make_memory()
+    writer.add_turn(USER, RESPONSE)
+    writer.flush()
+    reader = make_memory()  # resumes the writer's session
+    stop = threading.Event()
+    counts = {"writes": 0, "reads": 0}
+
+    def write():
+        while not stop.is_set():
+            writer.add_turn(USER, RESPONSE)
+            counts["writes"] += 1
+
+    def read():
+        while not stop.is_set():
+            reader.get_context_turns()
+            counts["reads"] += 1
+
+    threads = [threading.Thread(target=write), threading.Thread(target=read)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    writer.close()
+    reader.close()
+    return counts["writes"] / seconds, counts["reads"] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+
+    modes = [
+        ("per-op connect", lambda path: PerOpConnectMemory(path)),
+        ("wal, batch=1", lambda path: SQLiteSessionMemory(path)),
+        (f"wal, batch={args.batch}", lambda path: SQLiteSessionMemory(path, batch_size=args.batch)),
+    ]
+    for name, factory in modes:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "memory.db")
+            writes, reads = _run(lambda: factory(path), args.seconds)
+        print(f"{name:<16} {writes:9.0f} turns/s written   {reads:9.0f} context reads/s")
+
+
+if __name__ == "__main__":
+    main()
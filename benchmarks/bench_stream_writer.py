@@ -0,0 +1,88 @@
+"""
+Benchmark: streaming a long response to the terminal.
+
+Renders a generated markdown-ish response of `--kb` kilobytes into an
+off-screen terminal console (ANSI styling on) in three ways:
+
+  per-char    the previous stream_response: console.print and flush per character
+  frames      core.stream_utils.FrameWriter, all text at once (newline frames)
+  paced       stream_response at one character per `--delay` seconds (30 fps frames)
+
+Reports wall time, terminal writes (each a packet over SSH), and the
+writer's chars/sec and frames/sec.
+
+Usage:
+    python benchmarks/bench_stream_writer.py [--kb 100] [--delay 0.00005]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rich.console import Console  # noqa: E402
+
+from core.stream_utils import FrameWriter, stream_response  # noqa: E402
+
+PARAGRAPH = ("The cache is keyed by the file's path and checked against its size and mtime "
+             "before every read, so an edited file is never served stale. ")
+
+
+class CountingFile(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def terminal():
+    out = CountingFile()
+    return Console(file=out, force_terminal=True, width=100), out
+
+
+def per_char(text, console):
+    for char in text:
+        console.print(char, end="", soft_wrap=True, highlight=False)
+        console.file.flush()
+    console.print("")
+
+
+def report(label, elapsed, out, stats=None):
+    rates = f"   {stats.chars_per_second:12,.0f} chars/s {stats.frames_per_second:8.1f} frames/s" if stats else ""
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms {out.writes:9,} writes{rates}")
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    args_parser.add_argument("--kb", type=int, default=100)
+    args_parser.add_argument("--delay", type=float, default=0.00005)
+    args = args_parser.parse_args()
+    text = ""
+    while len(text) < args.kb * 1000:
+        text += PARAGRAPH * 3 + "\n\n"
+    print(f"{len(text) / 1000:.0f} KB response, {text.count(chr(10))} lines")
+
+    console, out = terminal()
+    start = time.perf_counter()
+    per_char(text, console)
+    report("per-char", time.perf_counter() - start, out)
+
+    console, out = terminal()
+    start = time.perf_counter()
+    with FrameWriter(console) as writer:
+        writer.write(text)
+    report("frames", time.perf_counter() - start, out, writer.stats())
+
+    console, out = terminal()
+    start = time.perf_counter()
+    stats = stream_response(text, console, delay=args.delay)
+    report("paced", time.perf_counter() - start, out, stats)
+
+
+if __name__ == "__main__":
+    main()
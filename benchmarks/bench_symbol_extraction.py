@@ -0,0 +1,84 @@
+"""
+Benchmark: symbol extraction on a large generated source file.
+
+Compared:
+
+  recursive  the previous extract_functions: a recursive Python walk over
+             every node, returning text sliced from a str by byte offsets
+  query      core.parser.extract_symbols: one compiled query per language,
+             structured symbols (name, signature, docstring, ranges)
+
+Also reports the nesting depth at which the recursive walk hits Python's
+recursion limit; the query-based engine has no such limit.
+Needs the Python grammar (see build_grammars.sh).
+
+Usage:
+    python benchmarks/bench_symbol_extraction.py [--functions 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import parser  # noqa: E402
+
+
+def recursive_walk(code, language="python"):
+    tree = parser.get_parser(language).parse(bytes(code, "utf8"))
+    node_types = parser.FUNCTION_NODE_TYPES[language]
+    functions = []
+
+    def walk(node):
+        if node.type in node_types:
+            functions.append(code[node.start_byte:node.end_byte])
+        for child in node.children:
+            walk(child)
+
+    walk(tree.root_node)
+    return functions
+
+
+def generate(functions):
+    parts = []
+    for i in range(functions):
+        if i % 10 == 0:
+            parts.append(f"class Service{i}:\n    \"\"\"Service {i}.\"\"\"\n")
+        parts.append(f"    def handle_{i}(self, request, retries=3):\n"
+                     f"        \"\"\"Handle request {i}.\"\"\"\n"
+                     f"        return [r for r in request.items if r.id == {i}]\n\n")
+    return "".join(parts)
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    args_parser.add_argument("--functions", type=int, default=20000)
+    args = args_parser.parse_args()
+    if not parser.grammar_available("python"):
+        sys.exit("No grammar built for python: run build_grammars.sh first")
+
+    code = generate(args.functions)
+    source = code.encode()
+    parser.warm_up(["python"])
+    start = time.perf_counter()
+    found = len(recursive_walk(code))
+    print(f"recursive  {found:>6} functions   {(time.perf_counter() - start) * 1000:8.1f} ms")
+    start = time.perf_counter()
+    found = len(parser.extract_symbols(source, "python"))
+    print(f"query      {found:>6} symbols     {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    depth = 100
+    while depth < 100000:
+        nested = "x = " + "[" * depth + "]" * depth + "\n"
+        try:
+            recursive_walk(nested)
+        except RecursionError:
+            print(f"recursive walk fails at nesting depth {depth}; "
+                  f"query finds {len(parser.extract_symbols(nested.encode(), 'python'))} symbols there")
+            break
+        depth *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: per-turn write cost as a session grows.
+
+Compared:
+
+  rewrite   the previous behaviour: dump the whole turn list to JSON after
+            every turn, O(n) per turn
+  journal   TurnJournal: append one JSONL record per turn, compact into a
+            snapshot every `--compact-every` records
+
+Each session is grown to the given size, then the cost of the following
+`--turns` writes is measured. `--fsync-every 0` takes the disk out of the
+comparison. The journal's mean includes one compaction per `--compact-every`
+writes; that cost follows the snapshot size, which ContextManager bounds with
+`max_turns`.
+
+Usage:
+    python benchmarks/bench_turn_journal.py [--sizes 100,1000,10000,50000] [--turns 1000] [--fsync-every 1]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.journal import TurnJournal  # noqa: E402
+
+TURN = {"user": "How do I read a file line by line in Python?",
+        "response": "Use `with open(path) as f:` and iterate: `for line in f: print(line.rstrip())`. " * 3}
+
+
+class RewriteStore:
+    def __init__(self, path):
+        self.path = path
+        self.turns = []
+
+    def add(self, turn):
+        self.turns.append(turn)
+        with open(self.path, "w") as f:
+            json.dump(self.turns, f, indent=2)
+
+
+class JournalStore:
+    def __init__(self, path, fsync_every, compact_every):
+        self.journal = TurnJournal(path, fsync_every=fsync_every, compact_every=compact_every)
+        self.turns = self.journal.load()
+
+    def add(self, turn):
+        self.turns.append(turn)
+        self.journal.append(turn)
+        if self.journal.needs_compaction:
+            self.journal.compact(self.turns)
+
+
+def _measure(store, size, turns):
+    for _ in range(size):
+        store.turns.append(TURN)
+    samples = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        store.add(TURN)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(name, size, samples):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<8} {size:>7,} turns   mean {statistics.mean(samples):8.3f} ms   "
+          f"p50 {statistics.median(samples):8.3f} ms   p99 {p99:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="100,1000,10000,50000")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--fsync-every", type=int, default=1)
+    parser.add_argument("--compact-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "session.json")
+            _report("journal", size, _measure(JournalStore(path, args.fsync_every, args.compact_every), size, args.turns))
+            _report("rewrite", size, _measure(RewriteStore(path + ".old"), size, min(args.turns, 20)))
+
+
+if __name__ == "__main__":
+    main()
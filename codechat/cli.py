@@ -3,15 +3,31 @@ Interface layer: CLI, REPL, and event adapters.
 """
 
 import typer
-from core import repl
 
 app = typer.Typer()
 
 
 @app.command("chat")
-def chat():
+def chat(
+    startup_profile: bool = typer.Option(False, "--startup-profile", help="Print a per-phase startup timeline before the first prompt."),
+):
     """Interactive REPL to ask questions about code"""
-    repl.run()
+    # Imported per command: `codez --help` shouldn't load the REPL stack.
+    from core import repl
+    repl.run(startup_profile=startup_profile)
+
+@app.command("index")
+def index(
+    path: str = typer.Argument(".", help="Repository to index."),
+    workers: int = typer.Option(None, "--workers", "-j", help="Parser processes (default: one per CPU)."),
+):
+    """Build or refresh the symbol index of a repository"""
+    from core.symbol_index import SymbolIndex, print_index_stats
+    symbol_index = SymbolIndex(path)
+    try:
+        print_index_stats(symbol_index.update(workers=workers))
+    finally:
+        symbol_index.close()
 
 def main():
     app()
@@ -1,10 +1,30 @@
 # version_utils.py
-try:
-    import tomllib  # Python 3.11+
-except ImportError:
-    import tomli as tomllib  # Python < 3.11
+import os
+
 
 def get_version():
-    with open("pyproject.toml", "rb") as f:
-        data = tomllib.load(f)
-    return data["project"]["version"]
\ No newline at end of file
+    """
+    Return the package version. It is baked into codechat/_version.py at build
+    time, so nothing is parsed at runtime (and the current directory doesn't matter).
+    A source checkout that was never built reads it from pyproject.toml.
+    """
+    try:
+        from codechat._version import __version__
+        return __version__
+    except ImportError:
+        pass
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version("codez-cli")
+    except PackageNotFoundError:
+        pass
+    try:
+        import tomllib  # Python 3.11+
+    except ImportError:
+        import tomli as tomllib  # Python < 3.11
+    pyproject = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pyproject.toml")
+    try:
+        with open(pyproject, "rb") as f:
+            return tomllib.load(f)["project"]["version"]
+    except OSError:
+        return "unknown"
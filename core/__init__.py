@@ -1,2 +1,12 @@
-from core.llm_interactive import LLMInteractiveSession
-from core.sqlite_memory import SQLiteSessionMemory
\ No newline at end of file
+# Re-exports are resolved lazily so importing a single `core.*` module (e.g. for
+# `codez --help`) doesn't pull in the model client and its HTTP stack.
+_EXPORTS = {
+    "LLMInteractiveSession": "core.llm_interactive",
+    "SQLiteSessionMemory": "core.sqlite_memory",
+}
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
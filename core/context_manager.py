@@ -1,25 +1,29 @@
-import os
-import json
+from core.journal import DEFAULT_COMPACT_EVERY, TurnJournal
 
 class ContextManager:
-    def __init__(self, session_file=None, max_turns=20):
+    """
+    Keeps the last `max_turns` turns. With a `session_file`, turns are appended
+    to a crash-safe journal next to it (see core/journal.py) instead of
+    rewriting the whole file on every turn.
+    """
+    def __init__(self, session_file=None, max_turns=20, fsync_every=1, compact_every=DEFAULT_COMPACT_EVERY):
         self.max_turns = max_turns
         self.session = []
         self.session_file = session_file
-        if session_file and os.path.exists(session_file):
-            with open(session_file, "r") as f:
-                try:
-                    self.session = json.load(f)
-                except Exception:
-                    self.session = []
+        self.journal = None
+        if session_file:
+            self.journal = TurnJournal(session_file, fsync_every=fsync_every, compact_every=compact_every)
+            self.session = self.journal.load()[-max_turns:]
 
     def add_turn(self, user, response):
-        self.session.append({"user": user, "response": response})
+        turn = {"user": user, "response": response}
+        self.session.append(turn)
         if len(self.session) > self.max_turns:
             self.session = self.session[-self.max_turns:]
-        if self.session_file:
-            with open(self.session_file, "w") as f:
-                json.dump(self.session, f, indent=2)
+        if self.journal:
+            self.journal.append(turn)
+            if self.journal.needs_compaction:
+                self.journal.compact(self.session)
 
     def get_context(self):
         return self.session
@@ -36,5 +40,10 @@ class ContextManager:
 
     def clear(self):
         self.session = []
-        if self.session_file and os.path.exists(self.session_file):
-            os.remove(self.session_file)
+        if self.journal:
+            self.journal.clear()
+
+    def close(self):
+        """fsync anything not yet synced and close the journal."""
+        if self.journal:
+            self.journal.close()
@@ -0,0 +1,252 @@
+"""
+Context packing for questions about a file.
+
+A file that fits the token budget is sent whole. A larger one is split into
+chunks along its symbols (functions, methods, classes via `core/parser.py`;
+classes too large for one chunk are split into their members, and the code
+between symbols becomes chunks of its own), or into line windows when the
+language has no grammar. Chunks are ranked against the question by BM25 over
+identifier words, plus cosine similarity when an embedder is given, and the
+best ones are packed into the budget. They are emitted in file order, each
+under a `path:start-end` anchor, with the omitted line ranges marked.
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import List, NamedTuple, Optional, Sequence
+
+from core import parser as ts_parser
+
+READ_BUDGET_ENV = "CODEZ_READ_CONTEXT_TOKENS"
+DEFAULT_READ_BUDGET = 3000
+READ_EMBED_ENV = "CODEZ_READ_EMBEDDINGS"
+# Symbols longer than this are split into their members (or windows)
+MAX_CHUNK_LINES = 80
+WINDOW_LINES = 40
+# A relevant chunk that does not fit is cut to its first lines, if at least this many fit
+MIN_HEAD_LINES = 8
+# Weight of the embedding cosine against the normalised lexical score
+EMBED_WEIGHT = 0.5
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Room for the separators and an "[lines a-b omitted]" marker around each chunk
+_MARKER_TOKENS = 12
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z][a-z0-9]*|\d+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me of on or should so the this to "
+    "what when where which who why will with you your".split()
+)
+
+
+class FileChunk(NamedTuple):
+    start_line: int  # 1-based, inclusive
+    end_line: int
+    label: str       # enclosing symbol, "" for module-level code
+    text: str
+
+
+class PackedContext(NamedTuple):
+    text: str
+    chunks: List[FileChunk]  # the chunks included, in file order
+    total_chunks: int
+    tokens: int
+    complete: bool           # the whole file fitted and was sent as is
+
+
+def read_budget() -> int:
+    return int(os.environ.get(READ_BUDGET_ENV, DEFAULT_READ_BUDGET))
+
+
+def default_embedder():
+    """The local embedding model when CODEZ_READ_EMBEDDINGS=1, else None (lexical ranking only)."""
+    if os.environ.get(READ_EMBED_ENV) != "1":
+        return None
+    from core.embeddings import OllamaEmbedder
+    return OllamaEmbedder()
+
+
+def terms(text: str) -> List[str]:
+    """Lower-case words of `text`, with identifiers split at underscores and camelCase."""
+    words = (word.lower() for word in _WORD.findall(text))
+    return [word for word in words if len(word) > 1 and word not in _STOP_WORDS]
+
+
+def _windows(lines: List[str], start: int, end: int, label: str) -> List[FileChunk]:
+    chunks = []
+    for first in range(start, end + 1, WINDOW_LINES):
+        last = min(first + WINDOW_LINES - 1, end)
+        text = "\n".join(lines[first - 1:last])
+        if text.strip():
+            chunks.append(FileChunk(first, last, label, text))
+    return chunks
+
+
+def _span(lines: List[str], start: int, end: int, label: str) -> List[FileChunk]:
+    if end - start + 1 <= MAX_CHUNK_LINES:
+        text = "\n".join(lines[start - 1:end])
+        return [FileChunk(start, end, label, text)] if text.strip() else []
+    return _windows(lines, start, end, label)
+
+
+def _segments(lines: List[str], start: int, end: int, symbols: Sequence, label: str) -> List[FileChunk]:
+    """Chunks covering lines start..end, cut at the boundaries of `symbols` (sorted, all inside the range)."""
+    chunks, line, i = [], start, 0
+    while i < len(symbols):
+        symbol = symbols[i]
+        # Symbols nested in this one follow it directly in start order
+        j = i + 1
+        while j < len(symbols) and symbols[j].start_byte < symbol.end_byte:
+            j += 1
+        first = max(symbol.start_line, line)
+        if first > symbol.end_line:
+            i = j
+            continue
+        if first > line:
+            chunks.extend(_span(lines, line, first - 1, label))
+        if symbol.end_line - first + 1 <= MAX_CHUNK_LINES or j == i + 1:
+            chunks.extend(_span(lines, first, symbol.end_line, symbol.name))
+        else:
+            chunks.extend(_segments(lines, first, symbol.end_line, symbols[i + 1:j], symbol.name))
+        line = symbol.end_line + 1
+        i = j
+    if line <= end:
+        chunks.extend(_span(lines, line, end, label))
+    return chunks
+
+
+def file_chunks(path: str, content: str, parse_cache=None) -> List[FileChunk]:
+    """
+    Symbol-aligned chunks covering `content`, or line windows when its
+    language has no grammar. `parse_cache` (a `parser.ParseCache`) reuses a
+    tree already parsed for this file.
+    """
+    lines = content.split("\n")
+    language = ts_parser.language_for_path(path)
+    symbols = None
+    if language and ts_parser.grammar_available(language):
+        source = content.encode("utf-8")
+        try:
+            if parse_cache is not None:
+                symbols = parse_cache.parse(path, source, language).symbols
+            else:
+                symbols = ts_parser.extract_symbols(source, language)
+        except (ValueError, FileNotFoundError, OSError):
+            symbols = None
+    if not symbols:
+        return _windows(lines, 1, len(lines), "")
+    return _segments(lines, 1, len(lines), symbols, "")
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def rank_chunks(chunks: Sequence[FileChunk], question: str, embedder=None) -> List[float]:
+    """
+    A relevance score per chunk: BM25 over identifier words, boosted when the
+    question names the chunk's symbol, plus cosine similarity with `embedder`.
+    """
+    query = set(terms(question))
+    counts = [Counter(terms(chunk.text)) for chunk in chunks]
+    lengths = [sum(count.values()) for count in counts]
+    average = sum(lengths) / len(lengths) if lengths else 0.0
+    frequency = Counter(term for count in counts for term in query if term in count)
+    named = {word.lower() for word in re.findall(r"\w+", question)}
+    scores = []
+    for chunk, count, length in zip(chunks, counts, lengths):
+        score = 0.0
+        for term in query:
+            tf = count.get(term, 0)
+            if tf:
+                idf = math.log(1 + (len(chunks) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+                score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (average or 1)))
+        if chunk.label and chunk.label.lower() in named:
+            score *= 2
+            score += 1.0
+        scores.append(score)
+    if embedder is not None and chunks:
+        top = max(scores) or 1.0
+        try:
+            vectors = embedder.embed_many([question] + [chunk.text for chunk in chunks])
+        except Exception:
+            return scores  # embedding model unavailable: lexical scores alone
+        scores = [score / top + EMBED_WEIGHT * max(0.0, _cosine(vectors[0], vector))
+                  for score, vector in zip(scores, vectors[1:])]
+    return scores
+
+
+def _head(chunk: FileChunk, room: int, token_counter) -> Optional[FileChunk]:
+    """The longest run of `chunk`'s first lines that fits in `room` tokens, or None if too few fit to be useful."""
+    lines = chunk.text.split("\n")
+    lo, hi = 0, len(lines) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if token_counter("\n".join(lines[:mid])) <= room:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo < MIN_HEAD_LINES:
+        return None
+    return FileChunk(chunk.start_line, chunk.start_line + lo - 1, chunk.label, "\n".join(lines[:lo]))
+
+
+def _anchor(path: str, chunk: FileChunk) -> str:
+    label = f" ({chunk.label})" if chunk.label else ""
+    return f"--- {path}:{chunk.start_line}-{chunk.end_line}{label} ---"
+
+
+def pack_file(path: str, content: str, question: str, budget: Optional[int] = None, token_counter=None,
+              embedder=None, parse_cache=None, first_line: int = 1) -> PackedContext:
+    """
+    The parts of `content` most relevant to `question` that fit in `budget`
+    tokens (counted with `token_counter`), rendered with file/line anchors.
+    `first_line` is the file line `content` starts at, when it is a window.
+    """
+    if token_counter is None:
+        from core.tokenizer import get_token_counter
+        token_counter = get_token_counter()
+    budget = read_budget() if budget is None else budget
+    tokens = token_counter(content)
+    if tokens <= budget:
+        return PackedContext(content, [], 0, tokens, True)
+
+    lines = content.split("\n")
+    chunks = file_chunks(path, content, parse_cache)
+    if first_line > 1:
+        shift = first_line - 1
+        chunks = [c._replace(start_line=c.start_line + shift, end_line=c.end_line + shift) for c in chunks]
+        extent = f"lines {first_line}-{first_line + len(lines) - 1}"
+    else:
+        extent = f"{len(lines)} lines"
+    scores = rank_chunks(chunks, question, embedder)
+    header = f"Excerpts from {path} ({extent}, the parts most relevant to the question):"
+    used = token_counter(header) + _MARKER_TOKENS
+    chosen, trimmed = [], False
+    # Best first; unscored chunks keep file order, so the top of the file fills leftover room
+    for index in sorted(range(len(chunks)), key=lambda i: (-scores[i], i)):
+        chunk = chunks[index]
+        overhead = token_counter(_anchor(path, chunk)) + _MARKER_TOKENS
+        cost = token_counter(chunk.text) + overhead
+        if used + cost > budget and scores[index] > 0 and not trimmed:
+            # The best chunk too large for the room left: keep as many of its first lines as fit
+            trimmed = True
+            chunk = _head(chunk, budget - used - overhead, token_counter)
+            cost = token_counter(chunk.text) + overhead if chunk else cost
+        if chunk and used + cost <= budget:
+            chosen.append(chunk)
+            used += cost
+    chosen.sort()
+
+    parts, line = [header], first_line
+    for chunk in chosen + [FileChunk(first_line + len(lines), 0, "", "")]:
+        if any(text.strip() for text in lines[line - first_line:chunk.start_line - first_line]):
+            parts.append(f"[lines {line}-{chunk.start_line - 1} omitted]")
+        if chunk.text:
+            parts.append(f"{_anchor(path, chunk)}\n{chunk.text}")
+        line = chunk.end_line + 1
+    text = "\n".join(parts)
+    return PackedContext(text, chosen, len(chunks), token_counter(text), False)
@@ -0,0 +1,63 @@
+"""
+Text embedders for the semantic answer cache and the vector index.
+
+`OllamaEmbedder` uses the local server's `/api/embed` endpoint.
+`HashingEmbedder` is a deterministic, dependency-free stand-in (hashed bag of
+words and word pairs) for tests and for running without an embedding model.
+"""
+import hashlib
+import math
+import os
+import re
+from typing import List
+
+EMBED_MODEL_ENV = "CODEZ_EMBED_MODEL"
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+class OllamaEmbedder:
+    def __init__(self, model: str = None, client=None):
+        self.model = model or os.environ.get(EMBED_MODEL_ENV, DEFAULT_EMBED_MODEL)
+        self.name = f"ollama:{self.model}"
+        self._client = client
+
+    def embed(self, text: str) -> List[float]:
+        client = self._client
+        if client is None:
+            from core.ollama_client import get_client
+            client = get_client()
+        return client.embed(self.model, [text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """One request for a batch of texts."""
+        client = self._client
+        if client is None:
+            from core.ollama_client import get_client
+            client = get_client()
+        return client.embed(self.model, texts)
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def _bucket(self, feature: str):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, text: str) -> List[float]:
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = [0.0] * self.dim
+        for feature in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(text) for text in texts]
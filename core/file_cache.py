@@ -0,0 +1,191 @@
+"""
+Shared in-memory cache of file contents.
+
+Entries are keyed by (path, kind): a file can have its decoded text cached
+next to its syntax-highlighted rendering, for instance. Every entry records
+the file's size, mtime, inode and device when it was read, and a lookup
+compares them with a fresh `os.stat`, so an edited, replaced or deleted
+file is a miss rather than stale content. Entries stored with a content
+hash can also be checked against the file's bytes: on request, and always
+while the file's mtime is too close to the time it was cached for the
+stamp alone to prove it unchanged.
+
+The cache is bounded by the approximate memory of its values and evicts the
+least recently used entries first. Set the budget with
+`CODEZ_FILE_CACHE_MB` (default 64).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+FILE_CACHE_ENV = "CODEZ_FILE_CACHE_MB"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Filesystems with coarse timestamps can change a file twice within one mtime tick
+RACY_SECONDS = 2.0
+
+
+class FileStamp(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+    device: int
+
+
+class FileCacheStats(NamedTuple):
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int  # lookups that found the file changed since it was cached
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    stamp: FileStamp
+    digest: Optional[str]
+    stored: float
+
+
+def file_stamp(path: str) -> Optional[FileStamp]:
+    """The stamp of `path` as it is now, or None if it cannot be stat'ed."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return FileStamp(stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_dev)
+
+
+def file_digest(path: str) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class FileCache:
+    """A byte-bounded LRU of values derived from files, invalidated when the file changes."""
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, clock: Callable[[], float] = time.time):
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, path: str, kind: str, verify: bool = False) -> Any:
+        """
+        The cached `kind` value for `path` if the file is unchanged, else None.
+        `verify` also compares the file's content hash (when the entry has one).
+        """
+        key = (path, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return self._miss()
+        stamp = file_stamp(path)
+        fresh = stamp == entry.stamp
+        if fresh and entry.digest is not None:
+            racy = entry.stamp.mtime_ns / 1e9 >= entry.stored - RACY_SECONDS
+            if verify or racy:
+                fresh = file_digest(path) == entry.digest
+                if fresh and racy and self._clock() - entry.stamp.mtime_ns / 1e9 > RACY_SECONDS:
+                    # Verified once the mtime is safely in the past: the stamp suffices from now on
+                    with self._lock:
+                        if self._entries.get(key) is entry:
+                            self._entries[key] = entry._replace(stored=self._clock())
+        with self._lock:
+            if not fresh:
+                if self._entries.get(key) is entry:
+                    self._drop(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, path: str, kind: str, value: Any, size: int, stamp: Optional[FileStamp],
+            digest: Optional[str] = None):
+        """
+        Cache `value` (about `size` bytes) derived from `path` as it was at
+        `stamp`, taken before the file was read. Values larger than the whole
+        budget, or without a stamp, are not kept.
+        """
+        if stamp is None or size > self.max_bytes:
+            return
+        key = (path, kind)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, size, stamp, digest, self._clock())
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+    def invalidate(self, path: str) -> int:
+        """Drop every entry of `path`; returns how many there were."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == path]
+            for key in keys:
+                self._drop(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> FileCacheStats:
+        with self._lock:
+            return FileCacheStats(len(self._entries), self._bytes, self.max_bytes, self.hits, self.misses,
+                                  self.evictions, self.invalidations)
+
+
+_cache: Optional[FileCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_file_cache() -> FileCache:
+    """Return the process-wide file cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                megabytes = float(os.environ.get(FILE_CACHE_ENV, DEFAULT_MAX_BYTES / (1024 * 1024)))
+                _cache = FileCache(int(megabytes * 1024 * 1024))
+    return _cache
+
+
+def set_file_cache(cache: Optional[FileCache]):
+    """Replace the shared cache (used by tests)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,242 @@
+"""
+Paged access to files of any size for `/read`.
+
+A `FileView` memory-maps the file instead of reading it, so opening costs
+the same for 2 KB and 200 MB. Line positions come from a sparse index: the
+number of newlines in each `BLOCK_BYTES` block, counted only as far into
+the file as a request reaches, with the lines inside a block located on
+demand. Only the requested window of lines is decoded, capped at
+`MAX_WINDOW_BYTES`, and the pages around it are prefetched with madvise.
+
+The encoding is sniffed from a byte-order mark or by decoding the first
+`SNIFF_BYTES` (UTF-8, else cp1252, else Latin-1), and files that look binary
+are reported instead of shown.
+"""
+import codecs
+import hashlib
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+BLOCK_BYTES = 256 * 1024
+SNIFF_BYTES = 64 * 1024
+# Lines per page when a file is shown a window at a time
+PAGE_LINES = 200
+# Files up to this size are shown (and attached) whole
+WHOLE_FILE_BYTES = 1024 * 1024
+# Upper bound on the bytes decoded for one window (a single minified line can be huge)
+MAX_WINDOW_BYTES = 512 * 1024
+MAX_OPEN_VIEWS = 8
+
+# Longest marks first: the UTF-32 LE mark starts with the UTF-16 LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+# Control bytes that do occur in text files
+_TEXT_CONTROLS = set(b"\t\n\r\f\b\x1b")
+_RANGE = re.compile(r"^(.*?):(\d+)(?:-(\d+))?$")
+
+
+class Window(NamedTuple):
+    text: str
+    start_line: int
+    end_line: int      # last line included
+    at_eof: bool       # no lines after end_line
+    truncated: bool    # cut at MAX_WINDOW_BYTES
+
+
+def sniff_encoding(sample: bytes) -> Tuple[str, int]:
+    """(codec, length of its byte-order mark) for a file starting with `sample`."""
+    for bom, codec in _BOMS:
+        if sample.startswith(bom):
+            return codec, len(bom)
+    try:
+        # Incremental, so a character cut at the end of the sample is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8", 0
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode("cp1252")
+        return "cp1252", 0
+    except UnicodeDecodeError:
+        return "latin-1", 0
+
+
+def looks_binary(sample: bytes) -> bool:
+    """NUL bytes, or more than 30% control characters, in a sample without a UTF-16/32 mark."""
+    if not sample or any(sample.startswith(bom) for bom, codec in _BOMS if codec != "utf-8"):
+        return False
+    if b"\0" in sample:
+        return True
+    controls = sum(1 for byte in sample if byte < 32 and byte not in _TEXT_CONTROLS)
+    return controls / len(sample) > 0.3
+
+
+def parse_read_target(arg: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """
+    Split `/read` arguments of the form `path`, `path:start` or
+    `path:start-end` (1-based, inclusive). A path that exists as written
+    wins over a range suffix.
+    """
+    match = _RANGE.match(arg)
+    if not match or not match.group(1) or os.path.exists(os.path.expanduser(arg)):
+        return arg, None, None
+    end = match.group(3)
+    return match.group(1), int(match.group(2)), int(end) if end is not None else None
+
+
+class FileView:
+    """A read-only, memory-mapped view of a text file, addressed by line."""
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        # Zero-length files cannot be mapped
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        sample = self._data[:SNIFF_BYTES]
+        self.binary = looks_binary(sample)
+        self.encoding, self._start = sniff_encoding(sample)
+        self._newline = "\n".encode(self.encoding)
+        self._unit = len(self._newline)
+        # _counts[i]: newlines before block i; grows as far as requests reach
+        self._counts = array("q", [0])
+        self.line_count: Optional[int] = None  # known once the index reaches the end of the file
+        self._lock = threading.Lock()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _count_block(self, block: int) -> int:
+        chunk = self._data[block * BLOCK_BYTES:(block + 1) * BLOCK_BYTES]
+        if self._unit == 1:
+            return chunk.count(b"\n")
+        # Multi-byte code units: count whole characters only (block edges are unit-aligned)
+        return chunk.decode(self.encoding, "replace").count("\n")
+
+    def _index_to(self, line: int) -> Optional[int]:
+        """Extend the index until it covers `line`; the block it starts in, or None past the end."""
+        blocks = (self.size + BLOCK_BYTES - 1) // BLOCK_BYTES
+        counts = self._counts
+        while counts[-1] < line - 1 and len(counts) <= blocks:
+            counts.append(counts[-1] + self._count_block(len(counts) - 1))
+        if len(counts) > blocks and self.line_count is None:
+            # A final line without a trailing newline still counts
+            last = self._data[self.size - self._unit:self.size] if self.size else b""
+            self.line_count = counts[-1] + (1 if self.size > self._start and last != self._newline else 0)
+        if counts[-1] < line - 1:
+            return None
+        # First block whose end has seen line - 1 newlines
+        lo, hi = 0, len(counts) - 2
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if counts[mid + 1] >= line - 1:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _find_newline(self, position: int) -> int:
+        """Offset of the next newline at or after `position`, or -1."""
+        while True:
+            found = self._data.find(self._newline, position)
+            if found < 0 or (found - self._start) % self._unit == 0:
+                return found
+            position = found + 1
+
+    def line_offset(self, line: int) -> Optional[int]:
+        """Byte offset at which 1-based `line` starts, or None past the end of the file."""
+        if line <= 1:
+            return self._start
+        with self._lock:
+            block = self._index_to(line)
+        if block is None:
+            return None
+        position = block * BLOCK_BYTES
+        for _ in range(line - 1 - self._counts[block]):
+            position = self._find_newline(position) + self._unit
+        # After a final newline there is no further line
+        return position if position < self.size else None
+
+    def window(self, start: int, end: int) -> Optional[Window]:
+        """Lines start..end (1-based, inclusive), or None if the file has fewer than `start` lines."""
+        start = max(start, 1)
+        offset = self.line_offset(start)
+        if offset is None or (offset >= self.size and start > 1):
+            return None
+        position, line = offset, start
+        while True:
+            found = self._find_newline(position)
+            position = self.size if found < 0 else found + self._unit
+            if line >= end or position >= self.size:
+                break
+            line += 1
+        truncated = position - offset > MAX_WINDOW_BYTES
+        stop = offset + MAX_WINDOW_BYTES - MAX_WINDOW_BYTES % self._unit if truncated else position
+        text = self._data[offset:stop].decode(self.encoding, "replace").replace("\r\n", "\n")
+        if text.endswith("\n") and not truncated:
+            text = text[:-1]
+        return Window(text, start, line, position >= self.size, truncated)
+
+    def text(self) -> str:
+        """The whole file decoded (for files small enough to show whole)."""
+        return self._data[self._start:].decode(self.encoding, "replace")
+
+    def digest(self) -> str:
+        """SHA-256 of the file's bytes, as `file_cache.file_digest` computes it."""
+        return hashlib.sha256(self._data).hexdigest()
+
+    def prefetch(self, start: int, end: int):
+        """Ask the kernel to read in the pages holding lines start..end ahead of use."""
+        offset = self.line_offset(max(start, 1))
+        if offset is None or not isinstance(self._data, mmap.mmap) or not hasattr(self._data, "madvise"):
+            return
+        stop = self.line_offset(end + 1)
+        stop = self.size if stop is None else stop
+        aligned = offset - offset % mmap.PAGESIZE
+        length = min(max(stop - aligned, 1), self.size - aligned, MAX_WINDOW_BYTES + mmap.PAGESIZE)
+        try:
+            self._data.madvise(mmap.MADV_WILLNEED, aligned, length)
+        except (OSError, ValueError):
+            pass  # advisory only
+
+
+_views: "OrderedDict[str, FileView]" = OrderedDict()
+_views_lock = threading.Lock()
+
+
+def open_view(path: str) -> FileView:
+    """
+    A `FileView` for `path`, reused (with its line index) while the file's
+    size and mtime are unchanged. The few most recent views stay open.
+    """
+    stat = os.stat(path)
+    with _views_lock:
+        view = _views.get(path)
+        if view is not None and (view.size, view.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            _views.move_to_end(path)
+            return view
+        if view is not None:
+            view.close()
+        view = _views[path] = FileView(path)
+        while len(_views) > MAX_OPEN_VIEWS:
+            _views.popitem(last=False)[1].close()
+        return view
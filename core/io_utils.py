@@ -1,14 +1,16 @@
 """
 Input/output utilities for CodeZ CLI REPL.
 """
+import os
+import sys
+import threading
 from rich.console import Console
-from rich.syntax import Syntax
 from rich.panel import Panel
-from rich.markdown import Markdown
 from rich.text import Text
 
 def print_code_snippet(snippet: str, language: str = ""):
     """Print code or text as a formatted snippet in the terminal using Rich."""
+    from rich.syntax import Syntax
     console = Console()
     if not language:
         language = "text"
@@ -20,6 +22,7 @@ def print_code_snippet(snippet: str, language: str = ""):
         console.print(Panel(snippet, title="Snippet"))
 
 def multiline_code_input(prompt_session=None):
+    from rich.markdown import Markdown
     instruction_text = Markdown("""\
 Enter your code snippet below.
 - Type ` ``` ` on a new line to **start** the block.
@@ -53,3 +56,69 @@ Enter your code snippet below.
         if in_block:
             lines.append(line)
     return "\n".join(lines)
+
+
+ESC = "\x1b"
+ESC_SEQUENCE_TIMEOUT = 0.04  # seconds to wait for the rest of an escape sequence
+
+class EscapeListener:
+    """
+    Context manager that watches the keyboard while a long operation runs and
+    sets `event` when ESC is pressed. The terminal is put in cbreak mode for
+    the duration, so keys are read without waiting for Enter and Ctrl+C still
+    raises KeyboardInterrupt. Does nothing when stdin is not a terminal.
+    """
+    def __init__(self, event: threading.Event, poll_interval: float = 0.05):
+        self.event = event
+        self.poll_interval = poll_interval
+        self._done = threading.Event()
+        self._thread = None
+        self._restore = None
+
+    def __enter__(self):
+        if not sys.stdin.isatty():
+            return self
+        if os.name == "nt":
+            target = self._watch_windows
+        else:
+            import termios
+            import tty
+            fd = sys.stdin.fileno()
+            saved = termios.tcgetattr(fd)
+            tty.setcbreak(fd)
+            self._restore = lambda: termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+            target = self._watch_posix
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._restore is not None:
+            self._restore()
+        return False
+
+    def _watch_posix(self, fd=None):
+        import select
+        fd = sys.stdin.fileno() if fd is None else fd
+        while not self._done.is_set():
+            ready, _, _ = select.select([fd], [], [], self.poll_interval)
+            if not ready or os.read(fd, 1) != ESC.encode():
+                continue
+            # Arrow keys, Home/End and Alt chords also start with ESC, but their
+            # remaining bytes arrive right behind it; a lone ESC is a cancel
+            if not select.select([fd], [], [], ESC_SEQUENCE_TIMEOUT)[0]:
+                self.event.set()
+                return
+            while select.select([fd], [], [], 0)[0] and os.read(fd, 64):
+                pass
+
+    def _watch_windows(self):
+        import msvcrt
+        while not self._done.is_set():
+            if msvcrt.kbhit() and msvcrt.getwch() == ESC:
+                self.event.set()
+                return
+            self._done.wait(self.poll_interval)
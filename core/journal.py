@@ -0,0 +1,141 @@
+"""
+Append-only, crash-safe storage for a list of conversation turns.
+
+A session is kept in two files: a JSON snapshot at `path` and a JSONL journal
+at `path + ".journal"`. Each turn is one appended line, so the cost of a write
+does not grow with the session. The journal is flushed to the OS after every
+append and fsync'ed every `fsync_every` appends, which bounds how many turns a
+power cut can lose; a killed process loses nothing. Once `compact_every`
+records have accumulated, the caller's current turns are written to a new
+snapshot (temp file, fsync, atomic rename) and the journal is truncated.
+
+Every record carries a sequence number, and the snapshot stores the last one it
+includes. Recovery loads the snapshot and replays only the newer journal
+records, so a crash between the rename and the truncation replays nothing twice;
+a torn last line from a crash mid-write is cut off.
+"""
+import json
+import os
+from typing import Dict, List, Optional
+
+SNAPSHOT_VERSION = 1
+DEFAULT_COMPACT_EVERY = 1000
+
+
+class TurnJournal:
+    def __init__(self, path: str, fsync_every: int = 1, compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.path = path
+        self.journal_path = path + ".journal"
+        # 0 never fsyncs (appends still reach the OS immediately)
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+        self.seq = 0
+        self._file = None
+        self._unsynced = 0
+        self._records = 0  # journal records written since the last snapshot
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._records >= self.compact_every
+
+    def load(self) -> List[Dict]:
+        """Recover the turns from the snapshot and the journal."""
+        turns: List[Dict] = []
+        seq = 0
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except ValueError:
+                data = []
+            if isinstance(data, list):
+                # Plain list of turns, as written before the journal existed
+                turns, seq = data, len(data)
+            else:
+                turns, seq = data.get("turns", []), data.get("seq", 0)
+        self._records = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                raw = f.read()
+            good = 0
+            for line in raw.splitlines(keepends=True):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                self._records += 1
+                if record["seq"] <= seq:
+                    continue  # already in the snapshot
+                seq = record["seq"]
+                turns.append({k: v for k, v in record.items() if k != "seq"})
+            if good < len(raw):
+                # Torn write from a crash: drop it so new records start on a clean line
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(good)
+        self.seq = seq
+        return turns
+
+    def append(self, turn: Dict):
+        """Journal one turn."""
+        if self._file is None:
+            self._file = open(self.journal_path, "ab")
+        self.seq += 1
+        line = json.dumps({"seq": self.seq, **turn}, ensure_ascii=False) + "\n"
+        self._file.write(line.encode("utf-8"))
+        self._file.flush()
+        self._records += 1
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """fsync appended records."""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def compact(self, turns: List[Dict]):
+        """Replace the snapshot with `turns` (the state after the last append) and empty the journal."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "seq": self.seq, "turns": turns}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        _fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+        self.close()
+        with open(self.journal_path, "wb"):
+            pass
+        self._records = 0
+
+    def clear(self):
+        """Delete the snapshot and the journal."""
+        self.close()
+        for path in (self.path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.seq = 0
+        self._records = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+def _fsync_dir(path: Optional[str]):
+    # Makes the rename itself durable; not possible on every platform
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
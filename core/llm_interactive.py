@@ -1,68 +1,261 @@
-from core.sqlite_memory import SQLiteSessionMemory
+from core.sqlite_memory import SQLiteSessionMemory, default_db_path
 from core import model
+from core.prompt_builder import PromptCacheStats, build_messages, is_prefix, stable_window_drop
+from core.summarizer import RollingSummarizer, get_summary_tokens, model_summarizer
+from core.tokenizer import get_token_counter
 from core.user_config import load_system_prompt
 import os
-import math
+from contextlib import contextmanager
 
 class LLMInteractiveSession:
     """
     LLM session with robust, token-aware context memory.
     Supports SQLite or in-memory, and configurable token budget.
     """
-    def __init__(self, model_name, db_path=None, max_token_budget=None, persist=True, token_estimator=None):
-        self.model_name = model_name
+    def __init__(self, model_name, db_path=None, max_token_budget=None, persist=True, token_estimator=None,
+                 project_root=None, session_id=None, resume=True):
+        """
+        With `persist`, turns go to the SQLite session store: `session_id`
+        reopens that session, otherwise the latest session for `project_root`
+        is resumed (unless `resume` is False) or a new one is started.
+        """
         self.persist = persist
         self.max_token_budget = max_token_budget or int(os.environ.get("CODEZ_MAX_TOKEN_BUDGET", 3000))
+        # Past turns matching the question (full-text search) added to each prompt; 0 disables
+        self.retrieval_turns = int(os.environ.get("CODEZ_RETRIEVAL_TURNS", 3))
+        # An explicit estimator is kept; otherwise the counter follows the model
+        self._fixed_estimator = token_estimator is not None
+        self._model_name = model_name
+        if token_estimator is None:
+            token_estimator = get_token_counter(model_name)
         self.token_estimator = token_estimator
         self.system_prompt = load_system_prompt()
         if persist:
             if db_path is None:
-                db_path = os.path.join(os.path.dirname(__file__), '..', 'sessions', 'session_memory.db')
-            self.memory = SQLiteSessionMemory(db_path, max_token_budget=self.max_token_budget, token_estimator=token_estimator)
+                db_path = default_db_path()
+            self.memory = SQLiteSessionMemory(db_path, max_token_budget=self.max_token_budget, token_estimator=token_estimator,
+                                              session_id=session_id, project_root=project_root, model=model_name,
+                                              resume=resume)
         else:
             self.memory = InMemorySessionMemory(max_token_budget=self.max_token_budget, token_estimator=token_estimator)
 
+        # With CODEZ_SUMMARY_TOKENS set, turns evicted from the window are condensed between
+        # requests into a summary of at most that many tokens that rides along in the prompt
+        summary_tokens = get_summary_tokens()
+        self.summarizer = None
+        if summary_tokens:
+            self.summarizer = RollingSummarizer(model_summarizer(lambda: self.model_name), token_estimator,
+                                                self.memory, max_tokens=summary_tokens)
+
+        self.last_stats = None
+        # Seconds of generation skipped when the last reply came from the response cache
+        self.last_cache_saving = None
+        self._last_messages = None
+
+    @property
+    def model_name(self):
+        return self._model_name
+
+    @model_name.setter
+    def model_name(self, name):
+        self._model_name = name
+        self.memory.model = name
+        if not self._fixed_estimator:
+            self.token_estimator = get_token_counter(name)
+            self.memory.token_estimator = self.token_estimator
+            if self.summarizer is not None:
+                self.summarizer.token_estimator = self.token_estimator
+            if hasattr(self.memory, "_check_token_counter"):
+                self.memory._check_token_counter()
+
+    def build_messages(self, user_input, system_prompt=None, extra_context=None, turns=None):
+        """
+        Assemble chat messages for `user_input` from the system prompt and the
+        memory's stable context window (or explicit `turns`). When the memory's
+        turns are used, the rolling summary of the history before the window and
+        the earlier turns most relevant to `user_input` are added too.
+        """
+        if system_prompt is None:
+            system_prompt = self.system_prompt
+        summary = None
+        if turns is None:
+            turns = self.memory.get_context_turns()
+            if self.summarizer is not None:
+                self.summarizer.update()
+                summary = self.summarizer.render()
+            relevant = self.get_relevant_turns(user_input)
+            if relevant:
+                # Per-query material: goes with the new message so the cached prefix is untouched
+                recalled = "Relevant earlier conversation:\n" + "\n".join(
+                    f"User: {t['user']}\nModel: {t['response']}" for t in relevant)
+                extra_context = f"{recalled}\n\n{extra_context}" if extra_context else recalled
+        return build_messages(system_prompt, turns, user_input, extra_context, summary=summary)
+
+    def get_relevant_turns(self, user_input):
+        """Turns from before the window that match `user_input`, within the budget the window leaves free."""
+        if not self.retrieval_turns or not hasattr(self.memory, "get_relevant_turns"):
+            return []
+        return self.memory.get_relevant_turns(user_input, k=self.retrieval_turns)
+
+    def record_stats(self, messages, server_stats):
+        """Update `last_stats` from a finished request's messages and server counters."""
+        estimator = self.memory.token_estimator
+        prompt_tokens = sum(estimator(m["content"]) for m in messages)
+        self.last_stats = PromptCacheStats(
+            prompt_tokens=prompt_tokens,
+            evaluated_tokens=server_stats.get("prompt_eval_count"),
+            prefix_stable=is_prefix(self._last_messages, messages),
+        )
+        # The first request of a session is normally prefilled in full, so its
+        # prompt_eval_count is a true count to calibrate the estimate against.
+        # A count below the estimate may instead mean the server reused a KV
+        # cache left by an earlier session with the same prefix, so only counts
+        # at or above it are used (an estimate that errs high is the safe side).
+        evaluated = self.last_stats.evaluated_tokens
+        if self._last_messages is None and evaluated and evaluated >= prompt_tokens and hasattr(estimator, "calibrate"):
+            estimator.calibrate(prompt_tokens, evaluated)
+            # A new scale renames the counter: stored turn counts are redone with it
+            if hasattr(self.memory, "_check_token_counter"):
+                self.memory._check_token_counter()
+        self.last_cache_saving = server_stats.get("saved_seconds") if server_stats.get("cache_hit") else None
+        self._last_messages = messages
+        return self.last_stats
+
+    @contextmanager
+    def generating(self):
+        """
+        Wrap a request to the model: background summaries are held (and one in
+        progress is aborted) until it is done, so they only use the model
+        between requests.
+        """
+        if self.summarizer is not None:
+            self.summarizer.pause()
+        try:
+            yield
+        finally:
+            if self.summarizer is not None:
+                self.summarizer.resume()
+
     def ask(self, user_input):
-        context_prompt = self.memory.get_context_prompt()
-        prompt = f"{self.system_prompt or ''}\n{context_prompt}\nUser: {user_input}\nModel:"
-        response = model.query_ollama(prompt, self.model_name)
+        stats = {}
+        with self.generating():
+            messages = self.build_messages(user_input)
+            response = model.chat_ollama(messages, self.model_name, stats=stats, question=user_input)
+        self.record_stats(messages, stats)
         self.memory.add_turn(user_input, response)
         return response
 
+    def _session_changed(self):
+        self._last_messages = None
+        if self.summarizer is not None:
+            self.summarizer.reset()
+
     def clear(self):
         self.memory.clear()
+        self._session_changed()
+
+    def new_session(self):
+        """Start a fresh conversation; earlier sessions stay in the store."""
+        self.memory.new_session()
+        self._session_changed()
+
+    def switch_session(self, session_id):
+        """Continue a stored session; raises KeyError if it does not exist."""
+        info = self.memory.switch_session(session_id)
+        self._session_changed()
+        return info
+
+    def close(self):
+        """Stop the summarizer, commit anything pending and release the memory's database connection."""
+        if self.summarizer is not None:
+            self.summarizer.close()
+        if hasattr(self.memory, "close"):
+            self.memory.close()
 
 class InMemorySessionMemory:
     """
     In-memory session memory for LLM chat, with token-aware context window.
     """
-    def __init__(self, max_token_budget=3000, token_estimator=None):
+    def __init__(self, max_token_budget=3000, token_estimator=None, retain_ratio=0.5):
         self.max_token_budget = max_token_budget
-        self.token_estimator = token_estimator or self._default_token_estimator
+        self.token_estimator = token_estimator or get_token_counter()
+        self.retain_ratio = retain_ratio
         self.session = []
+        self._token_counts = []  # per turn, counted once when the turn is added
+        self._counted_with = getattr(self.token_estimator, "name", None)
+        self._window_start = 0
+        # Nothing is stored, so there is only ever the one unnamed session
+        self.session_id = None
+        self.model = None
+        self._summaries = {}  # (first_id, last_id, level) -> SummaryBlock
+        self._active_summaries = []
 
-    def add_turn(self, user, response):
+    def add_turn(self, user, response, meta=None):
         self.session.append({"user": user, "response": response})
+        self._token_counts.append(self._count_turn(self.session[-1]))
+
+    def _count_turn(self, turn):
+        return self.token_estimator(f"User: {turn['user']}\nModel: {turn['response']}\n")
+
+    def _check_token_counter(self):
+        name = getattr(self.token_estimator, "name", None)
+        if name != self._counted_with:
+            self._token_counts = [self._count_turn(t) for t in self.session]
+            self._counted_with = name
 
     def get_context(self):
         return self.session
 
+    def get_context_turns(self):
+        """
+        Return the turns in the context window, oldest first. The window start
+        only moves forward, in blocks (see `stable_window_drop`).
+        """
+        window = self.session[self._window_start:]
+        counts = self._token_counts[self._window_start:]
+        drop = stable_window_drop(counts, self.max_token_budget, self.retain_ratio)
+        self._window_start += drop
+        return window[drop:]
+
+    # Turn ids are 1-based positions in `session`, for the summarizer
+
+    @property
+    def window_start_id(self):
+        return self._window_start + 1 if self._window_start else 0
+
+    def get_turns(self, session_id, after_id, before_id):
+        return [(i + 1, t["user"], t["response"]) for i, t in enumerate(self.session[after_id:before_id - 1], after_id)]
+
+    def load_summaries(self, session_id):
+        return list(self._active_summaries)
+
+    def get_summary(self, session_id, first_id, last_id, level):
+        return self._summaries.get((first_id, last_id, level))
+
+    def save_summaries(self, session_id, active, inactive):
+        for block in active + inactive:
+            self._summaries[block[:3]] = block
+        self._active_summaries = sorted((set(self._active_summaries) - set(inactive)) | set(active))
+
     def get_context_prompt(self):
-        prompt_turns = []
-        total_tokens = 0
-        for turn in reversed(self.session):
-            turn_str = f"User: {turn['user']}\nModel: {turn['response']}\n"
-            turn_tokens = self.token_estimator(turn_str)
-            if total_tokens + turn_tokens > self.max_token_budget:
-                break
-            prompt_turns.append(turn_str)
-            total_tokens += turn_tokens
-        prompt_turns = list(reversed(prompt_turns))
-        return ''.join(prompt_turns).strip()
+        turns = self.get_context_turns()
+        return ''.join(f"User: {t['user']}\nModel: {t['response']}\n" for t in turns).strip()
 
     def clear(self):
         self.session = []
+        self._token_counts = []
+        self._window_start = 0
+        self._summaries = {}
+        self._active_summaries = []
+
+    def new_session(self):
+        self.clear()
+
+    def list_sessions(self, project_root=None, limit=20, offset=0, search=None):
+        return []
+
+    def count_sessions(self, project_root=None, search=None):
+        return 0
 
-    @staticmethod
-    def _default_token_estimator(text: str) -> int:
-        return math.ceil(len(text.split()) * 1.3)
+    def switch_session(self, session_id):
+        raise KeyError(f"No session with id {session_id}")
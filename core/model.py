@@ -1,31 +1,239 @@
 # core/model.py
+import codecs
+import os
 import subprocess
 import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from core.prompt_builder import messages_to_prompt
 
 OLLAMA_GITHUB_URL = "https://github.com/ollama/ollama"
 DEFAULT_MODEL = "qwen2.5-coder:1.5b-instruct"
 
-def query_ollama(prompt: str, model: str = DEFAULT_MODEL):
+# "http" talks to the Ollama REST API over a pooled connection,
+# "subprocess" shells out to the `ollama` CLI for every query.
+BACKEND_ENV = "CODEZ_OLLAMA_BACKEND"
+DEFAULT_BACKEND = "http"
+
+# How long the server keeps the model (and its KV cache) loaded between turns.
+KEEP_ALIVE_ENV = "CODEZ_KEEP_ALIVE"
+DEFAULT_KEEP_ALIVE = "30m"
+
+def _http():
+    # Imported on first use: httpx is heavy, and this module is imported
+    # before the first prompt while model discovery runs in the background.
+    from core import ollama_client
+    return ollama_client
+
+def _cache_lookup(model: str, prompt, question: Optional[str] = None, stats: Optional[Dict] = None):
     """
-    Query the Ollama LLM with the given prompt and model.
-    You can change the model at any time using the /models or /model command in the CLI.
+    Check the response cache, then (when `question` is given) the semantic
+    cache for a paraphrase asked against the same context.
+    Returns (cached_text, store): on a hit `stats` gets `cache_hit` and
+    `saved_seconds` (plus `semantic_similarity`/`cached_question` for a
+    semantic hit); on a miss `store(text, gen_seconds)` records the fresh
+    answer in whichever caches are enabled, or is None if none are.
     """
+    from core import response_cache, semantic_cache
+    exact = response_cache.get_active_cache()
+    semantic = semantic_cache.get_active_cache() if question else None
+    if exact is None and semantic is None:
+        return None, None
+    if exact is not None:
+        key = response_cache.cache_key(model, prompt)
+        cached = exact.get(key)
+        if cached is not None:
+            if stats is not None:
+                stats.update(cache_hit=True, saved_seconds=cached.gen_seconds)
+            return cached.response, None
+    if semantic is not None:
+        fingerprint = semantic_cache.context_fingerprint(model, prompt, question)
+        try:
+            hit = semantic.lookup(question, fingerprint)
+        except Exception:
+            # No embedding model available: carry on as if the semantic cache were off
+            semantic = hit = None
+        if hit is not None:
+            if stats is not None:
+                stats.update(cache_hit=True, saved_seconds=hit.gen_seconds,
+                             semantic_similarity=hit.similarity, cached_question=hit.question)
+            return hit.response, None
+
+    def store(text: str, gen_seconds: float):
+        if exact is not None:
+            exact.put(key, model, text, gen_seconds)
+        if semantic is not None:
+            try:
+                semantic.put(question, fingerprint, text, gen_seconds)
+            except Exception:
+                pass
+    return None, store
+
+def _store_stream(chunks: Iterator[str], store, start: float,
+                  stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+    """Pass chunks through and cache the full text, unless the stream was cut short."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    if not (stop_event is not None and stop_event.is_set()):
+        store("".join(parts), time.perf_counter() - start)
+
+def get_keep_alive() -> str:
+    return os.environ.get(KEEP_ALIVE_ENV, DEFAULT_KEEP_ALIVE)
+
+def get_backend() -> str:
+    backend = os.environ.get(BACKEND_ENV, DEFAULT_BACKEND).strip().lower()
+    return backend if backend in ("http", "subprocess") else DEFAULT_BACKEND
+
+def _clean_output(output: str) -> str:
+    # Optionally, strip markdown formatting from code blocks for terminal display
+    output = output.strip()
+    # Remove markdown headers and excessive formatting
+    return re.sub(r'#.*\n', '', output)
+
+def _query_ollama_subprocess(prompt: str, model: str) -> str:
     result = subprocess.run(
         ["ollama", "run", model, prompt],
         capture_output=True,
         text=True
     )
-    # Optionally, strip markdown formatting from code blocks for terminal display
-    output = result.stdout.strip()
-    # Remove markdown headers and excessive formatting
-    output = re.sub(r'#.*\n', '', output)
-    return output
+    return result.stdout
+
+def query_ollama(prompt: str, model: str = DEFAULT_MODEL, question: Optional[str] = None, stats: Optional[Dict] = None):
+    """
+    Query the Ollama LLM with the given prompt and model.
+    You can change the model at any time using the /models or /model command in the CLI.
+    `question` is the user's own words at the end of `prompt`; passing it
+    lets the semantic cache answer paraphrases (see `_cache_lookup`).
+    """
+    cached, store = _cache_lookup(model, prompt, question, stats)
+    if cached is not None:
+        return _clean_output(cached)
+    start = time.perf_counter()
+    if get_backend() == "http":
+        output = _http().get_client().generate(model, prompt)
+    else:
+        output = _query_ollama_subprocess(prompt, model)
+    if store is not None:
+        store(output, time.perf_counter() - start)
+    return _clean_output(output)
+
+def _stream_ollama_subprocess(prompt: str, model: str, stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+    proc = subprocess.Popen(
+        ["ollama", "run", model, prompt],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        # Killing the child closes its end of the pipe, so the blocking read returns EOF.
+        with _http().cancel_on(stop_event, proc.kill):
+            while True:
+                data = os.read(proc.stdout.fileno(), 4096)
+                if not data or (stop_event is not None and stop_event.is_set()):
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+        tail = decoder.decode(b"", final=True)
+        if tail and not (stop_event is not None and stop_event.is_set()):
+            yield tail
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+def stream_ollama(prompt: str, model: str = DEFAULT_MODEL, stop_event: Optional[threading.Event] = None,
+                  question: Optional[str] = None, stats: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Like query_ollama, but yield the response in chunks as the model generates it.
+    Chunks are passed through untouched; markdown cleanup is left to the renderer.
+    Setting `stop_event` aborts the generation: the HTTP request is torn down
+    (or the `ollama` child killed) and the iterator simply ends.
+    """
+    cached, store = _cache_lookup(model, prompt, question, stats)
+    if cached is not None:
+        return iter([cached])
+    start = time.perf_counter()
+    if get_backend() == "http":
+        chunks = _http().get_client().generate_stream(model, prompt, stop_event=stop_event)
+    else:
+        chunks = _stream_ollama_subprocess(prompt, model, stop_event)
+    if store is not None:
+        chunks = _store_stream(chunks, store, start, stop_event)
+    return chunks
+
+def chat_ollama(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL, stats: Optional[Dict] = None,
+                question: Optional[str] = None) -> str:
+    """
+    Send structured chat messages and return the reply text.
+    On the HTTP backend this uses /api/chat with keep_alive so the server can
+    reuse its KV cache for an unchanged message prefix; `stats` receives the
+    server's counters (prompt_eval_count etc.), or `cache_hit` and
+    `saved_seconds` when the reply came from a cache (`question` as in query_ollama).
+    """
+    cached, store = _cache_lookup(model, messages, question, stats)
+    if cached is not None:
+        return _clean_output(cached)
+    start = time.perf_counter()
+    if get_backend() == "http":
+        reply = _http().get_client().chat(model, messages, keep_alive=get_keep_alive())
+        if stats is not None:
+            stats.update({k: v for k, v in reply.items() if k.endswith(("_count", "_duration"))})
+        output = reply.get("message", {}).get("content", "")
+    else:
+        output = _query_ollama_subprocess(messages_to_prompt(messages), model)
+    if store is not None:
+        store(output, time.perf_counter() - start)
+    return _clean_output(output)
+
+def stream_chat(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL,
+                stop_event: Optional[threading.Event] = None, stats: Optional[Dict] = None,
+                question: Optional[str] = None) -> Iterator[str]:
+    """Streaming variant of chat_ollama; cancellation works as in stream_ollama."""
+    cached, store = _cache_lookup(model, messages, question, stats)
+    if cached is not None:
+        return iter([cached])
+    start = time.perf_counter()
+    if get_backend() == "http":
+        chunks = _http().get_client().chat_stream(model, messages, keep_alive=get_keep_alive(), stop_event=stop_event, stats=stats)
+    else:
+        chunks = _stream_ollama_subprocess(messages_to_prompt(messages), model, stop_event)
+    if store is not None:
+        chunks = _store_stream(chunks, store, start, stop_event)
+    return chunks
+
+def preload_model(model: str = DEFAULT_MODEL) -> bool:
+    """
+    Load `model` on the server ahead of the first query so that query does not
+    pay the cold-load cost. Only supported on the HTTP backend; returns
+    whether a warm-up request was made.
+    """
+    if get_backend() != "http":
+        return False
+    _http().get_client().load_model(model, keep_alive=get_keep_alive())
+    return True
 
-def get_ollama_models():
+def get_ollama_models(interactive: bool = True):
     """
     Returns a tuple: (list_of_models, error_message)
-    If no models are found, prompts the user to download the default model.
+    If no models are found, prompts the user to download the default model,
+    unless `interactive` is False (e.g. when called from a background thread),
+    in which case ([], None) is returned.
     """
+    if get_backend() == "http":
+        http = _http()
+        try:
+            models = http.get_client().list_models()
+        except http.OllamaConnectionError:
+            # Server not reachable: fall through to the CLI, which also
+            # tells us whether Ollama is installed at all.
+            models = None
+        if models:
+            return models, None
     try:
         result = subprocess.run([
             "ollama", "list"
@@ -37,6 +245,8 @@ def get_ollama_models():
             if line and not line.startswith('NAME'):
                 models.append(line.split()[0])
         # If no models found, prompt user to download the default model
+        if not models and not interactive:
+            return [], None
         if not models:
             print(
                 f"[CodeZ CLI] No Ollama models found on your system.\n"
@@ -0,0 +1,239 @@
+"""
+HTTP client for the Ollama REST API.
+
+A single pooled, keep-alive `httpx.Client` is shared by every query so a turn
+costs one request on an already-open connection instead of a fresh
+`ollama run` process.
+"""
+import json
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+DEFAULT_TIMEOUT = httpx.Timeout(connect=5.0, read=600.0, write=30.0, pool=10.0)
+# How often a cancellation watcher checks its stop event; bounds abort latency.
+CANCEL_POLL_INTERVAL = 0.05
+
+
+class OllamaError(RuntimeError):
+    """Raised when the Ollama server cannot be reached or returns an error."""
+
+
+class OllamaConnectionError(OllamaError):
+    """Raised when no Ollama server is listening at the configured host."""
+
+
+@contextmanager
+def cancel_on(stop_event: Optional[threading.Event], abort: Callable[[], None]):
+    """
+    While the block runs, call `abort` from a watcher thread as soon as
+    `stop_event` is set. `abort` must unblock whatever the block is waiting on
+    (shutting down a socket, killing a child process).
+    """
+    if stop_event is None:
+        yield
+        return
+    finished = threading.Event()
+
+    def watch():
+        while not finished.is_set():
+            if stop_event.wait(CANCEL_POLL_INTERVAL):
+                abort()
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        finished.set()
+
+
+def resolve_host(host: Optional[str] = None) -> str:
+    """Return a base URL for `host`, falling back to $OLLAMA_HOST and the default."""
+    host = (host or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST).strip().rstrip("/")
+    if "://" not in host:
+        host = f"http://{host}"
+    return host
+
+
+class OllamaClient:
+    """
+    Thin wrapper around the Ollama REST API using a persistent connection pool.
+    """
+    def __init__(self, host: Optional[str] = None, timeout: httpx.Timeout = DEFAULT_TIMEOUT, max_connections: int = 4):
+        self.host = resolve_host(host)
+        self._client = httpx.Client(
+            base_url=self.host,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        try:
+            response = self._client.post(path, json=payload)
+        except httpx.ConnectError as e:
+            raise OllamaConnectionError(f"Could not connect to Ollama at {self.host}: {e}") from e
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama request to {path} failed: {e}") from e
+        return self._json(response, path)
+
+    @staticmethod
+    def _json(response: httpx.Response, path: str) -> Dict:
+        if response.status_code != 200:
+            try:
+                detail = response.json().get("error", response.text)
+            except ValueError:
+                detail = response.text
+            raise OllamaError(f"Ollama returned HTTP {response.status_code} for {path}: {detail}")
+        return response.json()
+
+    def list_models(self) -> List[str]:
+        """Return the names of the locally available models."""
+        try:
+            response = self._client.get("/api/tags")
+        except httpx.ConnectError as e:
+            raise OllamaConnectionError(f"Could not connect to Ollama at {self.host}: {e}") from e
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama request to /api/tags failed: {e}") from e
+        data = self._json(response, "/api/tags")
+        return [m["name"] for m in data.get("models", [])]
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict] = None) -> str:
+        """Run a non-streaming completion and return the generated text."""
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        return self._post("/api/generate", payload).get("response", "")
+
+    def generate_stream(self, model: str, prompt: str, options: Optional[Dict] = None,
+                        stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Run a streaming completion, yielding text chunks as the server produces them.
+        Setting `stop_event` ends the stream early (see `_stream`).
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        for chunk in self._stream("/api/generate", payload, stop_event):
+            text = chunk.get("response")
+            if text:
+                yield text
+
+    def load_model(self, model: str, keep_alive: Optional[str] = None) -> Dict:
+        """Ask the server to load `model` into memory without generating anything."""
+        payload = {"model": model, "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return self._post("/api/generate", payload)
+
+    def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        """Return one embedding vector per input text."""
+        return self._post("/api/embed", {"model": model, "input": texts}).get("embeddings", [])
+
+    def chat(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+             keep_alive: Optional[str] = None) -> Dict:
+        """Run a non-streaming chat completion and return the full reply object."""
+        payload = _chat_payload(model, messages, options, keep_alive, stream=False)
+        return self._post("/api/chat", payload)
+
+    def chat_stream(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+                    keep_alive: Optional[str] = None, stop_event: Optional[threading.Event] = None,
+                    stats: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Stream a chat completion, yielding message content chunks.
+        If `stats` is given it is updated with the final chunk's counters
+        (prompt_eval_count, eval_count, durations) once the reply is done.
+        """
+        payload = _chat_payload(model, messages, options, keep_alive, stream=True)
+        for chunk in self._stream("/api/chat", payload, stop_event):
+            text = chunk.get("message", {}).get("content")
+            if text:
+                yield text
+            if chunk.get("done") and stats is not None:
+                stats.update({k: v for k, v in chunk.items() if k.endswith(("_count", "_duration"))})
+
+    def _stream(self, path: str, payload: Dict, stop_event: Optional[threading.Event] = None) -> Iterator[Dict]:
+        """
+        POST `payload` and yield each NDJSON object of the streamed reply until `done`.
+
+        When `stop_event` is set the underlying socket is shut down, which
+        unblocks the pending read within CANCEL_POLL_INTERVAL and makes the
+        server drop the request and free the model slot. The stream then ends
+        quietly; the connection is discarded rather than returned to the pool.
+        """
+        try:
+            with self._client.stream("POST", path, json=payload) as response:
+                if response.status_code != 200:
+                    response.read()
+                    self._json(response, path)
+                with cancel_on(stop_event, lambda: _shutdown_stream(response)):
+                    for line in response.iter_lines():
+                        if stop_event is not None and stop_event.is_set():
+                            return
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if "error" in chunk:
+                            raise OllamaError(f"Ollama stream from {path} failed: {chunk['error']}")
+                        yield chunk
+                        if chunk.get("done"):
+                            return
+        except httpx.ConnectError as e:
+            raise OllamaConnectionError(f"Could not connect to Ollama at {self.host}: {e}") from e
+        except httpx.HTTPError as e:
+            if stop_event is not None and stop_event.is_set():
+                return
+            raise OllamaError(f"Ollama request to {path} failed: {e}") from e
+
+    def close(self):
+        self._client.close()
+
+
+def _chat_payload(model, messages, options, keep_alive, stream):
+    payload = {"model": model, "messages": messages, "stream": stream}
+    if options:
+        payload["options"] = options
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    return payload
+
+
+def _shutdown_stream(response: httpx.Response):
+    """Shut down the socket under a streaming response so a blocked read returns."""
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient()
+    return _client
+
+
+def reset_client(client: Optional[OllamaClient] = None):
+    """Close the shared client and optionally replace it (used by tests and benchmarks)."""
+    global _client
+    with _client_lock:
+        if _client is not None and _client is not client:
+            _client.close()
+        _client = client
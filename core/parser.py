@@ -1,7 +1,11 @@
 # core/parser.py
 import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 from tree_sitter import Language, Parser
-import os
 
 # Determine the project root directory from the location of parser.py
 # parser.py is in core/, so project_root is one level up.
@@ -33,68 +37,468 @@ LANGUAGES = {
     "go":     (GO_LANG_SO_PATH, "go"),
 }
 
-# Node types for function definitions in each language
+# Node types extracted as symbols, with their kind. Types a grammar version
+# does not define are skipped when its query is compiled.
+SYMBOL_NODE_TYPES = {
+    "python": {"function_definition": "function", "class_definition": "class"},
+    "javascript": {"function_declaration": "function", "generator_function_declaration": "function",
+                   "method_definition": "method", "class_declaration": "class"},
+    "typescript": {"function_declaration": "function", "generator_function_declaration": "function",
+                   "method_definition": "method", "method_signature": "method", "class_declaration": "class",
+                   "abstract_class_declaration": "class", "interface_declaration": "interface"},
+    "java": {"method_declaration": "method", "constructor_declaration": "method", "class_declaration": "class",
+             "interface_declaration": "interface", "enum_declaration": "enum", "record_declaration": "class"},
+    "kotlin": {"function_declaration": "function", "class_declaration": "class", "object_declaration": "class"},
+    "swift": {"function_declaration": "function", "init_declaration": "method", "class_declaration": "class",
+              "protocol_declaration": "protocol"},
+    "objc": {"function_definition": "function", "method_definition": "method", "class_interface": "class",
+             "class_implementation": "class", "protocol_declaration": "protocol"},
+    "go": {"function_declaration": "function", "method_declaration": "method", "type_spec": "type"},
+}
+
+# Node types for function and method definitions in each language
 FUNCTION_NODE_TYPES = {
-    "swift": ["function_declaration"],
-    "objc": ["function_definition", "method_definition"],
-    "java": ["method_declaration"],
-    "kotlin": ["function_declaration"],
-    "python": ["function_definition"],
-    "javascript": ["function_declaration", "method_definition"],
-    "typescript": ["function_declaration", "method_signature"],
-    "go": ["function_declaration", "method_declaration"],
+    language: [node_type for node_type, kind in node_types.items() if kind in ("function", "method")]
+    for language, node_types in SYMBOL_NODE_TYPES.items()
+}
+
+CONTAINER_KINDS = {"class", "interface", "protocol", "struct", "enum", "type", "extension", "actor"}
+# Keywords that make a class-like declaration more specific (swift's class_declaration covers struct, enum...)
+KIND_KEYWORDS = {"struct", "enum", "interface", "protocol", "extension", "actor"}
+GO_TYPE_KINDS = {"struct_type": "struct", "interface_type": "interface"}
+
+# File extensions of the languages above
+EXTENSIONS = {
+    ".swift": "swift",
+    ".m": "objc",
+    ".mm": "objc",
+    ".java": "java",
+    ".kt": "kotlin",
+    ".py": "python",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".go": "go",
 }
 
+
+class Symbol(NamedTuple):
+    kind: str   # "function", "method", "class", "interface", "protocol", "struct", ...
+    name: str
+    start_byte: int
+    end_byte: int
+    start_line: int  # 1-based, inclusive
+    end_line: int
+    signature: str = ""  # the declaration up to its body, whitespace collapsed
+    docstring: str = ""  # docstring, or the comment block right above
+    parent: str = ""     # name of the enclosing class-like symbol
+
+
+def language_for_path(path: str) -> Optional[str]:
+    """The language of a source file by extension, or None if it is not one we parse."""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
 def detect_language_from_filename(filename: str) -> str:
     """
     Guess the programming language from the file extension.
     """
-    ext = os.path.splitext(filename)[1].lower()
-    ext_map = {
-        ".swift": "swift",
-        ".m": "objc",
-        ".mm": "objc",
-        ".java": "java",
-        ".kt": "kotlin",
-        ".py": "python",
-        ".js": "javascript",
-        ".ts": "typescript",
-    }
-    return ext_map.get(ext, "swift")  # Default to swift if unknown
+    return language_for_path(filename) or "swift"  # Default to swift if unknown
 
-def load_parser(language: str):
+def grammar_available(language: str) -> bool:
+    """True if the grammar for `language` has been built (see build_grammars.sh)."""
+    entry = LANGUAGES.get(language.lower())
+    return entry is not None and (entry[1] in _languages or os.path.exists(entry[0]))
+
+# Grammar registry: each Language is loaded (dlopen + symbol lookup) once per
+# process, on first use; parsers are not thread-safe, so every thread gets its
+# own, created once per language and reused for every parse.
+_languages: Dict[str, Language] = {}
+_queries: Dict[str, object] = {}
+_languages_lock = threading.Lock()
+_thread_parsers = threading.local()
+
+def get_language(language: str) -> Language:
+    """The tree-sitter Language for `language` (any key of LANGUAGES), loaded once."""
     lang_key = language.lower()
     if lang_key not in LANGUAGES:
         raise ValueError(f"Unsupported language: {language}")
     so_path, ts_lang = LANGUAGES[lang_key]
-    if not os.path.exists(so_path):
-        raise FileNotFoundError(f"Grammar file not found: {so_path}")
+    loaded = _languages.get(ts_lang)
+    if loaded is not None:
+        return loaded
+    with _languages_lock:
+        if ts_lang not in _languages:
+            if not os.path.exists(so_path):
+                raise FileNotFoundError(f"Grammar file not found: {so_path}")
+            _languages[ts_lang] = Language(so_path, ts_lang)
+        return _languages[ts_lang]
+
+def get_parser(language: str) -> Parser:
+    """This thread's parser for `language`; reuse it, but don't share it with other threads."""
+    parsers = getattr(_thread_parsers, "parsers", None)
+    if parsers is None:
+        parsers = _thread_parsers.parsers = {}
+    lang_key = language.lower()
+    parser = parsers.get(lang_key)
+    if parser is None:
+        parser = Parser()
+        parser.set_language(get_language(lang_key))
+        parsers[lang_key] = parser
+    return parser
+
+def get_symbol_query(language: str):
+    """The compiled symbol query for `language`, built once from SYMBOL_NODE_TYPES."""
+    grammar = get_language(language)
+    ts_lang = LANGUAGES[language.lower()][1]
+    if ts_lang in _queries:
+        return _queries[ts_lang]
+    with _languages_lock:
+        if ts_lang not in _queries:
+            patterns = []
+            for node_type in SYMBOL_NODE_TYPES.get(ts_lang, {}):
+                try:
+                    grammar.query(f"({node_type}) @symbol")
+                except NameError:
+                    continue  # not a node type of this grammar version
+                patterns.append(f"({node_type}) @symbol")
+            _queries[ts_lang] = grammar.query(" ".join(patterns)) if patterns else None
+        return _queries[ts_lang]
+
+def warm_up(languages: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Load the grammars for `languages` (default: every built grammar) and this
+    thread's parsers ahead of the first parse. Returns the languages loaded;
+    missing grammars are skipped.
+    """
+    loaded = []
+    for language in (languages if languages is not None else LANGUAGES):
+        if grammar_available(language):
+            get_parser(language)
+            get_symbol_query(language)
+            loaded.append(language)
+    return loaded
+
+def loaded_languages() -> List[str]:
+    """tree-sitter names of the grammars loaded so far in this process."""
+    return sorted(_languages)
+
+def load_parser(language: str):
+    """A new parser for `language` (for callers that keep their own); the grammar comes from the registry."""
     parser = Parser()
-    parser.set_language(Language(so_path, ts_lang))
+    parser.set_language(get_language(language))
     return parser
 
 def extract_functions(code: str, language: str = "swift"):
     """
     Extract function definitions from code using tree-sitter.
-    Supported languages: swift, objc, java, kotlin, python, javascript, typescript
+    Supported languages: swift, objc, java, kotlin, python, javascript, typescript, go
+    """
+    source = code.encode("utf-8")
+    return [source[s.start_byte:s.end_byte].decode("utf-8")
+            for s in extract_symbols(source, language) if s.kind in ("function", "method")]
+
+_STRING_QUOTES = re.compile(r"""^[rRbBuUfF]*('{3}|"{3}|'|")|('{3}|"{3}|'|")$""")
+
+def _text(source, start: int, end: int) -> str:
+    return bytes(source[start:end]).decode("utf-8", "replace")
+
+def _node_name(node, source) -> str:
+    name = node.child_by_field_name("name")
+    if name is None:
+        # C-style definitions (objc) keep the name inside the declarator
+        declarator = node.child_by_field_name("declarator")
+        while declarator is not None and declarator.child_by_field_name("declarator") is not None:
+            declarator = declarator.child_by_field_name("declarator")
+        name = declarator
+    if name is None:
+        name = next((child for child in node.children if child.type.endswith("identifier")), None)
+    return _text(source, name.start_byte, name.end_byte) if name is not None else ""
+
+def _node_kind(node, ts_lang: str) -> str:
+    kind = SYMBOL_NODE_TYPES[ts_lang][node.type]
+    if kind == "type":
+        value = node.child_by_field_name("type")
+        return GO_TYPE_KINDS.get(value.type, "type") if value is not None else "type"
+    if kind == "class":
+        keyword = next((child.type for child in node.children if not child.is_named and child.type in KIND_KEYWORDS), None)
+        return keyword or kind
+    return kind
+
+def _signature(node, source) -> str:
+    body = node.child_by_field_name("body")
+    end = body.start_byte if body is not None else node.end_byte
+    text = _text(source, node.start_byte, end)
+    if body is None:
+        text = text.split("\n", 1)[0]
+    return " ".join(text.split()).rstrip(" :{")
+
+def _docstring(node, source) -> str:
+    body = node.child_by_field_name("body")
+    if body is not None and body.named_child_count:
+        first = body.named_children[0]
+        if first.type == "expression_statement" and first.named_child_count and first.named_children[0].type == "string":
+            # Python docstring
+            text = _text(source, first.start_byte, first.end_byte)
+            return _STRING_QUOTES.sub("", text).strip()
+    comments = []
+    sibling = node.prev_named_sibling
+    line = node.start_point[0]
+    while sibling is not None and "comment" in sibling.type and sibling.end_point[0] >= line - 1:
+        comments.append(_text(source, sibling.start_byte, sibling.end_byte))
+        line = sibling.start_point[0]
+        sibling = sibling.prev_named_sibling
+    return "\n".join(reversed(comments))
+
+def _symbols_from_captures(captures, source, ts_lang: str) -> List[Symbol]:
+    symbols = []
+    enclosing = []  # (end_byte, name, kind) of the symbols around the current position
+    for node, _ in captures:
+        while enclosing and enclosing[-1][0] <= node.start_byte:
+            enclosing.pop()
+        kind = _node_kind(node, ts_lang)
+        parent = enclosing[-1][1] if enclosing else ""
+        if kind == "function" and enclosing and enclosing[-1][2] in CONTAINER_KINDS:
+            kind = "method"
+        name = _node_name(node, source)
+        symbols.append(Symbol(kind, name, node.start_byte, node.end_byte, node.start_point[0] + 1,
+                              node.end_point[0] + 1, _signature(node, source), _docstring(node, source), parent))
+        enclosing.append((node.end_byte, name, kind))
+    return symbols
+
+def extract_symbols(source, language: str, parser=None) -> List[Symbol]:
+    """
+    Functions, methods and class-like declarations in `source` (UTF-8 bytes
+    or a memoryview over them; only names, signatures and docstrings are
+    copied out), in source order. `parent` names the innermost enclosing
+    symbol; functions directly inside a class-like one are methods. `parser`
+    overrides this thread's parser.
     """
     lang_key = language.lower()
-    parser = load_parser(lang_key)
-    tree = parser.parse(bytes(code, "utf8"))
-    root = tree.root_node
-    node_types = FUNCTION_NODE_TYPES.get(lang_key, ["function_declaration"])
-    functions = []
-
-    def walk(node):
-        if node.type in node_types:
-            start = node.start_byte
-            end = node.end_byte
-            functions.append(code[start:end])
-        for child in node.children:
-            walk(child)
-
-    walk(root)
-    return functions
+    query = get_symbol_query(lang_key)
+    ts_lang = LANGUAGES[lang_key][1]
+    if query is None:
+        return []
+    if parser is None:
+        parser = get_parser(lang_key)
+    tree = parser.parse(source, keep_text=False)
+    return _symbols_from_captures(query.captures(tree.root_node), source, ts_lang)
+
+
+class SymbolChanges(NamedTuple):
+    changed: List[Symbol]  # present before and after, with different text (new ranges)
+    added: List[Symbol]
+    removed: List[Symbol]  # old ranges
+
+    def __bool__(self):
+        return bool(self.changed or self.added or self.removed)
+
+
+class ParseResult(NamedTuple):
+    symbols: List[Symbol]
+    changes: Optional[SymbolChanges]  # None on the first parse of a file
+    incremental: bool
+    seconds: float
+
+
+class _ParsedFile(NamedTuple):
+    language: str
+    source: bytes
+    tree: object
+    symbols: List[Symbol]
+
+
+def _common_prefix(a: bytes, b: bytes, limit: int) -> int:
+    """Length of the common prefix of a and b (at most `limit`), by bisection on C-level comparisons."""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix(a: bytes, b: bytes, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _point(source: bytes, offset: int) -> Tuple[int, int]:
+    """(row, byte column) of a byte offset, as tree-sitter counts them."""
+    row = source.count(b"\n", 0, offset)
+    return row, offset - (source.rfind(b"\n", 0, offset) + 1)
+
+def _widen_to_straddlers(replaced: List[Symbol], fresh: List[Symbol], lo: int, hi: int,
+                         delta: int) -> Optional[Tuple[int, int]]:
+    """
+    Symbols outside the re-queried region [lo, hi] are carried over with
+    their parents, which is only right if the symbols crossing its edges
+    (the ones that can enclose them) are the same in the old and new parse.
+    Returns the region widened over every crossing symbol found in only one
+    of them, or None when they all match.
+    """
+    def crossing(symbols, end_delta, old_hi):
+        keys = Counter()
+        for s in symbols:
+            outside_start = s.start_byte if s.start_byte < lo else None
+            outside_end = s.end_byte + end_delta if s.end_byte > old_hi else None
+            if outside_start is not None or outside_end is not None:
+                keys[s.kind, s.name, s.parent, outside_start, outside_end] += 1
+        return keys
+    before, after = crossing(replaced, delta, hi - delta), crossing(fresh, 0, hi)
+    mismatched = list((before - after) + (after - before))
+    if not mismatched:
+        return None
+    starts = [key[3] for key in mismatched if key[3] is not None]
+    ends = [key[4] for key in mismatched if key[4] is not None]
+    return min([lo] + starts), max([hi] + ends)
+
+def _symbol_key(symbol: Symbol) -> Tuple[str, str, str]:
+    return symbol.kind, symbol.name, symbol.parent
+
+def _shift(symbol: Symbol, delta: int, line_delta: int) -> Symbol:
+    kind, name, start_byte, end_byte, start_line, end_line, signature, docstring, parent = symbol
+    return Symbol(kind, name, start_byte + delta, end_byte + delta, start_line + line_delta, end_line + line_delta,
+                  signature, docstring, parent)
+
+
+class ParseCache:
+    """
+    Keeps the last parse tree and symbols of recently parsed files. When a
+    file is parsed again, the edit between the old and new bytes (common
+    prefix and suffix) is applied to the old tree and tree-sitter re-parses
+    only what it touched; symbols outside the changed region are carried
+    over with shifted offsets and only the region is queried again (widened
+    until the symbols crossing its edges match, so carried-over symbols keep
+    the right parents; a tree with syntax errors is parsed afresh, since
+    error recovery depends on the old tree; if the re-parse fails, the file
+    is parsed from scratch). The result says which symbols changed, were
+    added or were removed.
+    """
+    def __init__(self, max_files: int = 32):
+        self.max_files = max_files
+        self._files: "OrderedDict[str, _ParsedFile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def forget(self, path: str):
+        with self._lock:
+            self._files.pop(path, None)
+
+    def parse(self, path: str, source: bytes, language: Optional[str] = None) -> ParseResult:
+        """Parse `source` as the new content of `path` (language from the extension unless given)."""
+        language = (language or detect_language_from_filename(path)).lower()
+        started = time.perf_counter()
+        with self._lock:
+            previous = self._files.get(path)
+        query = get_symbol_query(language)
+        ts_lang = LANGUAGES[language][1]
+        parser = get_parser(language)
+
+        def full_parse():
+            tree = parser.parse(source, keep_text=False)
+            return tree, _symbols_from_captures(query.captures(tree.root_node), source, ts_lang) if query else []
+
+        if previous is None or previous.language != language or query is None:
+            tree, symbols = full_parse()
+            changes, incremental = None, False
+        elif previous.source == source:
+            tree, symbols = previous.tree, previous.symbols
+            changes, incremental = SymbolChanges([], [], []), True
+        else:
+            try:
+                tree, symbols, changes = self._reparse(previous, source, parser, query, ts_lang)
+                incremental = True
+            except Exception:
+                # The cached tree may already be edited to the new source: drop it and start afresh
+                self.forget(path)
+                tree, symbols = full_parse()
+                changes, incremental = None, False
+        with self._lock:
+            self._files[path] = _ParsedFile(language, source, tree, symbols)
+            self._files.move_to_end(path)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        return ParseResult(symbols, changes, incremental, time.perf_counter() - started)
+
+    def _reparse(self, previous: _ParsedFile, source: bytes, parser, query, ts_lang: str):
+        old = previous.source
+        start = _common_prefix(old, source, min(len(old), len(source)))
+        suffix = _common_suffix(old, source, min(len(old), len(source)) - start)
+        old_end, new_end = len(old) - suffix, len(source) - suffix
+        delta = new_end - old_end
+        line_delta = source.count(b"\n", start, new_end) - old.count(b"\n", start, old_end)
+
+        old_tree = previous.tree
+        old_tree.edit(start_byte=start, old_end_byte=old_end, new_end_byte=new_end,
+                      start_point=_point(old, start), old_end_point=_point(old, old_end),
+                      new_end_point=_point(source, new_end))
+        tree = parser.parse(source, old_tree, keep_text=False)
+
+        # Region to re-query, in new offsets: the edit plus whatever the re-parse restructured
+        lo, hi = start, new_end
+        if tree.root_node.has_error:
+            # Error recovery depends on the old tree; parse afresh so the symbols match a full parse
+            tree = parser.parse(source, keep_text=False)
+            lo, hi = 0, len(source)
+        else:
+            for changed in old_tree.get_changed_ranges(tree):
+                lo, hi = min(lo, changed.start_byte), max(hi, changed.end_byte)
+        while True:
+            # lo <= start and hi >= new_end, so the same region in old offsets is [lo, hi - delta]
+            before_region, after_region, replaced = [], [], []
+            for symbol in previous.symbols:
+                if symbol.start_byte > hi - delta:
+                    after_region.append(_shift(symbol, delta, line_delta) if delta or line_delta else symbol)
+                elif symbol.end_byte >= lo:
+                    replaced.append(symbol)
+                else:
+                    before_region.append(symbol)
+            # Widened by a byte so that symbols touching the region are captured too
+            captures = query.captures(tree.root_node, start_point=_point(source, max(lo - 1, 0)),
+                                      end_point=_point(source, min(hi + 1, len(source))))
+            fresh = [s for s in _symbols_from_captures(captures, source, ts_lang)
+                     if s.start_byte <= hi and s.end_byte >= lo]
+            widened = _widen_to_straddlers(replaced, fresh, lo, hi, delta)
+            if widened is None:
+                break
+            lo, hi = widened
+        retouched = None
+        if after_region:
+            # The first symbol after the region may take its leading comment from inside it
+            first = after_region[0]
+            nodes = [node for node, _ in query.captures(tree.root_node, start_point=_point(source, first.start_byte),
+                                                         end_point=_point(source, first.start_byte + 1))
+                     if (node.start_byte, node.end_byte) == (first.start_byte, first.end_byte)]
+            if nodes and _docstring(nodes[0], source) != first.docstring:
+                retouched = after_region[0] = first._replace(docstring=_docstring(nodes[0], source))
+        # Everything after the region follows the fresh symbols; a fresh one may enclose symbols before it
+        if fresh and before_region and fresh[0].start_byte < before_region[-1].end_byte:
+            before_region = sorted(before_region + fresh, key=lambda s: (s.start_byte, -s.end_byte))
+        else:
+            before_region += fresh
+        symbols = before_region + after_region
+
+        before = {}
+        for symbol in replaced:
+            before.setdefault(_symbol_key(symbol), symbol)
+        changed, added = [], []
+        for symbol in fresh:
+            old_symbol = before.pop(_symbol_key(symbol), None)
+            if old_symbol is None:
+                added.append(symbol)
+            elif old[old_symbol.start_byte:old_symbol.end_byte] != source[symbol.start_byte:symbol.end_byte]:
+                changed.append(symbol)
+        if retouched is not None:
+            changed.append(retouched)
+        removed = list(before.values())
+        # A class that changed only through its members is not worth reporting on its own
+        parents = {s.parent for s in changed + added + removed}
+        changed = [s for s in changed if s.name not in parents or s.kind not in CONTAINER_KINDS]
+        return tree, symbols, SymbolChanges(changed, added, removed)
 
 def get_missing_grammars():
     """
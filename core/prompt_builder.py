@@ -0,0 +1,114 @@
+"""
+Prompt assembly for the chat API.
+
+Requests are built as structured messages in a fixed order: system prompt,
+retained history, then the new user turn. Anything that changes per query
+(web search results, file excerpts) goes into the last user message, so the
+bytes before it are identical from one turn to the next and the server can
+reuse its KV cache for the whole prefix.
+"""
+from typing import Dict, List, NamedTuple, Optional
+
+
+class PromptCacheStats(NamedTuple):
+    """
+    Prefix-cache indicator for one request.
+    `prompt_tokens` is our estimate of the full prompt; `evaluated_tokens` is
+    the server's prompt_eval_count, i.e. tokens it actually had to prefill.
+    `prefix_stable` says whether the previous request is a prefix of this one.
+    The server does not report the prompt's total, so `reused_tokens` and
+    `hit_ratio` compare its exact count with our estimate: they are estimates
+    too, clamped to the range of the prompt.
+    """
+    prompt_tokens: int
+    evaluated_tokens: Optional[int]
+    prefix_stable: bool
+
+    @property
+    def reused_tokens(self) -> Optional[int]:
+        """Estimated tokens served from the KV cache, between 0 and `prompt_tokens`."""
+        if self.evaluated_tokens is None:
+            return None
+        return max(0, self.prompt_tokens - self.evaluated_tokens)
+
+    @property
+    def hit_ratio(self) -> Optional[float]:
+        """Estimated share of the prompt served from the KV cache, between 0 and 1."""
+        if self.evaluated_tokens is None or not self.prompt_tokens:
+            return None
+        return self.reused_tokens / self.prompt_tokens
+
+
+def turns_to_messages(turns: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    messages = []
+    for turn in turns:
+        messages.append({"role": "user", "content": turn["user"]})
+        messages.append({"role": "assistant", "content": turn["response"]})
+    return messages
+
+
+def build_messages(system_prompt: Optional[str], turns: List[Dict[str, str]], user_input: str,
+                   extra_context: Optional[str] = None, summary: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Build the message list for one chat request.
+    `extra_context` is per-query material (e.g. a web search result); it is
+    attached to the new user message rather than the system prompt.
+    `summary` condenses history older than `turns` and follows the system
+    prompt; it changes only after the history window has moved.
+    """
+    messages = []
+    if summary:
+        summary = f"Summary of the earlier conversation:\n{summary}"
+        system_prompt = f"{system_prompt}\n\n{summary}" if system_prompt else summary
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.extend(turns_to_messages(turns))
+    content = f"{extra_context}\n\n{user_input}" if extra_context else user_input
+    messages.append({"role": "user", "content": content})
+    return messages
+
+
+def messages_to_prompt(messages: List[Dict[str, str]]) -> str:
+    """Flatten chat messages into the single-string format used by `ollama run`."""
+    lines = []
+    for message in messages:
+        if message["role"] == "system":
+            lines.append(f"{message['content']}\n")
+        elif message["role"] == "user":
+            lines.append(f"User: {message['content']}")
+        else:
+            lines.append(f"Model: {message['content']}")
+    lines.append("Model:")
+    return "\n".join(lines)
+
+
+def is_prefix(previous: Optional[List[Dict[str, str]]], current: List[Dict[str, str]]) -> bool:
+    """True if every message of the previous request is repeated unchanged at the start of this one."""
+    if not previous:
+        return False
+    # The previous request ended with a user message whose answer now follows it.
+    return current[:len(previous)] == previous
+
+
+def stable_window_drop(token_counts: List[int], budget: int, retain_ratio: float = 0.5) -> int:
+    """
+    Given the token counts of the turns currently in the context window
+    (oldest first), return how many to drop from the front.
+
+    Nothing is dropped while the window fits the budget. Once it overflows,
+    enough turns are dropped to get back under `retain_ratio * budget`, so the
+    retained history is then byte-identical for the next several turns instead
+    of shifting by one turn (and invalidating the server's cache) every time.
+    The newest turn is kept whenever it fits the budget on its own.
+    """
+    total = sum(token_counts)
+    if total <= budget:
+        return 0
+    target = budget * retain_ratio
+    drop = 0
+    while drop < len(token_counts) and total > target:
+        total -= token_counts[drop]
+        drop += 1
+    if drop == len(token_counts) and token_counts and token_counts[-1] <= budget:
+        drop -= 1
+    return drop
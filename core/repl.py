@@ -1,7 +1,7 @@
 # core/repl.py
 
 tips = [
-    "[bold blue]/read <filepath>[/bold blue] — Load a file's content into the conversation.",
+    "[bold blue]/read <filepath>[:start-end][/bold blue] — Load a file (or a range of its lines) into the conversation.",
     "[bold blue]!ls[/bold blue] or any shell command — Run directly in the prompt!",
     "[bold blue]/models[/bold blue] — See available LLMs or switch to a different one.",
     "[bold blue]/forget_session[/bold blue] — Clear your conversation history/context.",
@@ -17,18 +17,21 @@ tips = [
     "Analyze code in Python, Swift, C, Java, JS, and more (tree-sitter powered)."
 ]
 
-import json
+import importlib
 import os
+import sys
 from core import model
-from core.stream_utils import stream_response
+from core.stream_utils import stream_markdown
+from core.io_utils import EscapeListener
+from core.prompt_builder import build_messages
+import itertools
+import threading
 from rich.console import Console
-from rich.syntax import Syntax
 from rich.panel import Panel
-from rich.markdown import Markdown
 from rich.prompt import Prompt
 from rich.table import Table
 from pathlib import Path
-import glob
+from typing import NamedTuple
 import shlex
 import re
 from prompt_toolkit import PromptSession
@@ -38,14 +41,29 @@ from core.model import fetch_webpage
 import time
 from datetime import datetime
 from rich.text import Text
-from pyfiglet import Figlet
+from rich.markup import escape
 from codechat.version_utils import get_version
 from core.system_prompts import system_prompt_agent, system_prompt_ask
 
 console = Console()
 
+# "CodeZ CLI" pre-rendered with pyfiglet's 'standard' font, so startup doesn't
+# import pyfiglet (and pkg_resources) just to draw a constant banner.
+ASCII_TITLE = (
+    "  ____          _      _____   ____ _     ___ \n"
+    " / ___|___   __| | ___|__  /  / ___| |   |_ _|\n"
+    "| |   / _ \\ / _` |/ _ \\ / /  | |   | |    | | \n"
+    "| |__| (_) | (_| |  __// /_  | |___| |___ | | \n"
+    " \\____\\___/ \\__,_|\\___/____|  \\____|_____|___|\n"
+)
+
+# Heavy renderers (markdown-it, pygments) are imported on first use, or in the
+# background once the prompt is up, instead of before the first prompt.
+DEFERRED_IMPORTS = ("rich.markdown", "rich.syntax")
+
 def print_error(message: str, title: str = "Error"):
     """Prints a Rich Panel formatted error message."""
+    from rich.markdown import Markdown
     console.print(Panel(Markdown(message), title=f"[bold red]{title}[/bold red]", border_style="red", expand=False))
 
 def get_system_prompt_for_mode(mode: str) -> str:
@@ -71,18 +89,27 @@ HELP_TEXT = """[bold cyan]🚀 CodeZ CLI — Command Reference[/bold cyan]
   [bold blue]'exit' or 'bye' [/bold blue]          End the session and save conversation
   [bold blue]/clear[/bold blue], [bold blue]clr[/bold blue]  Clear the terminal screen
   [bold blue]exit[/bold blue], [bold blue]'bye'[/bold blue]   Exit the REPL
+  [bold blue]ESC[/bold blue]              Cancel the answer currently being generated
 
 [bold green]Session & Context:[/bold green]
-  [bold blue]/load_session[/bold blue]   List and load a previous session as context
+  [bold blue]/load_session [text][/bold blue]  List (filtered by title) and load a previous session as context
   [bold blue]/forget_session[/bold blue] Forget the currently loaded session context
+  [bold blue]/history search <terms>[/bold blue]  Search all past questions and answers
 
 [bold green]AI & Tools:[/bold green]
   [bold blue]/mode <ask|build>[/bold blue]   Switch between 'ask' (Q&A) and 'build' (code editing/debug) modes
   [bold blue]/models[/bold blue]            Show or update the selected model
   [bold blue]/tools[/bold blue]             Enable or disable optional tools (e.g., websearch)
+  [bold blue]/stats[/bold blue]             Show prompt-cache reuse and output speed for the last query
+  [bold blue]/cache <on|off|stats|clear>[/bold blue]  Toggle the response cache; show or clear the response and file caches
+  [bold blue]/cache semantic <on|off>[/bold blue]  Reuse answers to paraphrased questions; [bold blue]/cache wrong[/bold blue] flags a bad match
 
 [bold green]Code & Files:[/bold green]
   [bold blue]/read <filepath>[/bold blue]   Read and display a file with syntax highlighting
+  [bold blue]/read <filepath>:<start>-<end>[/bold blue]  Show a range of lines (large files are shown a page at a time)
+  [bold blue]/index[/bold blue]             Index the functions of the current repository (only changed files are re-parsed)
+  [bold blue]/index find <name>[/bold blue]  List indexed functions matching a name
+  [bold blue]/index show <name>[/bold blue]  Show a function and add its source to your next question
   [bold blue]```[/bold blue]                Start multiline code input (type ``` again to finish)
 
 [bold green]Shell:[/bold green]
@@ -91,10 +118,17 @@ HELP_TEXT = """[bold cyan]🚀 CodeZ CLI — Command Reference[/bold cyan]
 [dim]Tip: Type /helpme or '/?' at any time to see this list. For more features, see the welcome message or documentation.[/dim]
 """
 
-read_file_cache = {}
+class FileRead(NamedTuple):
+    """What /read showed of a file, kept as context for the follow-up question."""
+    path: str
+    content: str
+    first_line: int
+    partial: bool  # a window of lines rather than the whole file
+    changes: str   # symbols changed since the previous read ("" when nothing did)
+
+# Rough memory per rendered segment beyond its text (the tuple and its string; styles are shared)
+SEGMENT_BYTES = 120
 
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-SESSION_DIR = os.path.join(PROJECT_ROOT, 'sessions')
 
 def summarize_response(response: str, max_lines: int = None) -> str:
     """Return the full response unless max_lines is set and exceeded."""
@@ -108,74 +142,413 @@ def format_code_blocks(text: str) -> str:
     # Replace markdown code blocks with triple backticks (if not already)
     return re.sub(r'```([a-zA-Z]*)\n', '```\n', text)
 
-def read_file_content(filepath: str, cache_context=True):
+def read_file_content(filepath: str):
+    """
+    Show a file for `/read path[:start-end]`: small files whole, larger ones
+    (or an explicit range) a page of lines at a time through a memory-mapped
+    view. Returns what was shown as a `FileRead` for the follow-up question,
+    or None if nothing was shown.
+
+    A whole file's decoded text and its highlighted rendering are kept in the
+    shared file cache, so reading an unchanged file again neither decodes nor
+    re-highlights it.
+    """
+    from rich.segment import Segments
+    from rich.syntax import Syntax
+    from core.file_cache import file_stamp, get_file_cache
+    from core.file_viewer import PAGE_LINES, WHOLE_FILE_BYTES, open_view, parse_read_target
+    target, start, end = parse_read_target(filepath)
     try:
-        path = Path(filepath).expanduser().resolve()
+        path = Path(target).expanduser().resolve()
         if not path.exists():
-            print_error(f"File not found: `{filepath}`")
-            return
+            print_error(f"File not found: `{target}`")
+            return None
         if not path.is_file():
-            print_error(f"`{filepath}` is not a file.")
-            return
-        content = path.read_text(encoding='utf-8')
+            print_error(f"`{target}` is not a file.")
+            return None
+        if end is not None and end < start:
+            print_error(f"Invalid line range `{start}-{end}`.", title="Command Error")
+            return None
+        key = str(path)
+        # Stamped before reading, so a change made while reading invalidates what is cached
+        stamp = file_stamp(key)
+        view = open_view(key)
+        if view.binary:
+            print_error(f"`{target}` looks like a binary file ({view.size:,} bytes); not shown.", title="File Read Error")
+            return None
         ext = path.suffix.lstrip('.')
-        syntax = Syntax(content, ext, theme="monokai", line_numbers=True, word_wrap=True)
-        console.print(Panel(syntax, title=f"[bold sky_blue1]File: {path.name}[/bold sky_blue1]\n[dim]{path}[/dim]", border_style="sky_blue1", expand=False))
-        if cache_context:
-            read_file_cache[str(path)] = content
+        title = f"[bold sky_blue1]File: {path.name}[/bold sky_blue1]\n[dim]{path}[/dim]"
+        if start is None and view.size <= WHOLE_FILE_BYTES:
+            cache = get_file_cache()
+            content = cache.get(key, "text")
+            # A hit means the file is unchanged since it was last read and parsed
+            changes, digest = "", None
+            if content is None:
+                content = view.text()
+                digest = view.digest()
+                cache.put(key, "text", content, sys.getsizeof(content), stamp, digest)
+                changes = track_symbol_changes(path, content.encode('utf-8'))
+            render_kind = f"render:{console.width}"
+            segments = cache.get(key, render_kind)
+            if segments is None:
+                syntax = Syntax(content, ext, theme="monokai", line_numbers=True, word_wrap=True)
+                segments = list(console.render(Panel(syntax, title=title, border_style="sky_blue1", expand=False)))
+                size = sum(len(segment.text) for segment in segments) + SEGMENT_BYTES * len(segments)
+                cache.put(key, render_kind, segments, size, stamp, digest or view.digest())
+            console.print(Segments(segments))
+            if changes:
+                console.print(f"[yellow]Changed since last read: {escape(changes)}[/yellow]")
+            file_read = FileRead(key, content, 1, False, changes)
+        else:
+            start = start or 1
+            window = view.window(start, end or start + PAGE_LINES - 1)
+            if window is None:
+                print_error(f"`{target}` has fewer than {start} lines.", title="Command Error")
+                return None
+            syntax = Syntax(window.text, ext, theme="monokai", line_numbers=True, word_wrap=True,
+                            start_line=window.start_line)
+            size = f"{view.size / 1e6:.1f} MB" if view.size >= 1e6 else f"{view.size:,} bytes"
+            total = f" of {view.line_count:,}" if view.line_count is not None else ""
+            subtitle = f"lines {window.start_line:,}-{window.end_line:,}{total} · {size} · {view.encoding}"
+            console.print(Panel(syntax, title=title, subtitle=f"[dim]{subtitle}[/dim]", border_style="sky_blue1", expand=False))
+            if window.truncated:
+                console.print("[yellow]This range is too long to show in full; it was cut off.[/yellow]")
+            if not window.at_eof:
+                page = window.end_line - window.start_line + 1
+                console.print(f"[dim]Next: /read {escape(target)}:{window.end_line + 1}-{window.end_line + page}[/dim]")
+                # The next page is the likeliest request; have its pages read in meanwhile
+                view.prefetch(window.end_line + 1, window.end_line + page)
+            if window.start_line > 1:
+                view.prefetch(max(1, window.start_line - PAGE_LINES), window.start_line - 1)
+            file_read = FileRead(key, window.text, window.start_line, True, "")
+        return file_read
     except Exception as e:
         print_error(f"Could not read file `{filepath}`: {e}", title="File Read Error")
+        return None
 
-def load_previous_session(session_dir=SESSION_DIR):
-    session_files = sorted(glob.glob(os.path.join(session_dir, "session_*.json")), reverse=True)
-    if not session_files:
-        return []
-    latest_session = session_files[0]
+_parse_cache = None
+
+def get_parse_cache():
+    """Parse trees of the files shown with /read, for incremental re-parsing."""
+    global _parse_cache
+    if _parse_cache is None:
+        from core.parser import ParseCache
+        _parse_cache = ParseCache()
+    return _parse_cache
+
+def file_context(file_read: FileRead, question: str, model_name=None) -> str:
+    """
+    What /read showed of a file as context for `question`: whole when it fits
+    the read budget (CODEZ_READ_CONTEXT_TOKENS), else its most relevant
+    sections with line anchors.
+    """
+    from core.context_packer import default_embedder, pack_file
+    from core.tokenizer import get_token_counter
+    filepath = file_read.path
+    # A window must not replace the whole-file tree kept for change tracking
+    packed = pack_file(filepath, file_read.content, question, token_counter=get_token_counter(model_name),
+                       embedder=default_embedder(), parse_cache=None if file_read.partial else get_parse_cache(),
+                       first_line=file_read.first_line)
+    if not packed.complete:
+        console.print(f"[dim]File is too large to send whole: using {len(packed.chunks)} of {packed.total_chunks} "
+                      f"sections most relevant to your question ({packed.tokens} tokens).[/dim]")
+    if file_read.partial and packed.complete:
+        last = file_read.first_line + file_read.content.count("\n")
+        context = f"File content (lines {file_read.first_line}-{last} of {filepath}):\n{packed.text}"
+    else:
+        context = f"File content:\n{packed.text}"
+    if file_read.changes:
+        context += f"\n\nChanged since the previous read: {file_read.changes}"
+    return context
+
+def describe_symbol_changes(changes) -> str:
+    """One line naming the changed, added and removed symbols, with their line ranges."""
+    parts = [f"{s.name} (lines {s.start_line}-{s.end_line})" for s in changes.changed]
+    parts += [f"{s.name} (added, lines {s.start_line}-{s.end_line})" for s in changes.added]
+    parts += [f"{s.name} (removed)" for s in changes.removed]
+    return ", ".join(parts)
+
+def track_symbol_changes(path, data: bytes) -> str:
+    """
+    Re-parse a file read with /read incrementally against its previous read
+    and describe the symbols that changed ("" on the first read, without a
+    grammar, or when nothing changed).
+    """
+    from core import parser as ts_parser
+    language = ts_parser.language_for_path(str(path))
+    if not language or not ts_parser.grammar_available(language):
+        return ""
     try:
-        with open(latest_session, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print_error(f"Failed to load previous session: {e}", title="Session Load Error")
-        return []
+        result = get_parse_cache().parse(str(path), data, language)
+    except Exception:
+        return ""  # the file is still shown; change tracking is best effort
+    return describe_symbol_changes(result.changes) if result.changes else ""
 
-def list_sessions(session_dir=SESSION_DIR):
-    session_files = sorted(glob.glob(os.path.join(session_dir, "session_*.json")), reverse=True)
-    return session_files
+def open_session_memory(model_name, persist=True):
+    """
+    Open the session store for the current directory: import any transcripts
+    left in `sessions/` by older versions, then resume this project's latest
+    session (or start a new one).
+    """
+    from core.llm_interactive import LLMInteractiveSession
+    from core.sqlite_memory import session_dir
+    agent = LLMInteractiveSession(model_name=model_name, persist=persist, project_root=os.getcwd(), resume=False)
+    if persist:
+        agent.memory.import_json_sessions(session_dir())
+        agent.memory.resume_latest(os.getcwd())
+    return agent
 
-def select_session(session_files):
-    table = Table(title="[bold sky_blue1]Available Sessions[/bold sky_blue1]", border_style="sky_blue1", show_lines=True)
-    table.add_column("Index", justify="right", style="cyan", no_wrap=True)
-    table.add_column("File Path", style="magenta", no_wrap=False) # Allow wrap for long paths
-    table.add_column("Last Modified", style="yellow", no_wrap=True)
+SESSION_PAGE_SIZE = 10
 
-    for idx, filepath_str in enumerate(session_files):
-        try:
-            mtime = os.path.getmtime(filepath_str)
-            last_modified_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
-        except Exception:
-            last_modified_str = "N/A"
-        table.add_row(str(idx), filepath_str, last_modified_str)
-
-    console.print(Panel(table, expand=False, title="[dim]Load Session[/dim]"))
-
-    idx = Prompt.ask(
-        "[bold blue]Enter session index to load[/bold blue]",
-        choices=[str(i) for i in range(len(session_files))],
-        default="0"
-    )
-    return session_files[int(idx)]
+def select_session(memory, search=None, page_size=SESSION_PAGE_SIZE):
+    """
+    Page through the session catalog (newest first, titles containing
+    `search` if given) and return the id the user picks, or None.
+    Only the rows on screen are read; a session's turns are loaded when it is used.
+    """
+    total = memory.count_sessions(search=search)
+    if not total:
+        return None
+    page = 0
+    pages = (total + page_size - 1) // page_size
+    while True:
+        sessions = memory.list_sessions(limit=page_size, offset=page * page_size, search=search)
+        table = Table(title="[bold sky_blue1]Available Sessions[/bold sky_blue1]", border_style="sky_blue1", show_lines=True)
+        table.add_column("Index", justify="right", style="cyan", no_wrap=True)
+        table.add_column("Title", style="magenta", no_wrap=False) # Allow wrap for long titles
+        table.add_column("Project", style="dim", no_wrap=False)
+        table.add_column("Model", style="dim", no_wrap=True)
+        table.add_column("Turns", justify="right", no_wrap=True)
+        table.add_column("Tokens", justify="right", no_wrap=True)
+        table.add_column("Last Updated", style="yellow", no_wrap=True)
+
+        for idx, info in enumerate(sessions):
+            last_updated_str = datetime.fromtimestamp(info.updated).strftime('%Y-%m-%d %H:%M:%S')
+            table.add_row(str(idx), info.title or "(untitled)", info.project_root or "-", info.model or "-",
+                          str(info.turn_count), str(info.total_tokens), last_updated_str)
+
+        console.print(Panel(table, expand=False, title=f"[dim]Load Session — page {page + 1}/{pages}, {total} sessions[/dim]"))
+
+        choices = [str(i) for i in range(len(sessions))] + ["q"]
+        if page + 1 < pages:
+            choices.append("n")
+        if page > 0:
+            choices.append("p")
+        idx = Prompt.ask(
+            "[bold blue]Enter session index to load[/bold blue] [dim](n/p: next/previous page, q: cancel)[/dim]",
+            choices=choices,
+            default="0",
+            show_choices=False
+        )
+        if idx == "q":
+            return None
+        if idx in ("n", "p"):
+            page += 1 if idx == "n" else -1
+            continue
+        return sessions[int(idx)].id
+
+def handle_load_session(session_agent, args):
+    """`/load_session [text]`: pick a stored session (titles containing `text`) and continue it."""
+    search = " ".join(args) or None
+    session_id = select_session(session_agent.memory, search=search)
+    if session_id is None:
+        if not session_agent.memory.count_sessions(search=search):
+            console.print("[yellow]No previous sessions found.[/yellow]") # Info, not error
+        return
+    info = session_agent.switch_session(session_id)
+    console.print(f"[green]Loaded session #{info.id}: {info.title or '(untitled)'}[/green]")
 
-def load_session_file(filepath):
-    try:
-        with open(filepath, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print_error(f"Failed to load session from `{filepath}`: {e}", title="Session Load Error")
-        return []
+def print_prompt_cache_stats(stats):
+    """Show how much of the last prompt the server could reuse from its KV cache."""
+    if stats is None:
+        console.print("[yellow]No model query yet in this session.[/yellow]")
+        return
+    table = Table(title="[bold sky_blue1]Last Prompt[/bold sky_blue1]", border_style="sky_blue1", show_header=False)
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", justify="right")
+    table.add_row("Prompt tokens (est.)", str(stats.prompt_tokens))
+    if stats.evaluated_tokens is None:
+        table.add_row("Prefilled by server", "[dim]n/a[/dim]")
+    else:
+        table.add_row("Prefilled by server", str(stats.evaluated_tokens))
+        table.add_row("Reused from cache (est.)", f"~{stats.reused_tokens} ({stats.hit_ratio:.0%})")
+    table.add_row("Prefix unchanged", "[green]yes[/green]" if stats.prefix_stable else "[yellow]no[/yellow]")
+    console.print(Panel(table, expand=False))
+
+def print_stream_stats(stats):
+    """One dim line on how fast streamed text reached the terminal, and in how many writes."""
+    console.print(f"[dim]{stats.chars:,} chars in {stats.seconds:.1f}s: {stats.chars_per_second:,.0f} chars/s, "
+                  f"{stats.frames:,} frames ({stats.frames_per_second:.0f}/s)[/dim]")
+
+def report_cache_hit(stats):
+    if not stats.get("cache_hit"):
+        return
+    if "semantic_similarity" in stats:
+        console.print(
+            f"[dim]⚡ Cached answer to a similar question: “{stats['cached_question']}” "
+            f"(similarity {stats['semantic_similarity']:.2f}, saved {stats['saved_seconds']:.1f}s). "
+            "Type /cache wrong if it doesn't answer yours.[/dim]"
+        )
+    else:
+        console.print(f"[dim]⚡ Served from response cache (saved {stats['saved_seconds']:.1f}s)[/dim]")
+
+def highlight_match(snippet: str) -> str:
+    """Rich markup for a search snippet, with the «matched» words in bold."""
+    return escape(snippet).replace("«", "[bold yellow]").replace("»", "[/bold yellow]")
+
+_symbol_index = None
 
-def ensure_session_dir():
-    if not os.path.exists(SESSION_DIR):
-        os.makedirs(SESSION_DIR)
+def get_symbol_index():
+    """The symbol index of the repository the REPL was started in (opened on first use)."""
+    global _symbol_index
+    if _symbol_index is None:
+        from core.symbol_index import SymbolIndex
+        _symbol_index = SymbolIndex(os.getcwd())
+    return _symbol_index
+
+def handle_index_command(args):
+    """
+    `/index`, `/index find <name>`, `/index show <name>`. Returns the source
+    text to attach to the next question for `show`, else None.
+    """
+    index = get_symbol_index()
+    if not args:
+        from core.symbol_index import print_index_stats
+        with console.status("[bold cyan]Indexing repository...[/bold cyan]"):
+            stats = index.update()
+        print_index_stats(stats, console)
+        return None
+    if len(args) < 2 or args[0].lower() not in ("find", "show"):
+        print_error("Usage: `/index [find <name> | show <name>]`", title="Command Error")
+        return None
+    name = " ".join(args[1:])
+    symbols = index.find(name)
+    if not symbols:
+        # First use, or the function is new: bring the index up to date once
+        index.update()
+        symbols = index.find(name)
+    if not symbols:
+        console.print(f"[yellow]No indexed function matches '{escape(name)}'. Run /index to refresh the index.[/yellow]")
+        return None
+    if args[0].lower() == "find":
+        table = Table(title=f"[bold sky_blue1]Symbols: {escape(name)}[/bold sky_blue1]", border_style="sky_blue1")
+        table.add_column("Name", style="magenta")
+        table.add_column("Kind", style="cyan")
+        table.add_column("Location", style="yellow")
+        for symbol in symbols:
+            table.add_row(escape(symbol.name), symbol.kind, f"{symbol.path}:{symbol.start_line}-{symbol.end_line}")
+        console.print(table)
+        return None
+    symbol = symbols[0]
+    try:
+        source = index.source(symbol)
+    except (LookupError, OSError):
+        index.update()
+        symbols = index.find(symbol.name)
+        if not symbols:
+            print_error(f"`{symbol.name}` is no longer in {symbol.path}.", title="Index Error")
+            return None
+        symbol = symbols[0]
+        source = index.source(symbol)
+    from rich.syntax import Syntax
+    location = f"{symbol.path}:{symbol.start_line}-{symbol.end_line}"
+    console.print(Panel(Syntax(source, symbol.language, line_numbers=True, start_line=symbol.start_line),
+                        title=f"{symbol.name} ({location})", border_style="green"))
+    if len(symbols) > 1:
+        console.print(f"[dim]{len(symbols) - 1} more match(es); /index find {escape(name)} lists them.[/dim]")
+    console.print("[green]Its source will be included with your next question.[/green]")
+    return f"Source of {symbol.name} ({location}):\n```{symbol.language}\n{source}\n```"
+
+def handle_history_command(session_agent, args):
+    """`/history search <terms>`: full-text search over all stored turns."""
+    if len(args) < 2 or args[0].lower() != "search":
+        print_error("Usage: `/history search <terms>`", title="Command Error")
+        return
+    memory = session_agent.memory
+    if not getattr(memory, "fts_enabled", False):
+        print_error("History search needs the persistent session store with SQLite FTS5.", title="History Error")
+        return
+    terms = " ".join(args[1:])
+    shown = escape(terms)
+    start = time.perf_counter()
+    hits = memory.search(terms)
+    elapsed = (time.perf_counter() - start) * 1000
+    if not hits:
+        console.print(f"[yellow]No turns match '{shown}'.[/yellow]")
+        return
+    table = Table(title=f"[bold sky_blue1]History: {shown}[/bold sky_blue1]", border_style="sky_blue1", show_lines=True)
+    table.add_column("Session", justify="right", style="cyan", no_wrap=True)
+    table.add_column("When", style="yellow", no_wrap=True)
+    table.add_column("Question", style="magenta")
+    table.add_column("Answer")
+    for hit in hits:
+        when = datetime.fromtimestamp(hit.created).strftime('%Y-%m-%d %H:%M')
+        table.add_row(f"#{hit.session_id}", when, highlight_match(hit.user), highlight_match(hit.response))
+    console.print(table)
+    console.print(f"[dim]{len(hits)} matches in {elapsed:.1f} ms — /load_session to continue one of these sessions[/dim]")
+
+def handle_cache_command(args):
+    """`/cache [stats|clear|on|off|semantic on|off|wrong]` for the response, semantic and file caches."""
+    from core import response_cache, semantic_cache
+    from core.file_cache import get_file_cache
+    action = args[0].lower() if args else "stats"
+    if action == "semantic" and len(args) > 1 and args[1].lower() in ("on", "off"):
+        enable = args[1].lower() == "on"
+        if enable and not semantic_cache.is_available():
+            print_error("The semantic cache needs NumPy: pip install 'codez-cli[semantic]'", title="Cache Error")
+            return
+        semantic_cache.set_enabled(enable)
+        if semantic_cache.is_enabled() != enable:
+            console.print(f"[yellow]{semantic_cache.SEMANTIC_ENV} is set and overrides this setting.[/yellow]")
+        else:
+            console.print(f"✅ [green]Semantic cache {'enabled' if enable else 'disabled'}.[/green]")
+    elif action == "wrong":
+        if semantic_cache.is_enabled() and semantic_cache.get_cache().mark_false_hit():
+            console.print("[green]Thanks — that cached answer was dropped. Ask again to get a fresh one.[/green]")
+        else:
+            console.print("[yellow]The last answer did not come from the semantic cache.[/yellow]")
+    elif action in ("on", "off"):
+        response_cache.set_enabled(action == "on")
+        if response_cache.is_enabled() != (action == "on"):
+            console.print(f"[yellow]{response_cache.CACHE_ENV} is set and overrides this setting.[/yellow]")
+        else:
+            console.print(f"✅ [green]Response cache {'enabled' if action == 'on' else 'disabled'}.[/green]")
+    elif action == "clear":
+        response_cache.get_cache().clear()
+        if semantic_cache.is_enabled():
+            semantic_cache.get_cache().clear()
+        get_file_cache().clear()
+        console.print("[green]Response and file caches cleared.[/green]")
+    elif action == "stats":
+        stats = response_cache.get_cache().stats()
+        table = Table(title="[bold sky_blue1]Response Cache[/bold sky_blue1]", border_style="sky_blue1", show_header=False)
+        table.add_column("Metric", style="cyan")
+        table.add_column("Value", justify="right")
+        table.add_row("Enabled", "[green]yes[/green]" if response_cache.is_enabled() else "[yellow]no[/yellow]")
+        table.add_row("Entries", str(stats.entries))
+        table.add_row("Size", f"{stats.bytes / 1024:.1f} KiB")
+        table.add_row("Hits / misses", f"{stats.hits} / {stats.misses} ({stats.hit_rate:.0%})")
+        table.add_row("Evictions", str(stats.evictions))
+        table.add_row("Time saved", f"{stats.saved_seconds:.1f}s")
+        if semantic_cache.is_enabled():
+            sem = semantic_cache.get_cache().stats()
+            table.add_section()
+            table.add_row("Semantic entries", str(sem.entries))
+            table.add_row("Semantic hits", f"{sem.hits} / {sem.lookups} ({sem.hit_rate:.0%})")
+            table.add_row("False hits", f"{sem.false_hits} ({sem.false_hit_rate:.0%})")
+            table.add_row("Threshold", f"{sem.threshold:.2f}")
+        else:
+            table.add_row("Semantic cache", "[yellow]off[/yellow]")
+        files = get_file_cache().stats()
+        table.add_section()
+        table.add_row("File entries", str(files.entries))
+        table.add_row("File cache size", f"{files.bytes / 2**20:.1f} / {files.max_bytes / 2**20:.0f} MiB")
+        table.add_row("File hits / misses", f"{files.hits} / {files.misses} ({files.hit_rate:.0%})")
+        table.add_row("File evictions", str(files.evictions))
+        table.add_row("Files changed on disk", str(files.invalidations))
+        console.print(Panel(table, expand=False))
+    else:
+        print_error("Usage: /cache <on|off|stats|clear|semantic on|off|wrong>", title="Command Error")
 
 def show_tools():
     instruction = "[cyan]Type tool name to toggle, or Enter to exit.[/cyan]"
@@ -205,6 +578,7 @@ def show_tools():
 
 def print_code_snippet(snippet: str, language: str = ""):
     """Print code or text as a formatted snippet in the terminal using Rich."""
+    from rich.syntax import Syntax
     if not language:
         language = "text"
     try:
@@ -215,6 +589,7 @@ def print_code_snippet(snippet: str, language: str = ""):
         console.print(Panel(snippet, title="Snippet"))
 
 def multiline_code_input(prompt_session=None):
+    from rich.markdown import Markdown
     instruction_text = Markdown("""\
 Enter your code snippet below.
 - Type ` ``` ` on a new line to **start** the block.
@@ -257,26 +632,15 @@ def print_welcome():
         __version__ = get_version()
     except Exception:
         __version__ = "unknown"
-    try:
-        f = Figlet(font='standard')  # 'slant' or 'standard' are good choices
-        ascii_art_title = f.renderText("CodeZ CLI")
-
-        # Use full bold bright magenta for the ASCII + center it
-        console.print(Text(ascii_art_title, style="bold bright_magenta"), justify="center")
+    # Use full bold bright magenta for the ASCII + center it
+    console.print(Text(ASCII_TITLE, style="bold bright_magenta"), justify="center")
 
-        # Tagline and version info
-        tagline = Text("CodeZ CLI – When AI Takes a Break, We Don’t!", style="bold green")
-        version = Text(f"v{__version__}", style="bold cyan")
+    # Tagline and version info
+    tagline = Text("CodeZ CLI – When AI Takes a Break, We Don’t!", style="bold green")
+    version = Text(f"v{__version__}", style="bold cyan")
 
-        console.print(tagline, justify="center")
-        console.print(version, justify="center")
-
-    except Exception as e:
-        # Fallback text if Figlet fails
-        console.print("[bold bright_magenta]CodeZ CLI[/bold bright_magenta]", justify="center", style="italic")
-        console.print("[bold yellow]When AI Takes a Break, We Don’t![/bold yellow]", justify="center")
-        console.print(f"[cyan]v{__version__}[/cyan]", justify="center")
-        print_error(f"Could not render Figlet title: {e}", "Display Warning")
+    console.print(tagline, justify="center")
+    console.print(version, justify="center")
 
     # Show welcome message (features) directly after tagline and version
     selected_tip = random.choice(tips)
@@ -357,15 +721,30 @@ def print_tips():
     console.print() # Add a newline after the panel
 
 
-def run(with_memory=True):
+def run(with_memory=True, startup_profile=False):
     """
     Main REPL loop. If with_memory is True, use contextual replies (session memory), else stateless mode.
+    With startup_profile, print a per-phase startup timeline before the first prompt.
     """
     from core import model as model_mod
-    from core.llm_interactive import LLMInteractiveSession
-    # Model selection at the start
-    models, err = model_mod.get_ollama_models()
-    saved_model = load_model_choice()
+    from core.startup import StartupTimeline
+    timeline = StartupTimeline()
+    with timeline.phase("config"):
+        saved_model = load_model_choice()
+    # Discovery, warm-up and session loading run while the banner renders
+    models_future = timeline.run_in_background("models", model_mod.get_ollama_models, interactive=False)
+    if saved_model:
+        timeline.run_in_background("warm-up", model_mod.preload_model, saved_model)
+    memory_future = timeline.run_in_background("memory", open_session_memory, saved_model, persist=with_memory)
+    with timeline.phase("banner"):
+        print_welcome()
+
+    # Model selection
+    with timeline.phase("models (wait)"):
+        models, err = models_future.result()
+    if not err and not models:
+        # Nothing installed: ask (in the foreground) whether to pull the default model
+        models, err = model_mod.get_ollama_models()
     selected_model = None
     if err:
         print_error(err, title="Ollama Error")
@@ -387,35 +766,32 @@ def run(with_memory=True):
             if save in ["y", "yes"]:
                 save_model_choice(selected_model)
                 console.print(f"[green]Model '{selected_model}' saved for future sessions.[/green]")
+            timeline.run_in_background("warm-up", model_mod.preload_model, selected_model)
     else:
         print_error("No models found in Ollama. Please add a model using `ollama pull <model_name>` and then restart.", title="Ollama Model Error")
         return
 
-    # console.print("[bold green]Welcome to CodeZ CLI. Type 'exit' or 'bye' to end session.[/bold green]")
-    print_welcome()
-    ensure_session_dir()
-    session = []
-    session_file = os.path.join(SESSION_DIR, f"session_{os.getpid()}.json")
-    prev_context = load_previous_session()
-    # Load all previous session turns for context
-    all_session_turns = load_all_sessions()
-    if prev_context:
-        console.print("[yellow]Loaded previous session context.[/yellow]")
     websearch_prompted = False
-    prompt_session = PromptSession()
+    with timeline.phase("prompt session"):
+        prompt_session = PromptSession()
     last_thinking = None  # Store last thinking process
     current_mode = "build"  # Default mode
+    pinned_context = None  # Source pulled in with /index show, sent with the next question
 
     # Session memory setup
-    session_agent = LLMInteractiveSession(
-        model_name=selected_model,
-        persist=with_memory
-    )
-
+    with timeline.phase("memory (wait)"):
+        session_agent = memory_future.result()
+    session_agent.model_name = selected_model
+    resumed = session_agent.memory.get_session() if session_agent.memory.session_id is not None else None
+    if resumed:
+        console.print(f"[yellow]Resumed session #{resumed.id} ({resumed.turn_count} turns): {resumed.title}[/yellow]")
+    timeline.mark("prompt ready")
+    if startup_profile:
+        console.print(timeline.render())
+    # Warm the renderers while the user types the first question
+    for module_name in DEFERRED_IMPORTS:
+        timeline.run_in_background(f"import {module_name}", importlib.import_module, module_name)
 
-    esc_stop = False  # Flag to indicate ESC was pressed to stop all processing
-    model_thread = None  # Track the model generation thread
-    model_stop_event = None  # Event to signal thread cancellation
     while True:
         try:
             with patch_stdout():
@@ -428,28 +804,15 @@ def run(with_memory=True):
         except KeyboardInterrupt:
             # CTRL+C pressed: trigger end/quit command
             console.print("[yellow]Session ended by CTRL+C. Saving context...[/yellow]")
-            ensure_session_dir()
-            with open(session_file, "w") as f:
-                json.dump(session, f, indent=2)
             break
         except EOFError:
-            # ESC pressed: stop all processing, clear session state, and return to prompt
-            esc_stop = True
-            console.print("[cyan]ESC pressed. Stopping all processing and clearing session state. Ready for next command.[/cyan]")
-            # Optionally clear session memory/context if desired:
-            prev_context = []
+            if not sys.stdin.isatty():
+                # Input closed or piped and used up: end the session like /exit
+                break
+            # Ctrl+D at the prompt: clear session state and return to prompt.
+            # (A running generation is cancelled with ESC, see stream_model_response.)
+            console.print("[cyan]Clearing session state. Ready for next command.[/cyan]")
             last_thinking = None
-            # If a model thread is running, signal it to stop and join
-            if model_thread is not None and model_thread.is_alive():
-                if model_stop_event is not None:
-                    model_stop_event.set()
-                model_thread.join(timeout=2)
-                model_thread = None
-                model_stop_event = None
-            continue
-        if esc_stop:
-            # If ESC was pressed, skip any further processing and reset flag
-            esc_stop = False
             continue
         # Detect code block start for multiline input
         if query.strip() == '```':
@@ -501,11 +864,12 @@ def run(with_memory=True):
                 if not filepath:
                     print_error("No file path provided for `/read` command.", title="Command Error")
                     continue
-                read_file_content(filepath)
+                file_read = read_file_content(filepath)
+                if file_read is None:
+                    continue
                 console.print(f"[yellow]Finished reading {filepath}. Do you need any assistance with this file? (yes/no)[/yellow]")
                 followup = console.input("[bold blue]>>> [/bold blue]").strip().lower()
                 if followup in ["yes", "y"]:
-                    file_content = read_file_cache.get(str(Path(filepath).expanduser().resolve()), "")
                     console.print("[green]You can now ask questions about this file. Your next question will use its content as context.[/green]")
                     user_q = console.input("[bold blue]>>> [/bold blue]")
                     system_prompt = (
@@ -519,18 +883,24 @@ def run(with_memory=True):
                             " If you need more information, you are allowed to use the websearch tool to search the web for relevant content. "
                             "Use the websearch tool only if it is enabled by the user."
                         )
-                    full_prompt = f"{system_prompt}\n\nFile content:\n{file_content}\n\nUser question: {user_q}"
-                    with console.status("[bold cyan]Thinking deeply about the file and your question..."):
-                        response = model.query_ollama(full_prompt, selected_model)
-                        last_thinking = summarize_response(response)
-                    # Stream the model response
-                    console.print("[bold magenta]CodeZ:[/bold magenta]", end=" ")
-                    # Stream the model response character by character
-                    from core.stream_utils import stream_response
-                    stream_response(last_thinking, console=console, delay=0.01)
-                    # Optionally, for code snippets, you can still use print_llm_response_with_snippets if needed
-                    # print_llm_response_with_snippets(last_thinking)
-                    session.append({"user": user_q, "response": response, "file": str(Path(filepath).expanduser().resolve())})
+                    # File content first, question last: re-asking about the same file reuses the cached prefix
+                    messages = build_messages(system_prompt, [], f"User question: {user_q}", extra_context=file_context(file_read, user_q, selected_model))
+                    stop_event = threading.Event()
+                    read_stats = {}
+                    try:
+                        with session_agent.generating():
+                            response = stream_model_response(
+                                model.stream_chat(messages, selected_model, stop_event=stop_event, stats=read_stats, question=f"User question: {user_q}"),
+                                status_text="[bold cyan]Thinking deeply about the file and your question...",
+                                stop_event=stop_event,
+                            )
+                    except Exception as e:
+                        print_error(f"Ollama model query failed: {e}\nPlease ensure Ollama is running and the model (`{selected_model}`) is available.", title="Ollama Query Error")
+                        continue
+                    report_cache_hit(read_stats)
+                    last_thinking = summarize_response(response)
+                    if response.strip():
+                        session_agent.memory.add_turn(user_q, response, meta={"file": file_read.path, "cancelled": stop_event.is_set()})
                 continue
             # Only split for other tool commands if not /read
             cmd = shlex.split(query.strip())
@@ -571,11 +941,26 @@ def run(with_memory=True):
                 if last_thinking:
                     console.print("[bold blue]--- Thought Process ---[/bold blue]")
                     from core.stream_utils import stream_thinking
-                    stream_thinking(last_thinking, console)
+                    stream_stats = stream_thinking(last_thinking, console)
                     console.print("[bold blue]----------------------[/bold blue]")
+                    print_stream_stats(stream_stats)
                 else:
                     console.print("[yellow]No thought process available for the last response.[/yellow]")
                 continue
+            if cmd[0] == "/stats":
+                print_prompt_cache_stats(session_agent.last_stats)
+                if _last_stream_stats is not None:
+                    print_stream_stats(_last_stream_stats)
+                continue
+            if cmd[0] == "/cache":
+                handle_cache_command(cmd[1:])
+                continue
+            if cmd[0] == "/history":
+                handle_history_command(session_agent, cmd[1:])
+                continue
+            if cmd[0] == "/index":
+                pinned_context = handle_index_command(cmd[1:]) or pinned_context
+                continue
             elif cmd[0] == "/mode":
                 if len(cmd) < 2:
                     print_error("Usage: /mode <ask|build>", title="Command Error")
@@ -588,8 +973,11 @@ def run(with_memory=True):
                     print_error(f"Unknown mode: `{new_mode}`. Available modes are 'ask' and 'build'.", title="Command Error")
                 continue
             # Add more tool commands here as needed
+            if cmd[0] == "/load_session":
+                handle_load_session(session_agent, cmd[1:])
+                continue
             if cmd[0] == "/forget_session":
-                prev_context = []
+                session_agent.new_session()
                 console.print("[yellow]Previous session context forgotten. You are now starting fresh.[/yellow]")
                 continue
             # Unknown tool command
@@ -626,9 +1014,6 @@ def run(with_memory=True):
             continue
         if query.strip().lower() in ["exit", "bye"]:
             console.print("[yellow]Session ended. Saving context...[/yellow]")
-            ensure_session_dir()
-            with open(session_file, "w") as f:
-                json.dump(session, f, indent=2)
             break
         if query.strip().startswith("/helpme" or query.strip() == "/?"):
             console.print(HELP_TEXT)
@@ -637,7 +1022,7 @@ def run(with_memory=True):
             show_tools()
             continue
         if query.strip().startswith("/forget_session"):
-            prev_context = []
+            session_agent.new_session()
             console.print("[yellow]Previous session context forgotten. You are now starting fresh.[/yellow]")
             continue
         if query.strip().lower() in ["clr", "/clear"]:
@@ -656,11 +1041,12 @@ def run(with_memory=True):
             if not filepath:
                 print_error("No file path provided for `/read` command.", title="Command Error")
                 continue
-            read_file_content(filepath)
+            file_read = read_file_content(filepath)
+            if file_read is None:
+                continue
             console.print(f"✅ [yellow]Finished reading {filepath}. Do you need any assistance with this file? (yes/no)[/yellow]")
             followup = console.input("[bold blue]>>> [/bold blue]").strip().lower()
             if followup in ["yes", "y"]:
-                file_content = read_file_cache.get(str(Path(filepath).expanduser().resolve()), "")
                 console.print("[green]You can now ask questions about this file. Your next question will use its content as context.[/green]")
                 user_q = console.input("[bold blue]>>> [/bold blue]")
                 system_prompt = (
@@ -674,38 +1060,30 @@ def run(with_memory=True):
                         " If you need more information, you are allowed to use the websearch tool to search the web for relevant content. "
                         "Use the websearch tool only if it is enabled by the user."
                     )
-                full_prompt = f"{system_prompt}\n\nFile content:\n{file_content}\n\nUser question: {user_q}"
-                response = None
+                # File content first, question last: re-asking about the same file reuses the cached prefix
+                messages = build_messages(system_prompt, [], f"User question: {user_q}", extra_context=file_context(file_read, user_q, selected_model))
+                stop_event = threading.Event()
+                read_stats = {}
                 try:
-                    with console.status("[bold cyan]Thinking deeply about the file and your question..."):
-                        # This is not in a separate thread, so direct try-except is fine
-                        response = model.query_ollama(full_prompt, selected_model)
-                    last_thinking = summarize_response(response) # response is str
+                    with session_agent.generating():
+                        response = stream_model_response(
+                            model.stream_chat(messages, selected_model, stop_event=stop_event, stats=read_stats, question=f"User question: {user_q}"),
+                            status_text="[bold cyan]Thinking deeply about the file and your question...",
+                            stop_event=stop_event,
+                        )
                 except Exception as e:
                     print_error(f"Ollama model query failed: {e}\nPlease ensure Ollama is running and the model (`{selected_model}`) is available.", title="Ollama Query Error")
-                    session.append({"user": user_q, "response": f"Error: {e}", "file": str(Path(filepath).expanduser().resolve())})
                     continue # Skip response processing
-
-                # Stream the model response
-                console.print("[bold magenta]CodeZ:[/bold magenta]", end=" ")
-                # Stream the model response character by character
-                from core.stream_utils import stream_response
-                stream_response(last_thinking, console=console, delay=0.01)
-                # Optionally, for code snippets, you can still use print_llm_response_with_snippets if needed
-                # print_llm_response_with_snippets(last_thinking)
-                session.append({"user": user_q, "response": response, "file": str(Path(filepath).expanduser().resolve())})
+                report_cache_hit(read_stats)
+                last_thinking = summarize_response(response) # response is str
+                if response.strip():
+                    session_agent.memory.add_turn(user_q, response, meta={"file": file_read.path, "cancelled": stop_event.is_set()})
             continue
         if query.strip().startswith("/load_session"):
-            session_files = list_sessions()
-            if not session_files:
-                console.print("[yellow]No previous session files found in `sessions/` directory.[/yellow]") # Info, not error
-                continue
-            selected = select_session(session_files)
-            prev_context = load_session_file(selected) # Errors handled in load_session_file
-            console.print(f"[green]Loaded session: {selected}[/green]")
+            handle_load_session(session_agent, shlex.split(query.strip())[1:])
             continue
         if query.strip().startswith("/forget_session"):
-            prev_context = []
+            session_agent.new_session()
             console.print("[yellow]Previous session context forgotten. You are now starting fresh.[/yellow]")
             continue
         if not websearch_prompted:
@@ -715,8 +1093,9 @@ def run(with_memory=True):
                 TOOLS["websearch"] = True
                 console.print("[green]Websearch tool enabled for this session.[/green]")
             websearch_prompted = True
-        # Build context string from session memory (token-aware, not just last 20 turns)
-        context_str = session_agent.memory.get_context_prompt()
+        # History comes from session memory (token-aware, stable window); per-query
+        # material is attached to the new user message so the prefix stays cacheable.
+        extra_context = None
         if TOOLS["websearch"]:
             console.print("[cyan]Websearch tool is enabled. Searching online for your answer...[/cyan]")
             try:
@@ -727,7 +1106,6 @@ def run(with_memory=True):
                 web_content = web_result["content"] if isinstance(web_result, dict) and "content" in web_result else str(web_result)
             except Exception as e:
                 web_content = f"[Web search failed: {e}]"
-            context_str = "\n".join([f"User: {item['user']}\nModel: {item['response']}" for item in prev_context])
 
             # Get base system prompt based on current mode
             base_system_prompt = get_system_prompt_for_mode(current_mode)
@@ -738,82 +1116,32 @@ def run(with_memory=True):
                 "If you need more information, you are allowed to use the websearch tool to search the web for relevant content. "
                 "Use the websearch tool only if it is enabled by the user."
             )
-            full_prompt = f"{final_system_prompt}\n\n{context_str}\nWeb search result: {web_content}\nUser: {query}\nModel:"
+            extra_context = f"Web search result: {web_content}"
         else:
             # Use the base system prompt for the selected mode
             final_system_prompt = get_system_prompt_for_mode(current_mode)
-            full_prompt = f"{final_system_prompt}\n\n{context_str}\nUser: {query}\nModel:"
-        stages = [
-            "[bold cyan]Sending query to model...[/bold cyan]",
-            "[bold cyan]Model is processing your request...[/bold cyan]",
-            "[bold cyan]Compiling thoughts and insights...[/bold cyan]",
-            "[bold cyan]Almost there, fetching results...[/bold cyan]"
-        ]
-        stage_idx = 0
-        last_stage_update_time = time.time()
-
-        import threading
-        with console.status(stages[stage_idx], spinner="dots8") as status: # Using a different spinner
-            done = False
-            response = None
-            model_stop_event = threading.Event()  # Event to signal thread cancellation
-            def run_model_with_stop():
-                nonlocal response, done
-                try:
-                    # Pass stop_event to model.query_ollama if supported, else check in a loop
-                    # Here, we simulate cooperative cancellation by checking the event periodically
-                    # If model.query_ollama supports a stop_event, pass it; else, wrap in a loop
-                    # For now, we assume model.query_ollama does NOT support stop_event, so we use a workaround
-                    # (If model.query_ollama is blocking, true cancellation may require more invasive changes)
-                    # This is a best-effort approach
-                    def query_with_cancel():
-                        # If model.query_ollama is long-running and blocking, this won't interrupt it
-                        # If it supports a stop_event, pass it here
-                        return model.query_ollama(full_prompt, selected_model)
-                    response = query_with_cancel()
-                except Exception as e:
-                    response = e
-                finally:
-                    done = True
-            model_thread = threading.Thread(target=run_model_with_stop)
-            model_thread.start()
-            while not done:
-                current_time = time.time()
-                # Cycle through stages every 2.5 seconds
-                if current_time - last_stage_update_time > 2.5:
-                    stage_idx = (stage_idx + 1) % len(stages)
-                    status.update(stages[stage_idx])
-                    last_stage_update_time = current_time
-                # If ESC was pressed, signal the thread to stop
-                if esc_stop:
-                    if model_stop_event is not None:
-                        model_stop_event.set()
-                    break
-                time.sleep(0.1) # Short sleep to keep loop responsive
-            # Wait for thread to finish (or timeout if cancelled)
-            if model_thread.is_alive():
-                model_thread.join(timeout=2)
-            model_thread = None
-            # If cancelled, skip further processing
-            if esc_stop:
-                esc_stop = False
-                continue
-            if isinstance(response, Exception):
-                print_error(f"Ollama model query failed: {response}\nPlease ensure Ollama is running and the model (`{selected_model}`) is available.", title="Ollama Query Error")
-                session.append({"user": query, "response": f"Error: {response}"})
-                continue # Skip response processing and restart loop
-            status.update("[bold cyan]Querying model... 100%")
-            last_thinking = summarize_response(response) # response here is str
-
-        # Stream the model response
-        console.print("[bold magenta]CodeZ:[/bold magenta]", end=" ")
-        if TOOLS.get("process"):
-            print_llm_response_with_snippets(last_thinking)
-        else:
-            filtered = filter_thinking_block(last_thinking)
-            print_llm_response_with_snippets(filtered)
-        session.append({"user": query, "response": response}) # response is str
+        if pinned_context:
+            extra_context = f"{pinned_context}\n\n{extra_context}" if extra_context else pinned_context
+            pinned_context = None
+        messages = session_agent.build_messages(query, system_prompt=final_system_prompt, extra_context=extra_context)
+        stop_event = threading.Event()
+        server_stats = {}
+        try:
+            with session_agent.generating():
+                response = stream_model_response(model.stream_chat(messages, selected_model, stop_event=stop_event, stats=server_stats, question=query), stop_event=stop_event)
+        except Exception as e:
+            print_error(f"Ollama model query failed: {e}\nPlease ensure Ollama is running and the model (`{selected_model}`) is available.", title="Ollama Query Error")
+            continue # Skip response processing and restart loop
+        session_agent.record_stats(messages, server_stats)
+        report_cache_hit(server_stats)
+        last_thinking = summarize_response(response) # response here is str
+        if stop_event.is_set():
+            # Keep the partial answer so the transcript and context show what was cut off
+            if response.strip():
+                session_agent.memory.add_turn(query, response + "\n[cancelled by user]", meta={"cancelled": True})
+            continue
         session_agent.memory.add_turn(query, response)  # Add the turn to memory
+    session_agent.close()
 
 # Place this near the top with other function definitions
 def filter_thinking_block(response: str) -> str:
@@ -822,43 +1150,79 @@ def filter_thinking_block(response: str) -> str:
     pattern = r"(?s)<think>.*?</think>"
     return re.sub(pattern, '', response).strip()
 
-def load_all_sessions(session_dir=SESSION_DIR):
-    session_files = sorted(glob.glob(os.path.join(session_dir, "session_*.json")), reverse=True)
-    all_turns = []
-    for fname in session_files:
-        try:
-            with open(fname, "r") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    all_turns.extend(data)
-        except Exception:
-            continue
-    return all_turns
-
-def print_llm_response_with_snippets(response: str):
+def response_renderable(response: str):
     """
-    Print LLM response, rendering code snippets in a styled TUI panel.
+    Build a renderable for an LLM response, rendering code snippets in a styled TUI panel.
     Code blocks (```lang\n...\n```) are rendered with syntax highlighting and a border.
     """
-    import re
-    from rich.panel import Panel
-    from rich.syntax import Syntax
+    from rich.console import Group
     from rich.markdown import Markdown
+    from rich.syntax import Syntax
     code_block_pattern = re.compile(r"```([a-zA-Z0-9]*)\n(.*?)```", re.DOTALL)
+    parts = []
     last_end = 0
     for match in code_block_pattern.finditer(response):
-        # Print any text before the code block
+        # Any text before the code block
         if match.start() > last_end:
             text = response[last_end:match.start()].strip()
             if text:
-                console.print(Markdown(text))
+                parts.append(Markdown(text))
         lang = match.group(1) or "text"
         code = match.group(2).strip()
         syntax = Syntax(code, lang, theme="monokai", line_numbers=True, word_wrap=True)
-        console.print(Panel(syntax, title=f"Code Snippet ({lang})", border_style="bold green"))
+        parts.append(Panel(syntax, title=f"Code Snippet ({lang})", border_style="bold green"))
         last_end = match.end()
-    # Print any text after the last code block
+    # Any text after the last code block
     if last_end < len(response):
         text = response[last_end:].strip()
         if text:
-            console.print(Markdown(text))
+            parts.append(Markdown(text))
+    return Group(*parts)
+
+def print_llm_response_with_snippets(response: str):
+    """Print LLM response, rendering code snippets in a styled TUI panel."""
+    console.print(response_renderable(response))
+
+def hide_thinking(text: str) -> str:
+    """Drop <think> blocks, including one still open at the end of a partial response."""
+    return re.sub(r"(?s)<think>.*?(</think>|$)", '', text)
+
+_last_stream_stats = None  # StreamStats of the last streamed answer, for /stats
+
+def stream_model_response(chunks, status_text="[bold cyan]Sending query to model...[/bold cyan]", stop_event=None):
+    """
+    Show a spinner until the model's first chunk arrives, then render the
+    response incrementally as it streams. Returns the response text.
+
+    ESC or Ctrl+C sets `stop_event` (which the chunk source must honour, see
+    `model.stream_ollama`); whatever arrived before that is returned, and
+    callers can tell the answer is partial from `stop_event.is_set()`.
+    """
+    global _last_stream_stats
+    stop_event = stop_event or threading.Event()
+    received = []
+
+    def tee(source):
+        for chunk in source:
+            received.append(chunk)
+            yield chunk
+
+    chunks = tee(chunks)
+    try:
+        with EscapeListener(stop_event):
+            with console.status(status_text + " [dim](ESC to cancel)[/dim]", spinner="dots8"):
+                first = next(chunks, None)
+            if first is None:
+                return ""
+            console.print("[bold magenta]CodeZ:[/bold magenta]")
+            transform = None if TOOLS.get("process") else hide_thinking
+            stream_stats = {}
+            stream_markdown(itertools.chain([first], chunks), console, render=response_renderable,
+                            transform=transform, stats=stream_stats)
+            _last_stream_stats = stream_stats["stream"]
+    except KeyboardInterrupt:
+        stop_event.set()
+        chunks.close()
+    if stop_event.is_set():
+        console.print("[cyan]Generation cancelled.[/cyan]")
+    return ''.join(received)
@@ -0,0 +1,226 @@
+"""
+Content-addressed cache for model responses.
+
+Entries are keyed by a hash of (model, generation options, fully assembled
+prompt or messages). A small in-memory LRU sits in front of a SQLite store;
+the store is bounded by total bytes and entry age, evicting least recently
+used entries first. The cache is opt-in (`CODEZ_RESPONSE_CACHE=1` or
+`/cache on`) since sampling makes model output non-deterministic.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from platformdirs import user_cache_dir
+
+from core.user_config import _load_config_value, _save_config_value
+
+CACHE_ENV = "CODEZ_RESPONSE_CACHE"
+DEFAULT_DB_PATH = os.path.join(user_cache_dir("codez"), "response_cache.db")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+DEFAULT_MEMORY_ENTRIES = 128
+
+
+def cache_key(model: str, prompt: Any, options: Optional[Dict] = None) -> str:
+    """Hash of everything that determines the response; `prompt` may be a string or chat messages."""
+    payload = json.dumps({"model": model, "options": options or {}, "prompt": prompt},
+                         sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedResponse(NamedTuple):
+    response: str
+    gen_seconds: float  # how long the model took when the entry was created
+
+
+class CacheStats(NamedTuple):
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    saved_seconds: float
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResponseCache:
+    """
+    Two-level response cache: an OrderedDict LRU in memory and a SQLite table on disk.
+    """
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE, memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+                 clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.memory_entries = memory_entries
+        self._clock = clock
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # memory hits whose last_used is not on disk yet
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self._ensure_db()
+
+    def _ensure_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    gen_seconds REAL NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)')
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[2] <= self.max_age:
+                self._memory.move_to_end(key)
+                # Written with the next put or stats(), so a memory hit never touches the disk
+                self._touched[key] = now
+                return self._hit(CachedResponse(entry[0], entry[1]))
+            self._memory.pop(key, None)
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT response, gen_seconds, created FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and now - row[2] > self.max_age:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                row = None
+            elif row is not None:
+                conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, row[0], row[1], row[2])
+            return self._hit(CachedResponse(row[0], row[1]))
+
+    def _hit(self, cached: CachedResponse) -> CachedResponse:
+        self.hits += 1
+        self.saved_seconds += cached.gen_seconds
+        return cached
+
+    def _flush_touched(self, conn):
+        """Write the last_used times of memory hits since the last flush."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany('UPDATE responses SET last_used = ? WHERE key = ?',
+                             [(now, key) for key, now in touched.items()])
+
+    def _remember(self, key, response, gen_seconds, created):
+        self._memory[key] = (response, gen_seconds, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, model: str, response: str, gen_seconds: float):
+        now = self._clock()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._remember(key, response, gen_seconds, now)
+            self._touched.pop(key, None)
+        with sqlite3.connect(self.db_path) as conn:
+            self._flush_touched(conn)
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, model, response, size, gen_seconds, created, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, model, response, size, gen_seconds, now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used ones until under the byte budget."""
+        doomed = []
+        evicted = conn.execute('DELETE FROM responses WHERE created < ?', (now - self.max_age,)).rowcount
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total > self.max_bytes:
+            for key, size in conn.execute('SELECT key, size FROM responses ORDER BY last_used ASC'):
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+            evicted += len(doomed)
+        with self._lock:
+            for (key,) in doomed:
+                self._memory.pop(key, None)
+            self.evictions += evicted
+
+    def stats(self) -> CacheStats:
+        with sqlite3.connect(self.db_path) as conn:
+            self._flush_touched(conn)
+            entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return CacheStats(entries, total, self.hits, self.misses, self.evictions, self.saved_seconds)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM responses')
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+_config_enabled: Optional[bool] = None  # the user config's choice, read once
+
+
+def is_enabled() -> bool:
+    global _config_enabled
+    env = os.environ.get(CACHE_ENV)
+    if env is not None:
+        return env.strip().lower() in ("1", "true", "yes", "on")
+    if _config_enabled is None:
+        _config_enabled = bool(_load_config_value("response_cache"))
+    return _config_enabled
+
+
+def set_enabled(enabled: bool):
+    """Persist the on/off choice in the user config (the env var still overrides it)."""
+    global _config_enabled
+    _save_config_value("response_cache", bool(enabled))
+    _config_enabled = bool(enabled)
+
+
+def get_cache() -> ResponseCache:
+    """Return the process-wide cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def get_active_cache() -> Optional[ResponseCache]:
+    """The shared cache if caching is enabled, else None."""
+    return get_cache() if is_enabled() else None
+
+
+def set_cache(cache: Optional[ResponseCache]):
+    """Replace the shared cache (used by tests)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
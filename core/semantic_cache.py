@@ -0,0 +1,309 @@
+"""
+Semantic answer cache for near-duplicate questions.
+
+A question is embedded and compared (cosine, vectorized with NumPy) against
+the questions previously asked with the same context fingerprint, i.e. the
+same model, system prompt, attached material (file content, search
+results) and latest exchange of the conversation. Older history is left
+out, so a question can still be answered from another session, while a
+follow-up ("why?", "fix it") only matches one asked after the same answer.
+If the best match scores at least `threshold`, its answer is returned
+instead of running the model. Entries live in a matrix in memory and are mirrored to SQLite so
+they survive restarts.
+
+NumPy is an optional dependency (`pip install codez-cli[semantic]`); without
+it the semantic cache simply stays off.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from core.user_config import _load_config_value, _save_config_value
+
+np = None  # imported on first use: NumPy is optional and slow to import
+
+SEMANTIC_ENV = "CODEZ_SEMANTIC_CACHE"
+THRESHOLD_ENV = "CODEZ_SEMANTIC_THRESHOLD"
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 2000
+INITIAL_CAPACITY = 64
+FINGERPRINT_MESSAGES = 2  # the latest exchange: the previous question and its answer
+EMBEDDING_MEMO_SIZE = 64
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("The semantic cache needs NumPy: pip install 'codez-cli[semantic]'") from None
+        np = numpy
+    return np
+
+
+def context_fingerprint(model: str, prompt: Any, question: str) -> str:
+    """
+    Hash of the model and what a request's answer depends on besides the
+    trailing `question`. For chat messages that is the system prompt, the
+    latest exchange of the history and the material attached to the last
+    message; a single-string prompt is hashed whole.
+    """
+    if isinstance(prompt, str):
+        context = prompt[:-len(question)] if question and prompt.endswith(question) else prompt
+    else:
+        last = prompt[-1]["content"] if prompt else ""
+        tail = last[:-len(question)] if question and last.endswith(question) else last
+        system = [m["content"] for m in prompt[:-1] if m["role"] == "system"]
+        history = [[m["role"], m["content"]] for m in prompt[:-1] if m["role"] != "system"]
+        context = [system, history[-FINGERPRINT_MESSAGES:], tail]
+    payload = json.dumps({"model": model, "context": context}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SemanticHit(NamedTuple):
+    response: str
+    similarity: float
+    question: str  # the cached question that matched
+    gen_seconds: float
+
+
+class SemanticCacheStats(NamedTuple):
+    entries: int
+    lookups: int
+    hits: int
+    false_hits: int
+    threshold: float
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def false_hit_rate(self) -> float:
+        return self.false_hits / self.hits if self.hits else 0.0
+
+
+class SemanticCache:
+    """
+    Top-1 cosine lookup over stored question embeddings.
+    `embedder` is any object with `name` and `embed(text) -> list of floats`
+    (see core/embeddings.py). Hits that turn out to be wrong are reported with
+    `mark_false_hit()`, which drops the entry and counts it.
+    """
+    def __init__(self, embedder, threshold: float = DEFAULT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 db_path: Optional[str] = None):
+        _require_numpy()
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._matrix = None  # (capacity, dim) float32; the first len(_entries) rows are L2-normalised vectors
+        self._fingerprints: List[str] = []
+        self._entries: List[Dict] = []
+        self._memo: Dict[str, Any] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.false_hits = 0
+        self.last_hit: Optional[Dict] = None
+        if db_path:
+            self._ensure_db()
+            self._load()
+
+    def _ensure_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS semantic_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    embedder TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    gen_seconds REAL NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created REAL NOT NULL
+                )
+            ''')
+
+    def _load(self):
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                'SELECT id, fingerprint, question, response, gen_seconds, embedding FROM semantic_entries '
+                'WHERE embedder = ? ORDER BY id DESC LIMIT ?', (self.embedder.name, self.max_entries)
+            ).fetchall()
+        rows.reverse()
+        for row_id, fingerprint, question, response, gen_seconds, embedding in rows:
+            self._append(np.frombuffer(embedding, dtype=np.float32))
+            self._fingerprints.append(fingerprint)
+            self._entries.append({"id": row_id, "question": question, "response": response, "gen_seconds": gen_seconds})
+
+    @property
+    def _vectors(self):
+        return None if self._matrix is None else self._matrix[:len(self._entries)]
+
+    def _append(self, vector):
+        """Add a row to the matrix, doubling its capacity when full (entries are appended separately)."""
+        count = len(self._entries)
+        if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+            self._matrix = np.empty((INITIAL_CAPACITY, vector.shape[0]), dtype=np.float32)
+            count = 0
+        elif count == self._matrix.shape[0]:
+            grown = np.empty((count * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:count] = self._matrix
+            self._matrix = grown
+        self._matrix[count] = vector
+
+    def _embed(self, text: str):
+        with self._lock:
+            vector = self._memo.get(text)
+        if vector is None:
+            vector = np.asarray(self.embedder.embed(text), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+            with self._lock:
+                if len(self._memo) >= EMBEDDING_MEMO_SIZE:
+                    self._memo.pop(next(iter(self._memo)))
+                self._memo[text] = vector
+        return vector
+
+    def lookup(self, question: str, fingerprint: str) -> Optional[SemanticHit]:
+        query = self._embed(question)
+        with self._lock:
+            self.lookups += 1
+            self.last_hit = None
+            if self._vectors is None or query.shape[0] != self._vectors.shape[1]:
+                return None
+            mask = np.fromiter((fp == fingerprint for fp in self._fingerprints), dtype=bool, count=len(self._fingerprints))
+            if not mask.any():
+                return None
+            scores = np.where(mask, self._vectors @ query, -np.inf)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                return None
+            self.hits += 1
+            entry = self._entries[best]
+            self.last_hit = entry
+            return SemanticHit(entry["response"], similarity, entry["question"], entry["gen_seconds"])
+
+    def put(self, question: str, fingerprint: str, response: str, gen_seconds: float):
+        vector = self._embed(question)
+        entry = {"id": None, "question": question, "response": response, "gen_seconds": gen_seconds}
+        if self.db_path:
+            with sqlite3.connect(self.db_path) as conn:
+                entry["id"] = conn.execute(
+                    'INSERT INTO semantic_entries (embedder, fingerprint, question, response, gen_seconds, embedding, created) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (self.embedder.name, fingerprint, question, response, gen_seconds, vector.tobytes(), time.time())
+                ).lastrowid
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._fingerprints, self._entries = [], []
+            self._append(vector)
+            self._fingerprints.append(fingerprint)
+            self._entries.append(entry)
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._remove(range(overflow))
+
+    def _remove(self, indices):
+        doomed = set(indices)
+        ids = [(self._entries[i]["id"],) for i in doomed if self._entries[i]["id"] is not None]
+        keep = [i for i in range(len(self._entries)) if i not in doomed]
+        self._matrix[:len(keep)] = self._matrix[keep]
+        self._fingerprints = [self._fingerprints[i] for i in keep]
+        self._entries = [self._entries[i] for i in keep]
+        if self.db_path and ids:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany('DELETE FROM semantic_entries WHERE id = ?', ids)
+
+    def mark_false_hit(self) -> bool:
+        """Record that the last hit was the wrong answer and forget that entry."""
+        with self._lock:
+            entry, self.last_hit = self.last_hit, None
+            if entry is None:
+                return False
+            self.false_hits += 1
+            index = next((i for i, e in enumerate(self._entries) if e is entry), None)
+            if index is not None:
+                self._remove([index])
+            return True
+
+    def stats(self) -> SemanticCacheStats:
+        return SemanticCacheStats(len(self._entries), self.lookups, self.hits, self.false_hits, self.threshold)
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._fingerprints, self._entries = [], []
+            self.last_hit = None
+        if self.db_path:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('DELETE FROM semantic_entries WHERE embedder = ?', (self.embedder.name,))
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+_config_enabled: Optional[bool] = None  # the user config's choice, read once
+
+
+def is_available() -> bool:
+    return np is not None or importlib.util.find_spec("numpy") is not None
+
+
+def is_enabled() -> bool:
+    global _config_enabled
+    env = os.environ.get(SEMANTIC_ENV)
+    if env is not None:
+        enabled = env.strip().lower() in ("1", "true", "yes", "on")
+    else:
+        if _config_enabled is None:
+            _config_enabled = bool(_load_config_value("semantic_cache"))
+        enabled = _config_enabled
+    return enabled and is_available()
+
+
+def set_enabled(enabled: bool):
+    """Persist the on/off choice in the user config (the env var still overrides it)."""
+    global _config_enabled
+    _save_config_value("semantic_cache", bool(enabled))
+    _config_enabled = bool(enabled)
+
+
+def get_threshold() -> float:
+    try:
+        return float(os.environ.get(THRESHOLD_ENV, DEFAULT_THRESHOLD))
+    except ValueError:
+        return DEFAULT_THRESHOLD
+
+
+def get_cache() -> SemanticCache:
+    """Return the process-wide cache, stored next to the response cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from core.embeddings import OllamaEmbedder
+                from core.response_cache import DEFAULT_DB_PATH
+                _cache = SemanticCache(OllamaEmbedder(), threshold=get_threshold(), db_path=DEFAULT_DB_PATH)
+    return _cache
+
+
+def get_active_cache() -> Optional[SemanticCache]:
+    """The shared cache if semantic caching is enabled and NumPy is installed, else None."""
+    return get_cache() if is_enabled() else None
+
+
+def set_cache(cache: Optional[SemanticCache]):
+    """Replace the shared cache (used by tests)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
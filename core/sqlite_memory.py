@@ -1,66 +1,727 @@
 import sqlite3
+import glob
+import json
 import os
-from typing import List, Dict, Optional, Callable
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, NamedTuple, Optional, Callable, Tuple
+from core.summarizer import SummaryBlock
+from core.tokenizer import get_token_counter
+
+# Where the session store lives; defaults to `sessions/` next to the code
+SESSION_DIR_ENV = "CODEZ_SESSION_DIR"
+DEFAULT_SESSION_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'sessions'))
+DB_NAME = "session_memory.db"
+
+
+def session_dir() -> str:
+    """Directory of the session database and of transcripts left by older versions."""
+    return os.environ.get(SESSION_DIR_ENV) or DEFAULT_SESSION_DIR
+
+
+def default_db_path() -> str:
+    return os.path.join(session_dir(), DB_NAME)
+
+
+# Applied to every connection. WAL lets the REPL read context while a turn is
+# being written; NORMAL sync is still crash-safe in WAL mode (a power cut can
+# lose at most the last commits, never corrupt the file).
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8192",  # 8 MiB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_root TEXT,
+        model TEXT,
+        title TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL,
+        turn_count INTEGER NOT NULL DEFAULT 0,
+        total_tokens INTEGER NOT NULL DEFAULT 0,
+        window_start_id INTEGER NOT NULL DEFAULT 0,
+        token_counter TEXT,
+        imported_from TEXT UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL REFERENCES sessions (id),
+        user TEXT NOT NULL,
+        response TEXT NOT NULL,
+        tokens INTEGER,
+        cum_tokens INTEGER,
+        created REAL NOT NULL,
+        meta TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS summaries (
+        session_id INTEGER NOT NULL REFERENCES sessions (id),
+        first_id INTEGER NOT NULL,
+        last_id INTEGER NOT NULL,
+        level INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        tokens INTEGER NOT NULL,
+        active INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (session_id, first_id, last_id, level)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_turns_session ON turns (session_id, id)',
+    'CREATE INDEX IF NOT EXISTS idx_turns_session_cum ON turns (session_id, cum_tokens)',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_project ON sessions (project_root, updated)',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated)',
+)
+
+# SQL is kept in constants so each statement is compiled once and then reused
+# from the connection's statement cache. Every turn query is scoped to one
+# session and served by the (session_id, ...) indexes.
+SQL_LAST_TURN = 'SELECT id, tokens, cum_tokens FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT 1'
+SQL_CUM_BEFORE = 'SELECT cum_tokens FROM turns WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT 1'
+SQL_INSERT_TURN = ('INSERT INTO turns (session_id, user, response, tokens, cum_tokens, created, meta) '
+                   'VALUES (?, ?, ?, ?, ?, ?, ?)')
+SQL_TOUCH_SESSION = ('UPDATE sessions SET updated = ?, turn_count = turn_count + 1, total_tokens = ?, '
+                     'model = COALESCE(?, model), title = COALESCE(title, ?) WHERE id = ?')
+SQL_WINDOW = 'SELECT user, response FROM turns WHERE session_id = ? AND id >= ? ORDER BY id ASC'
+SQL_FIRST_REACHING = ('SELECT id FROM turns WHERE session_id = ? AND cum_tokens >= ? '
+                      'ORDER BY cum_tokens ASC, id ASC LIMIT 1')
+SQL_NEXT_ID = 'SELECT id FROM turns WHERE session_id = ? AND id > ? ORDER BY id ASC LIMIT 1'
+SQL_SAVE_WINDOW = 'UPDATE sessions SET window_start_id = ? WHERE id = ?'
+SQL_GET_STATE = 'SELECT value FROM metadata WHERE key = ?'
+SQL_SET_STATE = 'INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)'
+# Full-text index over the turns (external content: the text is stored once,
+# in `turns`, and the triggers keep the index in step with it).
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE turns_fts USING fts5(user, response, content='turns', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    '''
+    CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN
+        INSERT INTO turns_fts (rowid, user, response) VALUES (new.id, new.user, new.response);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS turns_fts_delete AFTER DELETE ON turns BEGIN
+        INSERT INTO turns_fts (turns_fts, rowid, user, response) VALUES ('delete', old.id, old.user, old.response);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS turns_fts_update AFTER UPDATE OF user, response ON turns BEGIN
+        INSERT INTO turns_fts (turns_fts, rowid, user, response) VALUES ('delete', old.id, old.user, old.response);
+        INSERT INTO turns_fts (rowid, user, response) VALUES (new.id, new.user, new.response);
+    END
+    ''',
+    "INSERT INTO turns_fts (turns_fts) VALUES ('rebuild')",  # index turns stored before the index existed
+)
+# Ranking: BM25 over the newest SEARCH_CANDIDATES matches. Scoring every match
+# of a word that occurs in most turns would cost O(matches); this keeps a
+# search in the milliseconds on any history size, and rarer terms (the
+# useful ones) are ranked over all their matches anyway.
+SEARCH_CANDIDATES = 2000
+SQL_SEARCH_RANKED = (
+    'SELECT id, score FROM (SELECT f.rowid AS id, bm25(turns_fts) AS score FROM turns_fts f '
+    'JOIN turns t ON t.id = f.rowid WHERE turns_fts MATCH ? {where} ORDER BY f.rowid DESC LIMIT ?) '
+    'ORDER BY score LIMIT ?'
+)
+SQL_SNIPPETS = (
+    "SELECT t.session_id, t.created, snippet(turns_fts, 0, '«', '»', '…', 10), "
+    "snippet(turns_fts, 1, '«', '»', '…', 16) "
+    "FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid WHERE turns_fts MATCH ? AND turns_fts.rowid = ?"
+)
+SQL_RELEVANT = 'SELECT user, response, tokens FROM turns WHERE id = ?'
+SQL_SESSION_INFO = ('SELECT id, project_root, model, title, created, updated, turn_count, total_tokens '
+                    'FROM sessions')
+
+# Sessions are titled after their first question, cut to this length
+TITLE_LENGTH = 60
+
+
+_TERM = re.compile(r"\w+")
+
+
+def fts_query(text: str, any_term: bool = False) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: every word quoted (so punctuation and
+    FTS operators in the text are taken literally), all required, or any of
+    them with `any_term`. None if the text has no words.
+    """
+    terms = ['"%s"' % term for term in _TERM.findall(text)]
+    if not terms:
+        return None
+    return (" OR " if any_term else " ").join(terms)
+
+
+class TurnHit(NamedTuple):
+    turn_id: int
+    session_id: int
+    created: float
+    user: str      # snippets, matches in «guillemets»
+    response: str
+    rank: float    # bm25, lower is better
+
+
+class SessionInfo(NamedTuple):
+    id: int
+    project_root: Optional[str]
+    model: Optional[str]
+    title: Optional[str]
+    created: float
+    updated: float
+    turn_count: int
+    total_tokens: int
+
 
 class SQLiteSessionMemory:
     """
     SQLite-backed session memory for chat history, supporting token-aware context window.
     Stores (user, response) turns and can return a prompt containing as much history as fits within a token budget.
+
+    One database holds many sessions (`sessions`: project root, model,
+    timestamps, token totals), their `turns`, and global `metadata`. One
+    session is active at a time and every turn read or write is scoped to it.
+    A new session's row is created by its first turn, so starting the REPL and
+    leaving straight away stores nothing. With `resume` (the default) the most
+    recently updated session, for `project_root` if given, is reopened.
+
+    Each row carries its token count and a per-session running total
+    (`cum_tokens`), so the size of any id range is a subtraction and the
+    context window is selected with a few indexed lookups, however long the
+    history grows.
+
+    The memory owns one connection for its lifetime, shared between threads
+    under a lock. New turns are group-committed: the transaction is committed
+    once `batch_size` turns are pending, or `commit_interval` seconds after the
+    first of them; `batch()` groups writes explicitly and `flush()` or
+    `close()` commit whatever is pending. Reads through this object always see
+    its own uncommitted writes. The default batch size of 1 commits every turn.
     """
-    def __init__(self, db_path: str, max_token_budget: int = 3000, token_estimator: Optional[Callable[[str], int]] = None):
+    def __init__(self, db_path: str, max_token_budget: int = 3000, token_estimator: Optional[Callable[[str], int]] = None,
+                 retain_ratio: float = 0.5, batch_size: int = 1, commit_interval: float = 1.0,
+                 session_id: Optional[int] = None, project_root: Optional[str] = None,
+                 model: Optional[str] = None, resume: bool = True):
         self.db_path = db_path
         self.max_token_budget = max_token_budget
-        # Token estimator: function that takes a string and returns estimated token count
-        # Default: word count * 1.3
-        self.token_estimator = token_estimator or (lambda s: int(len(s.split()) * 1.3))
+        # Token estimator: function that takes a string and returns its token count
+        # Default: the memoized heuristic counter from core/tokenizer.py
+        self.token_estimator = token_estimator or get_token_counter()
+        self.retain_ratio = retain_ratio
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        # Recorded on sessions this memory creates
+        self.project_root = project_root
+        self.model = model
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._first_pending = 0.0
+        self._batch_depth = 0
+        self._window_dirty = False
+        # Active session; None until the first turn of a new session is stored
+        self.session_id: Optional[int] = None
+        self._conn = self._connect()
         self._ensure_db()
+        # First turn id of the context window; persisted per session so a
+        # restarted session rebuilds the same prompt prefix.
+        self._window_start_id = 0
+        if session_id is not None:
+            self.switch_session(session_id)
+        elif resume:
+            self.resume_latest(project_root)
+        self.flush()
 
-    def _ensure_db(self):
+    def _connect(self) -> sqlite3.Connection:
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS session (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user TEXT NOT NULL,
-                    response TEXT NOT NULL
-                )
-            ''')
+        # Autocommit mode: transactions are opened and committed explicitly below
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _ensure_db(self):
+        with self._write():
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            self._ensure_fts()
+            self._migrate_global_session()
+        self.flush()
 
-    def add_turn(self, user: str, response: str):
-        with sqlite3.connect(self.db_path) as conn:
+    def _ensure_fts(self):
+        """Create the full-text index if this SQLite has FTS5; search and retrieval are off otherwise."""
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'turns_fts'").fetchone():
+            self.fts_enabled = True
+            return
+        try:
+            self._conn.execute('SAVEPOINT fts')
+            for statement in FTS_SCHEMA:
+                self._conn.execute(statement)
+            self._conn.execute('RELEASE fts')
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            # no such module: fts5
+            self._conn.execute('ROLLBACK TO fts')
+            self._conn.execute('RELEASE fts')
+            self.fts_enabled = False
+
+    def _migrate_global_session(self):
+        """
+        Databases from before sessions existed keep all history in one `session`
+        table (plus `session_state`); move it into a session of its own.
+        """
+        conn = self._conn
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "session" not in tables:
+            return
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(session)')]
+        tokens = "tokens" if "tokens" in columns else "NULL"
+        state = dict(conn.execute('SELECT key, value FROM session_state')) if "session_state" in tables else {}
+        old_count = conn.execute('SELECT COUNT(*) FROM session').fetchone()[0]
+        if old_count:
+            now = time.time()
+            session_id = conn.execute(
+                'INSERT INTO sessions (title, created, updated, token_counter) VALUES (?, ?, ?, ?)',
+                ("Imported history", now, now, state.get("token_counter"))
+            ).lastrowid
+            conn.execute(
+                f'INSERT INTO turns (session_id, user, response, tokens, created) '
+                f'SELECT ?, user, response, {tokens}, ? FROM session ORDER BY id ASC', (session_id, now)
+            )
+            self._recount(session_id, 0, keep_counts=True)
+            first_id = conn.execute('SELECT MIN(id) FROM turns WHERE session_id = ?', (session_id,)).fetchone()[0]
+            # Rows keep their order, so the old window start maps across by position
+            dropped = conn.execute('SELECT COUNT(*) FROM session WHERE id < ?',
+                                   (int(state.get("window_start_id") or 0),)).fetchone()[0]
             conn.execute(
-                'INSERT INTO session (user, response) VALUES (?, ?)',
-                (user, response)
+                'UPDATE sessions SET turn_count = ?, total_tokens = '
+                '(SELECT MAX(cum_tokens) FROM turns WHERE session_id = ?), window_start_id = ? WHERE id = ?',
+                (old_count, session_id, first_id + dropped if dropped else 0, session_id)
             )
+        conn.execute('DROP TABLE session')
+        if "session_state" in tables:
+            conn.execute('DROP TABLE session_state')
+
+    @contextmanager
+    def _write(self, group: bool = False):
+        """
+        Run a write inside the current transaction. Grouped writes (new turns)
+        are committed when the batch is due; others commit straight away, since
+        an open transaction holds the database's write lock. Each write runs in
+        its own savepoint, so one that fails is undone without the others.
+        """
+        with self._lock:
+            if not self._conn.in_transaction:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._first_pending = time.monotonic()
+                if self.batch_size > 1:
+                    # Commit an idle batch after commit_interval even if no further write comes
+                    timer = threading.Timer(self.commit_interval, self.flush)
+                    timer.daemon = True
+                    timer.start()
+            self._batch_depth += 1
+            savepoint = f"write_{self._batch_depth}"
+            session_id, window_dirty = self.session_id, self._window_dirty
+            self._conn.execute(f'SAVEPOINT {savepoint}')
+            try:
+                yield
+            except BaseException:
+                # Undo this write only: the rest of the pending group still commits
+                if self._conn.in_transaction:
+                    self._conn.execute(f'ROLLBACK TO {savepoint}')
+                    self._conn.execute(f'RELEASE {savepoint}')
+                else:
+                    self._pending = 0
+                # A session created by the undone write no longer exists
+                self.session_id, self._window_dirty = session_id, window_dirty
+                raise
+            else:
+                self._conn.execute(f'RELEASE {savepoint}')
+            finally:
+                self._batch_depth -= 1
+            self._pending += 1
+            if self._batch_depth == 0 and (not group or self._pending >= self.batch_size or
+                                           time.monotonic() - self._first_pending >= self.commit_interval):
+                self.flush()
+
+    @contextmanager
+    def batch(self):
+        """Commit all writes made inside the block as one transaction."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def flush(self):
+        """Commit pending writes."""
+        with self._lock:
+            if self._conn is not None and self._conn.in_transaction:
+                self._conn.commit()
+            self._pending = 0
+
+    def _save_window(self):
+        if self._window_dirty and self.session_id is not None:
+            self._conn.execute(SQL_SAVE_WINDOW, (self._window_start_id, self.session_id))
+        self._window_dirty = False
+
+    def _persist_window(self):
+        if self._window_dirty:
+            with self._write():
+                self._save_window()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._persist_window()
+                self.flush()
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_session(self, session_id: Optional[int] = None) -> Optional[SessionInfo]:
+        """Details of `session_id` (default: the active session), or None if it does not exist."""
+        session_id = self.session_id if session_id is None else session_id
+        with self._lock:
+            row = self._conn.execute(SQL_SESSION_INFO + ' WHERE id = ?', (session_id,)).fetchone()
+        return SessionInfo(*row) if row else None
+
+    def _session_filter(self, project_root: Optional[str], search: Optional[str]):
+        clauses, params = [], []
+        if project_root is not None:
+            clauses.append('project_root = ?')
+            params.append(project_root)
+        if search:
+            clauses.append('instr(lower(title), lower(?)) > 0')
+            params.append(search)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def list_sessions(self, project_root: Optional[str] = None, limit: int = 20, offset: int = 0,
+                      search: Optional[str] = None) -> List[SessionInfo]:
+        """
+        One page of the session catalog, most recently updated first, only
+        sessions for `project_root` and/or whose title contains `search` if
+        given. Reads the `sessions` rows only, never the turns.
+        """
+        where, params = self._session_filter(project_root, search)
+        with self._lock:
+            rows = self._conn.execute(SQL_SESSION_INFO + where + ' ORDER BY updated DESC LIMIT ? OFFSET ?',
+                                      params + [limit, offset]).fetchall()
+        return [SessionInfo(*row) for row in rows]
+
+    def count_sessions(self, project_root: Optional[str] = None, search: Optional[str] = None) -> int:
+        where, params = self._session_filter(project_root, search)
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM sessions' + where, params).fetchone()[0]
+
+    def switch_session(self, session_id: int) -> SessionInfo:
+        """Make `session_id` the active session; raises KeyError if there is no such session."""
+        with self._lock:
+            row = self._conn.execute('SELECT window_start_id, token_counter FROM sessions WHERE id = ?',
+                                     (session_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"No session with id {session_id}")
+            self._persist_window()
+            self.session_id = session_id
+            self._window_start_id = row[0]
+            self._check_token_counter(row[1])
+        return self.get_session(session_id)
+
+    def resume_latest(self, project_root: Optional[str] = None) -> Optional[SessionInfo]:
+        """Switch to the most recently updated session (for `project_root` if given), if any."""
+        latest = self.list_sessions(project_root, limit=1)
+        return self.switch_session(latest[0].id) if latest else None
+
+    def new_session(self):
+        """Start a fresh, empty session. Its row is created by the first turn."""
+        with self._lock:
+            self._persist_window()
+            self.session_id = None
+            self._window_start_id = 0
+
+    def import_json_sessions(self, session_dir: str) -> int:
+        """
+        One-time import of the `session_<pid>.json` transcripts older versions
+        wrote at exit. Each file becomes a session dated by the file's mtime;
+        files already imported (by path) are skipped, so this is cheap to run
+        on every start. Returns the number of sessions imported.
+        """
+        imported = 0
+        with self._lock:
+            done = {row[0] for row in self._conn.execute(
+                'SELECT imported_from FROM sessions WHERE imported_from IS NOT NULL')}
+        # Only files not seen before are stat'ed and parsed
+        paths = [p for p in map(os.path.abspath, glob.glob(os.path.join(session_dir, "session_*.json")))
+                 if p not in done]
+        for path in sorted(paths, key=os.path.getmtime):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            except Exception:
+                continue
+            if not isinstance(data, list):
+                continue
+            turns = [t for t in data if isinstance(t, dict)
+                     and isinstance(t.get("user"), str) and isinstance(t.get("response"), str)]
+            mtime = os.path.getmtime(path)
+            with self._write():
+                session_id = self._conn.execute(
+                    'INSERT INTO sessions (title, created, updated, token_counter, imported_from) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (turns[0]["user"][:TITLE_LENGTH] if turns else None, mtime, mtime,
+                     self._counter_name(), path)
+                ).lastrowid
+                cum = 0
+                rows = []
+                for turn in turns:
+                    tokens = self._count_turn(turn["user"], turn["response"])
+                    cum += tokens
+                    meta = {k: v for k, v in turn.items() if k not in ("user", "response")}
+                    rows.append((session_id, turn["user"], turn["response"], tokens, cum, mtime,
+                                 json.dumps(meta) if meta else None))
+                self._conn.executemany(SQL_INSERT_TURN, rows)
+                self._conn.execute('UPDATE sessions SET turn_count = ?, total_tokens = ? WHERE id = ?',
+                                   (len(rows), cum, session_id))
+            imported += 1
+        return imported
+
+    def _counter_name(self) -> str:
+        return getattr(self.token_estimator, "name", "custom")
+
+    def _check_token_counter(self, stored: Optional[str] = None):
+        """
+        Stored counts are only valid for the counter that made them. On a
+        switch, recount the active session's turns that can still be in the
+        window; older ones never will be again, since the window start only
+        moves forward. Other sessions are checked when they are switched to.
+        """
+        if self.session_id is None:
+            return
+        name = self._counter_name()
+        with self._lock:
+            if stored is None:
+                stored = self._conn.execute('SELECT token_counter FROM sessions WHERE id = ?',
+                                            (self.session_id,)).fetchone()[0]
+            if stored != name:
+                with self._write():
+                    if stored is not None:
+                        self._recount(self.session_id, self._window_start_id, keep_counts=False)
+                    self._conn.execute('UPDATE sessions SET token_counter = ? WHERE id = ?', (name, self.session_id))
+
+    def _count_turn(self, user: str, response: str) -> int:
+        return self.token_estimator(f"User: {user}\nModel: {response}\n")
+
+    def _recount(self, session_id: int, from_id: int, keep_counts: bool):
+        """Rebuild `tokens` (unless `keep_counts` and already set) and `cum_tokens` for a session's rows from `from_id` on."""
+        cum = self._cum_before(session_id, from_id)
+        updates = []
+        for turn_id, user, response, tokens in self._conn.execute(
+                'SELECT id, user, response, tokens FROM turns WHERE session_id = ? AND id >= ? ORDER BY id ASC',
+                (session_id, from_id)).fetchall():
+            if tokens is None or not keep_counts:
+                tokens = self._count_turn(user, response)
+            cum += tokens
+            updates.append((tokens, cum, turn_id))
+        self._conn.executemany('UPDATE turns SET tokens = ?, cum_tokens = ? WHERE id = ?', updates)
+        if updates:
+            self._conn.execute('UPDATE sessions SET total_tokens = ? WHERE id = ?', (cum, session_id))
+
+    def _cum_before(self, session_id: int, turn_id: int) -> int:
+        row = self._conn.execute(SQL_CUM_BEFORE, (session_id, turn_id)).fetchone()
+        return row[0] if row and row[0] is not None else 0
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(SQL_GET_STATE, (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str):
+        with self._write():
+            self._conn.execute(SQL_SET_STATE, (key, value))
+
+    def add_turn(self, user: str, response: str, meta: Optional[Dict] = None):
+        """Append a turn to the active session (creating the session on its first turn)."""
+        tokens = self._count_turn(user, response)
+        with self._write(group=True):
+            if self.session_id is None:
+                now = time.time()
+                self.session_id = self._conn.execute(
+                    'INSERT INTO sessions (project_root, model, created, updated, token_counter) VALUES (?, ?, ?, ?, ?)',
+                    (self.project_root, self.model, now, now, self._counter_name())
+                ).lastrowid
+            self._save_window()
+            row = self._conn.execute(SQL_LAST_TURN, (self.session_id,)).fetchone()
+            cum = (row[2] if row else 0) + tokens
+            now = time.time()
+            self._conn.execute(SQL_INSERT_TURN, (self.session_id, user, response, tokens, cum, now,
+                                                 json.dumps(meta) if meta else None))
+            self._conn.execute(SQL_TOUCH_SESSION, (now, cum, self.model, user[:TITLE_LENGTH], self.session_id))
             # No hard limit on turns; context window is managed by token budget
 
     def get_context(self) -> List[Dict[str, str]]:
-        with sqlite3.connect(self.db_path) as conn:
-            rows = conn.execute(
-                'SELECT user, response FROM session ORDER BY id ASC'
+        """All turns of the active session, oldest first."""
+        if self.session_id is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT user, response FROM turns WHERE session_id = ? ORDER BY id ASC', (self.session_id,)
             ).fetchall()
         return [{"user": user, "response": response} for user, response in rows]
 
+    def get_context_turns(self) -> List[Dict[str, str]]:
+        """
+        Returns the turns in the context window, oldest first. The window start
+        only moves forward, in blocks (same policy as `stable_window_drop`), so
+        the history sent to the model stays byte-identical between turns while
+        it fits. Only the active session's rows inside the window are read.
+        """
+        with self._lock:
+            if self.session_id is None:
+                return []
+            last = self._conn.execute(SQL_LAST_TURN, (self.session_id,)).fetchone()
+            if last is None:
+                return []
+            last_id, last_tokens, last_cum = last
+            if last_cum - self._cum_before(self.session_id, self._window_start_id) > self.max_token_budget:
+                self._window_start_id = self._shrink_window(last_id, last_tokens, last_cum)
+                # Persisted with the next write (or on close) so reads never take the write lock
+                self._window_dirty = True
+            rows = self._conn.execute(SQL_WINDOW, (self.session_id, self._window_start_id)).fetchall()
+        return [{"user": user, "response": response} for user, response in rows]
+
+    def _shrink_window(self, last_id: int, last_tokens: int, last_cum: int) -> int:
+        """
+        New window start after an overflow: drop turns from the front until what
+        remains fits `retain_ratio * budget`, i.e. up to the first row whose
+        running total reaches last_cum - target. The newest turn is kept if it
+        fits the budget on its own.
+        """
+        target = self.max_token_budget * self.retain_ratio
+        dropped_through = self._conn.execute(SQL_FIRST_REACHING, (self.session_id, last_cum - target)).fetchone()[0]
+        if dropped_through < last_id:
+            return self._conn.execute(SQL_NEXT_ID, (self.session_id, dropped_through)).fetchone()[0]
+        return last_id if last_tokens <= self.max_token_budget else last_id + 1
+
+    @property
+    def window_start_id(self) -> int:
+        """Id of the first turn in the context window (0 until a turn has been evicted)."""
+        return self._window_start_id
+
+    def get_turns(self, session_id: int, after_id: int, before_id: int) -> List[tuple]:
+        """(id, user, response) of a session's turns with after_id < id < before_id."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT id, user, response FROM turns WHERE session_id = ? AND id > ? AND id < ? ORDER BY id ASC',
+                (session_id, after_id, before_id)
+            ).fetchall()
+
+    def load_summaries(self, session_id: Optional[int]) -> List[SummaryBlock]:
+        """The summary blocks currently in use for a session, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT first_id, last_id, level, text, tokens FROM summaries '
+                'WHERE session_id = ? AND active = 1 ORDER BY first_id ASC', (session_id,)
+            ).fetchall()
+        return [SummaryBlock(*row) for row in rows]
+
+    def get_summary(self, session_id: int, first_id: int, last_id: int, level: int) -> Optional[SummaryBlock]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT first_id, last_id, level, text, tokens FROM summaries '
+                'WHERE session_id = ? AND first_id = ? AND last_id = ? AND level = ?',
+                (session_id, first_id, last_id, level)
+            ).fetchone()
+        return SummaryBlock(*row) if row else None
+
+    def save_summaries(self, session_id: int, active: List[SummaryBlock], inactive: List[SummaryBlock]):
+        """Store new blocks; `inactive` ones (merged into others) stay as cache entries only."""
+        with self._write():
+            for blocks, flag in ((inactive, 0), (active, 1)):
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO summaries (session_id, first_id, last_id, level, text, tokens, active) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(session_id, b.first_id, b.last_id, b.level, b.text, b.tokens, flag) for b in blocks]
+                )
+
+    def _ranked(self, query: str, where: str, params: list, limit: int) -> List[Tuple[int, float]]:
+        """(turn id, bm25) of the best matches for an FTS5 `query`, best first. Caller holds the lock."""
+        sql = SQL_SEARCH_RANKED.format(where=where)
+        return self._conn.execute(sql, [query] + params + [SEARCH_CANDIDATES, limit]).fetchall()
+
+    def search(self, text: str, limit: int = 20, session_id: Optional[int] = None) -> List[TurnHit]:
+        """Best-matching turns for `text` (all words must occur), across all sessions unless `session_id` is given."""
+        query = fts_query(text)
+        if not self.fts_enabled or query is None:
+            return []
+        where, params = ('AND t.session_id = ?', [session_id]) if session_id is not None else ('', [])
+        hits = []
+        with self._lock:
+            for turn_id, score in self._ranked(query, where, params, limit):
+                row = self._conn.execute(SQL_SNIPPETS, (query, turn_id)).fetchone()
+                hits.append(TurnHit(turn_id, *row, score))
+        return hits
+
+    def get_relevant_turns(self, text: str, k: int = 3) -> List[Dict[str, str]]:
+        """
+        Up to `k` turns from before the context window that best match `text`
+        (BM25, any word), oldest first, limited to the part of the token
+        budget the window leaves unused. The window is the one computed by the
+        last `get_context_turns()`.
+        """
+        query = fts_query(text, any_term=True)
+        if not self.fts_enabled or query is None or not k or self.session_id is None or not self._window_start_id:
+            return []
+        with self._lock:
+            last = self._conn.execute(SQL_LAST_TURN, (self.session_id,)).fetchone()
+            if last is None:
+                return []
+            room = self.max_token_budget - (last[2] - self._cum_before(self.session_id, self._window_start_id))
+            if room <= 0:
+                return []
+            ranked = self._ranked(query, 'AND t.session_id = ? AND t.id < ?',
+                                  [self.session_id, self._window_start_id], k)
+            picked = []
+            for turn_id, _ in ranked:
+                user, response, tokens = self._conn.execute(SQL_RELEVANT, (turn_id,)).fetchone()
+                if tokens <= room:
+                    picked.append((turn_id, user, response))
+                    room -= tokens
+        return [{"user": user, "response": response} for _, user, response in sorted(picked)]
+
     def get_context_prompt(self) -> str:
         """
         Returns a chat-formatted prompt containing as much history as fits within the token budget.
         Oldest turns are truncated if needed to fit the budget.
         """
-        context = self.get_context()
-        prompt_turns = []
-        total_tokens = 0
-        # Build up prompt from most recent to oldest, then reverse at the end
-        for turn in reversed(context):
-            turn_str = f"User: {turn['user']}\nModel: {turn['response']}\n"
-            turn_tokens = self.token_estimator(turn_str)
-            if total_tokens + turn_tokens > self.max_token_budget:
-                break
-            prompt_turns.append(turn_str)
-            total_tokens += turn_tokens
-        # Reverse to get oldest-to-newest order
-        prompt = ''.join(reversed(prompt_turns)).strip()
-        return prompt
+        turns = self.get_context_turns()
+        return ''.join(f"User: {t['user']}\nModel: {t['response']}\n" for t in turns).strip()
 
     def clear(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('DELETE FROM session')
+        """Delete the active session and its turns; other sessions are untouched."""
+        with self._lock:
+            if self.session_id is not None:
+                with self._write():
+                    self._conn.execute('DELETE FROM turns WHERE session_id = ?', (self.session_id,))
+                    self._conn.execute('DELETE FROM summaries WHERE session_id = ?', (self.session_id,))
+                    self._conn.execute('DELETE FROM sessions WHERE id = ?', (self.session_id,))
+            self.session_id = None
+            self._window_start_id = 0
+            self._window_dirty = False
@@ -0,0 +1,95 @@
+"""
+Startup orchestration for the REPL.
+
+Independent startup work (model discovery, model warm-up, session loading)
+runs in background threads while the banner renders. Every phase is recorded
+on a `StartupTimeline`, which `codez chat --startup-profile` prints before
+the first prompt.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+
+class StartupPhase:
+    def __init__(self, name: str, start: float, thread: str):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.thread = thread
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+
+class StartupTimeline:
+    """
+    Records named startup phases with start/end offsets (seconds since the
+    timeline was created) and the thread they ran on.
+    """
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self._t0 = clock()
+        self._lock = threading.Lock()
+        self.phases: List[StartupPhase] = []
+
+    def now(self) -> float:
+        return self._clock() - self._t0
+
+    @contextmanager
+    def phase(self, name: str):
+        entry = StartupPhase(name, self.now(), threading.current_thread().name)
+        with self._lock:
+            self.phases.append(entry)
+        try:
+            yield entry
+        finally:
+            entry.end = self.now()
+
+    def mark(self, name: str):
+        """Record an instant, e.g. the moment the first prompt is shown."""
+        with self.phase(name):
+            pass
+
+    def run_in_background(self, name: str, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Run `fn` in a daemon thread as phase `name` and return a Future for its
+        result. Daemon threads never hold up exit, so a slow warm-up cannot
+        delay quitting the REPL.
+        """
+        future: Future = Future()
+
+        def task():
+            with self.phase(name):
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+        threading.Thread(target=task, name=f"codez-{name}", daemon=True).start()
+        return future
+
+    def render(self):
+        """Return a Rich table of the phases, with a bar showing when each ran."""
+        from rich.table import Table
+        with self._lock:
+            phases = list(self.phases)
+        total = max((p.end if p.end is not None else self.now()) for p in phases) if phases else 0.0
+        width = 30
+        table = Table(title="[bold sky_blue1]Startup Timeline[/bold sky_blue1]", border_style="sky_blue1")
+        table.add_column("Phase", style="cyan")
+        table.add_column("Thread", style="dim")
+        table.add_column("Start", justify="right")
+        table.add_column("Duration", justify="right")
+        table.add_column("", no_wrap=True)
+        for p in phases:
+            end = p.end if p.end is not None else self.now()
+            offset = int(width * p.start / total) if total else 0
+            length = max(1, int(width * (end - p.start) / total)) if total else 1
+            bar = " " * offset + "█" * min(length, width - offset)
+            duration = f"{p.duration * 1000:.0f} ms" if p.duration is not None else "[yellow]running[/yellow]"
+            table.add_row(p.name, p.thread, f"{p.start * 1000:.0f} ms", duration, f"[magenta]{bar}[/magenta]")
+        return table
@@ -1,31 +1,185 @@
 import time
 import sys
+from typing import NamedTuple
 
-def stream_response(text, console=None, delay=0.01):
-    """Stream text to the terminal character by character."""
-    for char in text:
-        if console:
-            console.print(char, end="", soft_wrap=True, highlight=False)
+# Output is drawn at most this many times a second (and at each newline)
+FRAME_RATE = 30
+
+class StreamStats(NamedTuple):
+    chars: int
+    frames: int     # writes actually made to the terminal
+    seconds: float
+
+    @property
+    def chars_per_second(self) -> float:
+        return self.chars / self.seconds if self.seconds else 0.0
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds else 0.0
+
+class FrameWriter:
+    """
+    Buffers streamed text and writes it out in frames: when a newline arrives
+    or 1/`fps` seconds after the previous frame, instead of once per
+    character. On a terminal the frames go through `console` with `style`;
+    when output is not a terminal (or there is no console) the text is
+    written as is, unstyled.
+    """
+    def __init__(self, console=None, style=None, fps=FRAME_RATE, clock=time.monotonic):
+        self.console = console
+        self.style = style
+        self.interval = 1.0 / fps
+        self._clock = clock
+        self._styled = console is not None and console.is_terminal
+        self._file = console.file if console is not None else sys.stdout
+        self._parts = []
+        self._started = clock()
+        self._last_frame = float("-inf")
+        self.chars = 0
+        self.frames = 0
+
+    def write(self, text: str):
+        if not text:
+            return
+        self._parts.append(text)
+        self.chars += len(text)
+        if "\n" in text or self._clock() - self._last_frame >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts = []
+        if self._styled:
+            self.console.print(text, end="", style=self.style, soft_wrap=True, markup=False, highlight=False)
         else:
-            print(char, end="", flush=True)
-        sys.stdout.flush()
-        time.sleep(delay)
-    if console:
-        console.print("")
-    else:
-        print("")
-
-def stream_thinking(text, console=None, delay=0.001):
+            self._file.write(text)
+            self._file.flush()
+        self._last_frame = self._clock()
+        self.frames += 1
+
+    def stats(self) -> StreamStats:
+        return StreamStats(self.chars, self.frames, self._clock() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+def _typewrite(text, writer, delay):
+    """Write `text` at one character per `delay` seconds, sleeping a frame at a time rather than a character."""
+    if delay <= 0:
+        writer.write(text)
+        return
+    start = time.monotonic()
+    shown = 0
+    while shown < len(text):
+        due = min(len(text), int((time.monotonic() - start) / delay) + 1)
+        writer.write(text[shown:due])
+        shown = due
+        if shown < len(text):
+            time.sleep(max(writer.interval, delay))
+
+def stream_response(text, console=None, delay=0.01) -> StreamStats:
+    """Stream text to the terminal at one character per `delay` seconds, drawn in frames."""
+    with FrameWriter(console) as writer:
+        _typewrite(text + "\n", writer, delay)
+    return writer.stats()
+
+def stream_thinking(text, console=None, delay=0.001) -> StreamStats:
     """Stream text in light gray color for thought process."""
-    style = "grey20"  # Rich color for light gray
-    for char in text:
-        if console:
-            console.print(char, end="", style=style, soft_wrap=True, highlight=False)
-        else:
-            print(char, end="", flush=True)
-        sys.stdout.flush()
-        time.sleep(delay)
-    if console:
-        console.print("")
-    else:
-        print("")
+    with FrameWriter(console, style="grey70") as writer:  # light gray
+        _typewrite(text + "\n", writer, delay)
+    return writer.stats()
+
+def split_settled(text):
+    """
+    Split markdown text into (settled, pending). `settled` ends at the last
+    paragraph break or closing code fence outside an open fence, so it will not
+    re-render differently when more text arrives; `pending` is the rest.
+    """
+    in_fence = False
+    boundary = 0
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        pos += len(line)
+        if not line.endswith("\n"):
+            break
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_fence = not in_fence
+            if not in_fence:
+                boundary = pos
+        elif not stripped and not in_fence:
+            boundary = pos
+    return text[:boundary], text[boundary:]
+
+def stream_markdown(chunks, console, render=None, transform=None, refresh_per_second=10, stats=None):
+    """
+    Render streamed text chunks as they arrive and return the full raw text.
+
+    Settled blocks (see `split_settled`) are printed once; only the trailing,
+    still-growing block is redrawn in a Live region, at most
+    `refresh_per_second` times a second. When the console is not a terminal
+    the settled text is written as is, unrendered, through a `FrameWriter`.
+    `transform` maps the raw text to the text to display (e.g. hiding
+    <think> blocks) and `render` turns display text into a Rich renderable.
+    If `stats` is a dict, its "stream" key is set to the StreamStats.
+    """
+    transform = transform or (lambda text: text)
+    parts = []
+    printed = 0  # length of the display text already printed permanently
+
+    def settle():
+        nonlocal printed
+        visible = transform(''.join(parts))
+        settled, pending = split_settled(visible[printed:])
+        printed += len(settled)
+        return settled, pending
+
+    if not console.is_terminal:
+        with FrameWriter(console) as writer:
+            for chunk in chunks:
+                parts.append(chunk)
+                writer.write(settle()[0])
+            pending = settle()[1]
+            writer.write(pending + "\n" if pending.strip() else "")
+        if stats is not None:
+            stats["stream"] = writer.stats()
+        return ''.join(parts)
+
+    from rich.live import Live
+    from rich.markdown import Markdown
+    render = render or Markdown
+    interval = 1.0 / refresh_per_second
+    started = time.monotonic()
+    frames = 0
+
+    def pending_text():
+        nonlocal frames
+        settled, pending = settle()
+        if settled.strip():
+            live.console.print(render(settled))
+            frames += 1
+        return pending
+
+    with Live(render(""), console=console, auto_refresh=False, transient=True) as live:
+        last_refresh = 0.0
+        for chunk in chunks:
+            parts.append(chunk)
+            now = time.monotonic()
+            if now - last_refresh >= interval:
+                live.update(render(pending_text()), refresh=True)
+                frames += 1
+                last_refresh = now
+        pending = pending_text()
+        live.update(render(""), refresh=True)
+    if pending.strip():
+        console.print(render(pending))
+        frames += 1
+    if stats is not None:
+        stats["stream"] = StreamStats(printed + len(pending), frames, time.monotonic() - started)
+    return ''.join(parts)
@@ -0,0 +1,267 @@
+"""
+Rolling summaries of history that has left the context window.
+
+When the memory's window start moves forward, the turns it dropped are
+summarized by a background worker (one daemon thread, so the prompt never
+waits on it) and appended to the session's summary as a block covering that
+turn range. The worker only talks to the model between requests: jobs wait
+while a reply is being generated (see `pause` and `resume`), and a summary
+still being generated when the next request starts is aborted and retried
+later, so it never competes with the foreground generation. Older blocks are
+merged into coarser, higher-level blocks whenever the summary outgrows its
+token allowance, so recent history keeps more detail than old history and the
+summary stays within a fixed size however long the session runs.
+
+Blocks are cached by (session, first turn, last turn, level). With a
+SQLiteSessionMemory they are stored next to the turns, so a restarted or
+reloaded session does not summarize anything twice.
+
+`CODEZ_SUMMARY_TOKENS` sets the allowance and turns the summarizer on
+(e.g. 400; default 0, off). It is opt-in because each summary is a request
+with its own system prompt: on a server with one slot it replaces the cached
+prompt prefix, so the next question is prefilled in full.
+"""
+import os
+import queue
+import threading
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+SUMMARY_TOKENS_ENV = "CODEZ_SUMMARY_TOKENS"
+# Allowance of a summarizer built without one; the REPL's is off unless CODEZ_SUMMARY_TOKENS is set
+DEFAULT_SUMMARY_TOKENS = 400
+# Evicted turns are summarized in chunks of about this many tokens
+DEFAULT_CHUNK_TOKENS = 2000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You compress conversation history between a developer and a code assistant. "
+    "Keep decisions, conclusions, file and function names, errors and open questions; "
+    "drop pleasantries and code that can be re-read. Answer with the summary only, as short bullet points."
+)
+
+
+class SummaryBlock(NamedTuple):
+    first_id: int  # first turn covered
+    last_id: int   # last turn covered
+    level: int     # 0 summarizes turns; n > 0 merges blocks of lower levels
+    text: str
+    tokens: int
+
+
+def get_summary_tokens() -> int:
+    """The summary allowance from CODEZ_SUMMARY_TOKENS; 0 (the default) means no summaries."""
+    try:
+        return max(0, int(os.environ.get(SUMMARY_TOKENS_ENV, 0)))
+    except ValueError:
+        return 0
+
+
+def model_summarizer(model_name_fn: Callable[[], str]) -> Callable[[str, int, threading.Event], str]:
+    """
+    A `summarize(text, max_tokens, stop_event)` function backed by the chat
+    model; `model_name_fn` returns the current model. Setting `stop_event`
+    aborts the generation.
+    """
+    def summarize(text: str, max_tokens: int, stop_event: Optional[threading.Event] = None) -> str:
+        from core import model
+        messages = [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Summarize in at most {max_tokens} tokens:\n\n{text}"},
+        ]
+        return "".join(model.stream_chat(messages, model_name_fn(), stop_event=stop_event)).strip()
+    return summarize
+
+
+def format_turns(turns: List[Tuple[int, str, str]]) -> str:
+    return "\n".join(f"User: {user}\nModel: {response}" for _, user, response in turns)
+
+
+class _Interrupted(Exception):
+    """A summary job stopped by a request starting, a session change or `close`."""
+
+
+class RollingSummarizer:
+    """
+    Maintains the summary blocks of one session at a time.
+    `summarize(text, max_tokens, stop_event) -> str` does the compression
+    (see `model_summarizer`) and should return early once `stop_event` is
+    set; `store` is the memory the turns come from and must
+    provide `window_start_id`, `session_id`, `get_turns`,
+    `load_summaries`, `get_summary` and `save_summaries` (blocks merged away
+    are kept, inactive, as cache entries).
+    """
+    def __init__(self, summarize: Callable[[str, int], str], token_estimator: Callable[[str], int], store,
+                 max_tokens: int = DEFAULT_SUMMARY_TOKENS, chunk_tokens: int = DEFAULT_CHUNK_TOKENS):
+        self.summarize = summarize
+        self.token_estimator = token_estimator
+        self.store = store
+        self.max_tokens = max_tokens
+        self.chunk_tokens = chunk_tokens
+        self._lock = threading.Lock()
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._epoch = 0  # bumped on session change; results of older jobs are dropped
+        # Guards _idle and _closed; held while saving so close() cannot release the store mid-write
+        self._state = threading.Condition()
+        self._idle = True      # no foreground request in flight
+        self._closed = False
+        self._cancel = threading.Event()  # aborts the summary being generated
+        self.blocks: List[SummaryBlock] = []
+        self._session_id = None
+        self._seen_start = 0
+        self.reset()
+
+    def reset(self):
+        """Follow the store's active session (after a switch, a new session or clear)."""
+        session_id = self.store.session_id
+        blocks = self.store.load_summaries(session_id)
+        with self._lock:
+            self._epoch += 1
+            self._session_id = session_id
+            self.blocks = blocks
+            # The next update() queues whatever was evicted but never summarized
+            self._seen_start = 0
+
+    @property
+    def covered_through(self) -> int:
+        return self.blocks[-1].last_id if self.blocks else 0
+
+    def pause(self):
+        """A request is about to be sent: hold queued jobs and abort the summary in progress."""
+        with self._state:
+            self._idle = False
+            self._cancel.set()
+
+    def resume(self):
+        """The reply is done: queued jobs may run until the next `pause`."""
+        with self._state:
+            self._idle = True
+            self._state.notify_all()
+
+    def close(self, timeout: float = 5.0):
+        """Stop the worker (dropping queued jobs) and wait for it, so the store can be closed."""
+        with self._state:
+            self._closed = True
+            self._cancel.set()
+            self._state.notify_all()
+        self._jobs.put(None)  # wakes an idle worker
+        worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def update(self):
+        """
+        Called on the hot path before building a prompt: if the window start
+        moved, queue the newly evicted turns for summarizing. The jobs run
+        after the next `resume` (when the reply is done). Never blocks.
+        """
+        self.pause()
+        if self._closed:
+            return
+        if self.store.session_id != self._session_id:
+            self.reset()
+        start = self.store.window_start_id
+        if start > self._seen_start:
+            self._seen_start = start
+            self._jobs.put((self._epoch, self._session_id, start))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="codez-summarizer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                job = self._jobs.get(timeout=5)
+            except queue.Empty:
+                return
+            if job is None:  # from close(); jobs queued before it fail fast as interrupted
+                self._jobs.task_done()
+                return
+            epoch, session_id, start = job
+            try:
+                self._summarize_range(epoch, session_id, start)
+            except Exception:
+                # Interrupted, or the model is busy or gone; the range is retried on the next eviction
+                with self._lock:
+                    if epoch == self._epoch:
+                        self._seen_start = min(self._seen_start, self.covered_through)
+            finally:
+                self._jobs.task_done()
+
+    def _chunks(self, turns: List[Tuple[int, str, str]]) -> List[List[Tuple[int, str, str]]]:
+        chunks, size = [[]], 0
+        for turn in turns:
+            tokens = self.token_estimator(format_turns([turn]))
+            if chunks[-1] and size + tokens > self.chunk_tokens:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(turn)
+            size += tokens
+        return chunks
+
+    def _summarize_range(self, epoch: int, session_id, start: int):
+        turns = self.store.get_turns(session_id, self.covered_through, start)
+        if not turns:
+            return
+        added, removed = [], []
+        blocks = list(self.blocks)
+        for chunk in self._chunks(turns):
+            blocks.append(self._block(epoch, session_id, chunk[0][0], chunk[-1][0], 0, lambda: format_turns(chunk)))
+            added.append(blocks[-1])
+            # Merge the two oldest blocks until the summary fits its allowance
+            while sum(b.tokens for b in blocks) > self.max_tokens and len(blocks) > 1:
+                a, b = blocks[0], blocks[1]
+                merged = self._block(epoch, session_id, a.first_id, b.last_id, max(a.level, b.level) + 1,
+                                     lambda: f"{a.text}\n{b.text}")
+                removed += [a, b]
+                blocks = [merged] + blocks[2:]
+                added.append(merged)
+        with self._state:
+            if self._closed:
+                raise _Interrupted()
+            with self._lock:
+                if epoch != self._epoch:
+                    return
+                self.blocks = blocks
+            self.store.save_summaries(session_id, [b for b in added if b not in removed], removed)
+
+    def _block(self, epoch: int, session_id, first_id: int, last_id: int, level: int,
+               text_fn: Callable[[], str]) -> SummaryBlock:
+        cached = self.store.get_summary(session_id, first_id, last_id, level)
+        if cached is not None:
+            return cached
+        text = self._summarize(epoch, text_fn(), self.max_tokens // 2)
+        tokens = self.token_estimator(text)
+        if tokens > self.max_tokens:
+            text = self._fit(text)
+            tokens = self.token_estimator(text)
+        return SummaryBlock(first_id, last_id, level, text, tokens)
+
+    def _summarize(self, epoch: int, text: str, max_tokens: int) -> str:
+        """`summarize`, once no request is in flight; raises _Interrupted if one starts meanwhile."""
+        with self._state:
+            while not self._idle and not self._closed:
+                self._state.wait()
+            if self._closed or epoch != self._epoch:
+                raise _Interrupted()
+            self._cancel.clear()
+        summary = self.summarize(text, max_tokens, self._cancel)
+        if self._cancel.is_set():
+            raise _Interrupted()  # cut short: the partial text is not a summary
+        return summary
+
+    def _fit(self, text: str) -> str:
+        """Cut `text` down to the allowance (for a model that ignored the requested length)."""
+        words = text.split(" ")
+        while words and self.token_estimator(" ".join(words)) > self.max_tokens:
+            words = words[:len(words) * 9 // 10]
+        return " ".join(words)
+
+    def render(self) -> str:
+        """The summary to put in the prompt ("" if there is none yet)."""
+        with self._lock:
+            blocks = list(self.blocks)
+        return "\n".join(b.text for b in blocks)
+
+    def wait(self):
+        """Block until queued summaries are done, after a `resume` (for tests and benchmarks)."""
+        self._jobs.join()
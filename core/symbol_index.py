@@ -0,0 +1,303 @@
+"""
+Repository-wide symbol index.
+
+`SymbolIndex.update` walks a repository (the files git would track, so .gitignore is
+honoured; a plain walk with the root .gitignore outside git), parses the
+source files whose language has a built grammar across a process pool, and
+stores every function, method and class-like declaration in SQLite with its file, language, byte and
+line range and the file's content hash.
+
+Re-indexing is incremental: files whose size and mtime are unchanged are not
+read at all, files that were touched but hash the same are not re-parsed,
+and deleted files are dropped. Looking a symbol up by name is an indexed
+query, and its source is read back by byte range once the file's hash
+confirms the range is still valid.
+
+The index for a repository lives in the user cache dir, keyed by its path.
+"""
+import fnmatch
+import hashlib
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+from platformdirs import user_cache_dir
+
+from core import parser as ts_parser
+
+INDEX_DIR = os.path.join(user_cache_dir("codez"), "index")
+# Below this many changed files the pool costs more than it saves
+PARALLEL_THRESHOLD = 16
+# Directories never worth walking when git is not available
+SKIP_DIRS = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".tox", "build", "dist"}
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        language TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        hash TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS symbols (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+        language TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        start_byte INTEGER NOT NULL,
+        end_byte INTEGER NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        hash TEXT NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols (name)',
+    'CREATE INDEX IF NOT EXISTS idx_symbols_path ON symbols (path)',
+)
+
+
+class IndexedSymbol(NamedTuple):
+    path: str  # relative to the repository root
+    language: str
+    kind: str
+    name: str
+    start_byte: int
+    end_byte: int
+    start_line: int
+    end_line: int
+    hash: str  # of the whole file when it was indexed
+
+
+class IndexStats(NamedTuple):
+    files: int        # source files seen
+    parsed: int       # files (re)parsed
+    unchanged: int    # files skipped by mtime or hash
+    removed: int      # files dropped from the index
+    symbols: int      # symbols in the index afterwards
+    seconds: float
+    missing_grammars: Tuple[str, ...]  # languages present in the repo without a built grammar
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+
+def print_index_stats(stats: IndexStats, console=None):
+    """Print what an update did, and the languages it skipped for want of a grammar."""
+    if console is None:
+        from rich.console import Console
+        console = Console()
+    console.print(f"[green]Indexed {stats.files} files in {stats.seconds:.2f} s ({stats.files_per_second:.0f} files/s): "
+                  f"{stats.parsed} parsed, {stats.unchanged} unchanged, {stats.removed} removed; "
+                  f"{stats.symbols} symbols.[/green]")
+    if stats.missing_grammars:
+        console.print(f"[yellow]No grammar built for: {', '.join(stats.missing_grammars)} "
+                      f"(run build_grammars.sh to index them).[/yellow]")
+
+
+def default_index_path(root: str) -> str:
+    root = os.path.realpath(root)
+    digest = hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{os.path.basename(root) or 'root'}-{digest}.db")
+
+
+# -- walking ---------------------------------------------------------------
+
+def _git_files(root: str) -> Optional[List[str]]:
+    """Tracked and untracked-but-not-ignored files, or None outside a git work tree."""
+    try:
+        result = subprocess.run(["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                                cwd=root, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return [path for path in result.stdout.decode("utf-8", "surrogateescape").split("\0") if path]
+
+
+def _gitignore_patterns(root: str) -> List[str]:
+    try:
+        with open(os.path.join(root, ".gitignore"), encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError:
+        return []
+
+
+def _ignored(rel_path: str, is_dir: bool, patterns: List[str]) -> bool:
+    """Root .gitignore semantics for the common cases: globs, anchored and dir-only patterns, negation."""
+    ignored = False
+    name = os.path.basename(rel_path)
+    for pattern in patterns:
+        negate = pattern.startswith("!")
+        pattern = pattern[1:] if negate else pattern
+        if pattern.endswith("/"):
+            if not is_dir:
+                continue
+            pattern = pattern.rstrip("/")
+        if "/" in pattern.strip("/"):
+            matched = fnmatch.fnmatch(rel_path, pattern.lstrip("/"))
+        elif pattern.startswith("/"):
+            matched = fnmatch.fnmatch(rel_path, pattern[1:])
+        else:
+            matched = fnmatch.fnmatch(name, pattern)
+        if matched:
+            ignored = not negate
+    return ignored
+
+
+def walk_repository(root: str) -> List[str]:
+    """Paths (relative to `root`, '/'-separated) of the source files we can parse, honouring .gitignore."""
+    paths = _git_files(root)
+    if paths is None:
+        patterns = _gitignore_patterns(root)
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, root)
+            rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/") + "/"
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not _ignored(rel_dir + d, True, patterns)]
+            paths.extend(rel_dir + f for f in filenames if not _ignored(rel_dir + f, False, patterns))
+    return sorted(path for path in paths if ts_parser.language_for_path(path))
+
+
+# -- parsing (runs in worker processes) -------------------------------------
+
+def _parse_file(job):
+    """
+    Read, hash and (if the hash changed) parse one file. Returns
+    (path, size, mtime_ns, hash, symbols or None when unchanged).
+    """
+    root, path, language, old_hash = job
+    full_path = os.path.join(root, path)
+    with open(full_path, "rb") as f:
+        source = f.read()
+        stat = os.fstat(f.fileno())
+    digest = hashlib.sha256(source).hexdigest()
+    if digest == old_hash:
+        return path, stat.st_size, stat.st_mtime_ns, digest, None
+    symbols = ts_parser.extract_symbols(source, language)
+    return path, stat.st_size, stat.st_mtime_ns, digest, symbols
+
+
+class SymbolIndex:
+    """The symbol table of one repository, stored at `db_path`."""
+    def __init__(self, root: str, db_path: Optional[str] = None):
+        self.root = os.path.realpath(root)
+        self.db_path = db_path or default_index_path(self.root)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._lock = threading.Lock()
+        with self._conn:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    def update(self, workers: Optional[int] = None) -> IndexStats:
+        """
+        Bring the index up to date with the files on disk. `workers` sets the
+        process pool size (default: one per CPU; 1 parses in this process).
+        """
+        start = time.perf_counter()
+        paths = walk_repository(self.root)
+        with self._lock:
+            known = {row[0]: row[1:] for row in self._conn.execute('SELECT path, size, mtime_ns, hash FROM files')}
+        jobs, seen, missing, unchanged = [], set(), set(), 0
+        available = {}
+        for path in paths:
+            language = ts_parser.language_for_path(path)
+            if language not in available:
+                available[language] = ts_parser.grammar_available(language)
+            if not available[language]:
+                missing.add(language)
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, path))
+            except OSError:
+                continue  # tracked but deleted from the work tree
+            seen.add(path)
+            old = known.get(path)
+            if old is not None and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+                unchanged += 1
+                continue
+            jobs.append((self.root, path, language, old[2] if old else None))
+
+        results = self._run(jobs, workers)
+        parsed = 0
+        removed = [path for path in known if path not in seen]
+        with self._lock, self._conn:
+            for path, size, mtime_ns, digest, symbols in results:
+                # An upsert, not INSERT OR REPLACE: replacing the row would cascade to its symbols
+                self._conn.execute(
+                    'INSERT INTO files (path, language, size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, '
+                    'hash = excluded.hash', (path, ts_parser.language_for_path(path), size, mtime_ns, digest))
+                if symbols is None:
+                    unchanged += 1
+                    continue
+                parsed += 1
+                language = ts_parser.language_for_path(path)
+                self._conn.execute('DELETE FROM symbols WHERE path = ?', (path,))
+                self._conn.executemany(
+                    'INSERT INTO symbols (path, language, kind, name, start_byte, end_byte, start_line, end_line, hash) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(path, language, s.kind, s.name, s.start_byte, s.end_byte, s.start_line, s.end_line, digest)
+                     for s in symbols]
+                )
+            self._conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in removed])
+            total = self._conn.execute('SELECT COUNT(*) FROM symbols').fetchone()[0]
+        return IndexStats(len(seen), parsed, unchanged, len(removed), total, time.perf_counter() - start,
+                          tuple(sorted(missing)))
+
+    def _run(self, jobs, workers: Optional[int]):
+        results = []
+        if workers == 1 or len(jobs) < PARALLEL_THRESHOLD:
+            for job in jobs:
+                try:
+                    results.append(_parse_file(job))
+                except OSError:
+                    pass  # deleted or unreadable since the walk
+            return results
+        # Each worker loads the grammars it will need once, before its first job
+        languages = sorted({job[2] for job in jobs})
+        with ProcessPoolExecutor(max_workers=workers, initializer=ts_parser.warm_up, initargs=(languages,)) as pool:
+            futures = [pool.submit(_parse_file, job) for job in jobs]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except OSError:
+                    pass
+        return results
+
+    def find(self, name: str, limit: int = 20) -> List[IndexedSymbol]:
+        """Symbols named `name` exactly, or, failing that, whose name contains it."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, language, kind, name, start_byte, end_byte, start_line, end_line, hash '
+                'FROM symbols WHERE name = ? ORDER BY path, start_byte LIMIT ?', (name, limit)).fetchall()
+            if not rows:
+                rows = self._conn.execute(
+                    'SELECT path, language, kind, name, start_byte, end_byte, start_line, end_line, hash '
+                    "FROM symbols WHERE name LIKE ? ESCAPE '\\' ORDER BY length(name), path LIMIT ?",
+                    ('%' + name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%', limit)
+                ).fetchall()
+        return [IndexedSymbol(*row) for row in rows]
+
+    def source(self, symbol: IndexedSymbol) -> str:
+        """
+        The symbol's source text, read by byte range. Raises LookupError if the
+        file changed since it was indexed (run `update()` first).
+        """
+        with open(os.path.join(self.root, symbol.path), "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != symbol.hash:
+            raise LookupError(f"{symbol.path} changed since it was indexed")
+        return data[symbol.start_byte:symbol.end_byte].decode("utf-8", "replace")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,140 @@
+"""
+Token counting for context budgeting.
+
+`get_token_counter(model)` returns a memoized counter for the model's real
+tokenizer when one is available (a Hugging Face `tokenizer.json` found under
+`CODEZ_TOKENIZER_DIR`, loaded with the optional `tokenizers` package), and
+otherwise a fast heuristic that splits identifiers, digits, punctuation and
+indentation roughly the way BPE tokenizers for code models do. The heuristic
+carries a scale factor that `calibrate()` nudges towards the server's own
+prompt_eval_count.
+
+Counters are callables (`counter(text) -> int`) so they drop in wherever a
+`token_estimator` is accepted.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+TOKENIZER_DIR_ENV = "CODEZ_TOKENIZER_DIR"
+MEMO_SIZE = 8192
+
+# Letter runs, up to three digits, one punctuation char, or a newline plus its indentation.
+_PIECE = re.compile(r"[A-Za-z]+|\d{1,3}|\n[ \t]*|[^\w\s]|_")
+# BPE vocabularies keep common words whole; long identifiers split every ~6 letters.
+_LETTERS_PER_TOKEN = 6
+
+
+class HeuristicCounter:
+    """Tokenizer-free estimate for code and prose; `scale` is the calibration factor."""
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+
+    @property
+    def name(self) -> str:
+        # Counts made at different scales must not be mixed, so the scale is part of the name
+        return "heuristic" if self.scale == 1.0 else f"heuristic@{self.scale:.2f}"
+
+    def __call__(self, text: str) -> int:
+        count = 0
+        for match in _PIECE.finditer(text):
+            piece = match.group()
+            if piece[0].isalpha():
+                count += 1 + (len(piece) - 1) // _LETTERS_PER_TOKEN
+            else:
+                count += 1
+        return round(count * self.scale)
+
+    def calibrate(self, estimated: int, actual: int, weight: float = 0.2):
+        """Move `scale` towards actual/estimated (bounded, smoothed over requests)."""
+        if estimated <= 0 or actual <= 0:
+            return
+        ratio = min(2.0, max(0.5, actual / (estimated / self.scale)))
+        # In steps of 0.01, so that small corrections don't invalidate stored counts every time
+        self.scale = round(self.scale + weight * (ratio - self.scale), 2)
+
+
+class HFTokenizerCounter:
+    """Exact counts from a Hugging Face `tokenizer.json`."""
+    def __init__(self, path: str):
+        from tokenizers import Tokenizer
+        self.name = f"hf:{os.path.basename(os.path.dirname(path))}"
+        self._tokenizer = Tokenizer.from_file(path)
+
+    def __call__(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class CachedCounter:
+    """
+    Memoizes another counter by a hash of the text, so re-counting unchanged
+    history or system prompts is a dict lookup.
+    """
+    def __init__(self, counter, max_entries: int = MEMO_SIZE):
+        self.counter = counter
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.counter.name
+
+    def __call__(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            count = self._memo.get(key)
+            if count is not None:
+                self._memo.move_to_end(key)
+                return count
+        count = self.counter(text)
+        with self._lock:
+            self._memo[key] = count
+            if len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return count
+
+    def calibrate(self, estimated: int, actual: int):
+        if hasattr(self.counter, "calibrate"):
+            self.counter.calibrate(estimated, actual)
+            with self._lock:
+                self._memo.clear()
+
+
+def find_tokenizer_file(model: Optional[str]) -> Optional[str]:
+    """
+    Look for `<CODEZ_TOKENIZER_DIR>/<name>/tokenizer.json`, trying the full
+    model tag (':' and '/' replaced by '_') and then the bare model family.
+    """
+    root = os.environ.get(TOKENIZER_DIR_ENV)
+    if not root or not model:
+        return None
+    for name in (re.sub(r"[:/]", "_", model), model.split(":")[0].split("/")[-1]):
+        path = os.path.join(root, name, "tokenizer.json")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+_counters: Dict[Optional[str], CachedCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: Optional[str] = None) -> CachedCounter:
+    """Shared memoized counter for `model` (None for the heuristic)."""
+    with _counters_lock:
+        counter = _counters.get(model)
+        if counter is None:
+            base = None
+            path = find_tokenizer_file(model)
+            if path:
+                try:
+                    base = HFTokenizerCounter(path)
+                except Exception:
+                    # `tokenizers` not installed or an unreadable file: fall back
+                    base = None
+            counter = _counters[model] = CachedCounter(base or HeuristicCounter())
+        return counter
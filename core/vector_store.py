@@ -0,0 +1,440 @@
+"""
+Local vector index for semantic retrieval of code and conversation chunks.
+
+`VectorStore` keeps L2-normalised vectors in a memory-mapped file, as float16
+or int8 (one float32 scale per row), with the ids in a memory-mapped int64
+sidecar and the row count in a small JSON header:
+
+    <dir>/vectors.bin   capacity x dim, float16 or int8
+    <dir>/scales.bin    capacity float32 (int8 only)
+    <dir>/ids.bin       capacity int64, -1 marks a deleted row
+    <dir>/header.json   dim, dtype, row count, deleted rows, capacity
+
+Queries are scored blockwise (one matrix product per block of rows, so memory
+stays bounded at any size) and the top k are picked with argpartition. int8 is
+the default: a quarter of the float32 size, and converting it for the product
+is several times cheaper than converting float16 on CPUs without F16C.
+Deleting marks rows dead; they are compacted away once they make up a quarter
+of the file.
+
+`ChunkIndex` adds the text side: it embeds chunks (conversation turns, and
+functions found by `core.parser.extract_functions`, or fixed line windows
+when no grammar is available) with any embedder from core/embeddings.py and
+keeps their text in SQLite next to the vectors.
+
+NumPy is an optional dependency (`pip install codez-cli[semantic]`).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+np = None  # imported on first use: NumPy is optional and slow to import
+
+DTYPES = ("float16", "int8")
+INITIAL_CAPACITY = 1024
+# Rows scored per matrix product: about 32 MB of float32 work space per block
+BLOCK_BYTES = 32 * 1024 * 1024
+# Compact once this share of rows is deleted
+COMPACT_RATIO = 0.25
+EMBED_BATCH = 64
+# Code without a usable grammar is cut into windows of this many lines
+WINDOW_LINES = 40
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("The vector index needs NumPy: pip install 'codez-cli[semantic]'") from None
+        np = numpy
+    return np
+
+
+class VectorHit(NamedTuple):
+    id: int
+    score: float  # cosine similarity
+
+
+class VectorStore:
+    """
+    Top-k cosine search over vectors stored under `path` (a directory).
+    `dim` and `dtype` are fixed when the store is created; an existing store
+    keeps its own. Ids are caller-chosen non-negative integers; adding an id
+    that is already present replaces its vector.
+    """
+    def __init__(self, path: str, dim: Optional[int] = None, dtype: str = "int8"):
+        _require_numpy()
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        header = self._read_header()
+        if header is None:
+            if dim is None:
+                raise ValueError("dim is required to create a vector store")
+            if dtype not in DTYPES:
+                raise ValueError(f"Unsupported dtype: {dtype} (expected one of {', '.join(DTYPES)})")
+            header = {"dim": dim, "dtype": dtype, "count": 0, "deleted": 0, "capacity": 0}
+        elif dim is not None and dim != header["dim"]:
+            raise ValueError(f"Vector store at {path} has dim {header['dim']}, not {dim}")
+        self.dim = header["dim"]
+        self.dtype = header["dtype"]
+        self._count = header["count"]
+        self._deleted = header["deleted"]
+        self._capacity = 0
+        self._vectors = self._scales = self._ids = None
+        self._map(max(header["capacity"], INITIAL_CAPACITY))
+
+    # -- files ---------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_header(self) -> Optional[dict]:
+        try:
+            with open(self._file("header.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_header(self):
+        header = {"dim": self.dim, "dtype": self.dtype, "count": self._count, "deleted": self._deleted,
+                  "capacity": self._capacity}
+        tmp = self._file("header.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(header, f)
+        os.replace(tmp, self._file("header.json"))
+
+    def _map(self, capacity: int):
+        """(Re)open the memory maps with room for `capacity` rows, growing the files as needed."""
+        self.flush()
+        files = [("vectors.bin", np.dtype(self.dtype), (capacity, self.dim)), ("ids.bin", np.dtype(np.int64), (capacity,))]
+        if self.dtype == "int8":
+            files.append(("scales.bin", np.dtype(np.float32), (capacity,)))
+        maps = []
+        for name, dtype, shape in files:
+            path = self._file(name)
+            size = dtype.itemsize * int(np.prod(shape))
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            maps.append(np.memmap(path, dtype=dtype, mode="r+", shape=shape))
+        self._vectors, self._ids = maps[0], maps[1]
+        self._scales = maps[2] if len(maps) > 2 else None
+        self._capacity = capacity
+
+    def flush(self):
+        for array in (self._vectors, self._ids, self._scales):
+            if array is not None:
+                array.flush()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._write_header()
+            self._vectors = self._scales = self._ids = None
+
+    # -- writes --------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._count - self._deleted
+
+    def _normalise(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add(self, ids: Sequence[int], vectors):
+        """Add (or replace) vectors; `vectors` is anything NumPy can read as (len(ids), dim)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = self._normalise(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors differ in length")
+        if (ids < 0).any():
+            raise ValueError("ids must be non-negative")
+        with self._lock:
+            self._delete(ids)
+            start, end = self._count, self._count + len(ids)
+            if end > self._capacity:
+                capacity = self._capacity
+                while capacity < end:
+                    capacity *= 2
+                self._map(capacity)
+            if self.dtype == "int8":
+                peak = np.abs(vectors).max(axis=1)
+                scales = np.where(peak == 0, 1, peak) / 127
+                self._vectors[start:end] = np.round(vectors / scales[:, None]).astype(np.int8)
+                self._scales[start:end] = scales
+            else:
+                self._vectors[start:end] = vectors.astype(np.float16)
+            self._ids[start:end] = ids
+            self._count = end
+            self.flush()
+            self._write_header()
+
+    def delete(self, ids: Iterable[int]) -> int:
+        """Remove vectors by id; returns how many were present."""
+        with self._lock:
+            removed = self._delete(np.asarray(list(ids), dtype=np.int64))
+            if removed:
+                if self._deleted > self._count * COMPACT_RATIO:
+                    self._compact()
+                self.flush()
+                self._write_header()
+            return removed
+
+    def _delete(self, ids) -> int:
+        if not len(ids) or not self._count:
+            return 0
+        live = self._ids[:self._count]
+        rows = np.flatnonzero(np.isin(live, ids))
+        live[rows] = -1
+        self._deleted += len(rows)
+        return len(rows)
+
+    def _compact(self):
+        """Move live rows down over the dead ones, block by block (destinations never pass sources)."""
+        keep = np.flatnonzero(self._ids[:self._count] >= 0)
+        step = self._block_rows()
+        for start in range(0, len(keep), step):
+            rows = keep[start:start + step]
+            self._vectors[start:start + len(rows)] = self._vectors[rows]
+            self._ids[start:start + len(rows)] = self._ids[rows]
+            if self._scales is not None:
+                self._scales[start:start + len(rows)] = self._scales[rows]
+        self._count, self._deleted = len(keep), 0
+
+    # -- search --------------------------------------------------------------
+
+    def _block_rows(self) -> int:
+        return max(1024, BLOCK_BYTES // (4 * self.dim))
+
+    def search(self, query, k: int = 10) -> List[VectorHit]:
+        """The `k` stored vectors most similar to `query`, best first."""
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries, k: int = 10) -> List[List[VectorHit]]:
+        """Top-k for several queries at once: each block of rows is scored against all of them in one product."""
+        queries = self._normalise(queries)
+        results = [[] for _ in range(len(queries))]
+        with self._lock:
+            count = self._count
+            if not count or k <= 0:
+                return results
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            step = min(self._block_rows(), count)
+            # One conversion buffer per search: allocating it per block costs more than the product
+            block = np.empty((step, self.dim), dtype=np.float32)
+            for start in range(0, count, step):
+                end = min(start + step, count)
+                np.copyto(block[:end - start], self._vectors[start:end], casting="unsafe")
+                scores = queries @ block[:end - start].T
+                if self._scales is not None:
+                    scores *= self._scales[start:end]
+                scores[:, self._ids[start:end] < 0] = -np.inf
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), scores.shape)], axis=1)
+                if best_scores.shape[1] > k:
+                    top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, top, axis=1)
+                    best_rows = np.take_along_axis(best_rows, top, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            for i in range(len(queries)):
+                for j in order[i]:
+                    if best_scores[i, j] == -np.inf:
+                        break
+                    results[i].append(VectorHit(int(self._ids[best_rows[i, j]]), float(best_scores[i, j])))
+        return results
+
+
+class Chunk(NamedTuple):
+    source: str  # e.g. "session:3" or a file path
+    ref: str     # position within the source: a turn id, "start-end" lines
+    text: str
+
+
+class ChunkHit(NamedTuple):
+    source: str
+    ref: str
+    text: str
+    score: float
+
+
+def code_chunks(path: str, code: str) -> List[Chunk]:
+    """
+    Functions of a source file as chunks (via tree-sitter), or windows of
+    `WINDOW_LINES` lines when the language has no grammar built.
+    """
+    from core import parser
+    try:
+        functions = parser.extract_functions(code, parser.detect_language_from_filename(path))
+    except (ValueError, FileNotFoundError, OSError):
+        functions = None
+    chunks = []
+    if functions:
+        offset = 0
+        for function in functions:
+            start = code.find(function, offset)
+            line = code.count("\n", 0, start) + 1 if start >= 0 else 0
+            offset = start + len(function) if start >= 0 else offset
+            chunks.append(Chunk(path, f"{line}-{line + function.count(chr(10))}", function))
+        return chunks
+    lines = code.splitlines()
+    for start in range(0, len(lines), WINDOW_LINES):
+        text = "\n".join(lines[start:start + WINDOW_LINES])
+        if text.strip():
+            chunks.append(Chunk(path, f"{start + 1}-{min(start + WINDOW_LINES, len(lines))}", text))
+    return chunks
+
+
+class ChunkIndex:
+    """
+    Embedded chunks of code and conversation under `path`: vectors in a
+    VectorStore, text and provenance in `chunks.db`. Sources are indexed
+    incrementally: a file is re-embedded only when its content changed, and a
+    session only for turns added since the last call.
+    """
+    def __init__(self, path: str, embedder, dtype: str = "int8"):
+        self.path = path
+        self.embedder = embedder
+        self._store = None
+        self._dtype = dtype
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, "chunks.db"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source TEXT NOT NULL,
+                    ref TEXT NOT NULL,
+                    text TEXT NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, version TEXT NOT NULL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            row = self._conn.execute("SELECT value FROM info WHERE key = 'embedder'").fetchone()
+            if row is not None and row[0] != embedder.name:
+                # Vectors from another model are not comparable: start over
+                self._conn.execute('DELETE FROM chunks')
+                self._conn.execute('DELETE FROM sources')
+                self._reset_vectors()
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('embedder', ?)", (embedder.name,))
+
+    def _reset_vectors(self):
+        for name in ("vectors.bin", "scales.bin", "ids.bin", "header.json"):
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def _vectors(self, dim: Optional[int] = None) -> Optional[VectorStore]:
+        if self._store is None and (dim is not None or os.path.exists(os.path.join(self.path, "header.json"))):
+            self._store = VectorStore(self.path, dim, self._dtype)
+        return self._store
+
+    def _embed(self, texts: List[str]):
+        embed_many = getattr(self.embedder, "embed_many", None)
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            batch = texts[start:start + EMBED_BATCH]
+            vectors.extend(embed_many(batch) if embed_many else [self.embedder.embed(text) for text in batch])
+        return vectors
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+
+    def add(self, chunks: Sequence[Chunk]) -> int:
+        """Embed and store `chunks`; returns how many were added."""
+        if not chunks:
+            return 0
+        vectors = self._embed([chunk.text for chunk in chunks])
+        with self._lock:
+            with self._conn:
+                ids = [self._conn.execute('INSERT INTO chunks (source, ref, text) VALUES (?, ?, ?)', chunk).lastrowid
+                       for chunk in chunks]
+            self._vectors(len(vectors[0])).add(ids, vectors)
+        return len(ids)
+
+    def remove_source(self, source: str) -> int:
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute('SELECT id FROM chunks WHERE source = ?', (source,))]
+            with self._conn:
+                self._conn.execute('DELETE FROM chunks WHERE source = ?', (source,))
+                self._conn.execute('DELETE FROM sources WHERE source = ?', (source,))
+            if ids and self._vectors() is not None:
+                self._store.delete(ids)
+        return len(ids)
+
+    def _version(self, source: str) -> Optional[str]:
+        row = self._conn.execute('SELECT version FROM sources WHERE source = ?', (source,)).fetchone()
+        return row[0] if row else None
+
+    def _set_version(self, source: str, version: str):
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO sources (source, version) VALUES (?, ?)', (source, version))
+
+    def index_file(self, path: str, code: Optional[str] = None) -> int:
+        """(Re)index one source file if its content changed; returns the number of chunks embedded."""
+        if code is None:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                code = f.read()
+        digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        if self._version(path) == digest:
+            return 0
+        self.remove_source(path)
+        added = self.add(code_chunks(path, code))
+        self._set_version(path, digest)
+        return added
+
+    def index_session(self, memory, session_id: Optional[int] = None) -> int:
+        """Index the turns of a session (the memory's active one by default) added since the last call."""
+        session_id = memory.session_id if session_id is None else session_id
+        if session_id is None:
+            return 0
+        source = f"session:{session_id}"
+        last = int(self._version(source) or 0)
+        turns = memory.get_turns(session_id, last, sys.maxsize)
+        added = self.add([Chunk(source, str(turn_id), f"User: {user}\nModel: {response}")
+                          for turn_id, user, response in turns])
+        if turns:
+            self._set_version(source, str(turns[-1][0]))
+        return added
+
+    def search(self, text: str, k: int = 5, source_prefix: Optional[str] = None) -> List[ChunkHit]:
+        """
+        The `k` chunks closest to `text`, best first, optionally only from
+        sources starting with `source_prefix` (e.g. "session:" or a directory).
+        """
+        store = self._vectors()
+        if store is None or not len(store):
+            return []
+        # Over-fetch when filtering so that k hits usually survive the filter
+        fetch = k if source_prefix is None else k * 4
+        hits = store.search(self._embed([text])[0], fetch)
+        if not hits:
+            return []
+        with self._lock:
+            rows = {row[0]: row[1:] for row in self._conn.execute(
+                f"SELECT id, source, ref, text FROM chunks WHERE id IN ({','.join('?' * len(hits))})",
+                [hit.id for hit in hits])}
+        results = []
+        for hit in hits:
+            row = rows.get(hit.id)
+            if row is None or (source_prefix is not None and not row[0].startswith(source_prefix)):
+                continue
+            results.append(ChunkHit(*row, hit.score))
+        return results[:k]
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        self._conn.close()
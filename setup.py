@@ -1,18 +1,41 @@
+import os
+
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 import tomllib
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
 def get_version():
-    with open("pyproject.toml", "rb") as f:
+    with open(os.path.join(HERE, "pyproject.toml"), "rb") as f:
         data = tomllib.load(f)
     return data["project"]["version"]
 
 
-with open("README.md", "r", encoding="utf-8") as fh:
+def write_version_file(path, version):
+    """Bake the version into the package so it needn't be looked up at runtime."""
+    with open(path, "w") as f:
+        f.write("# Written by setup.py from pyproject.toml at build time; do not edit by hand.\n")
+        f.write(f'__version__ = "{version}"\n')
+
+
+class build_py_with_version(build_py):
+    """build_py that also writes codechat/_version.py (into the source tree for editable installs)."""
+    def run(self):
+        super().run()
+        target = HERE if getattr(self, "editable_mode", False) else self.build_lib
+        write_version_file(os.path.join(target, "codechat", "_version.py"), VERSION)
+
+
+with open(os.path.join(HERE, "README.md"), "r", encoding="utf-8") as fh:
     long_description = fh.read()
 
+VERSION = get_version()
+
 setup(
     name='codez-cli',
-    version=get_version(),
+    version=VERSION,
     description='CodeZ CLI – When AI Takes a Break, We Don’t!',
     long_description=long_description,
     long_description_content_type='text/markdown',
@@ -32,6 +55,9 @@ setup(
         'httpx>=0.28.1',
         'pydantic>=2.11.7',
     ],
+    extras_require={
+        'semantic': ['numpy>=1.24'],
+    },
     entry_points={
         'console_scripts': [
             'codez=codechat.__main__:main',
@@ -48,4 +74,5 @@ setup(
         'Topic :: Software Development :: Libraries :: Application Frameworks',
     ],
     zip_safe=False,
+    cmdclass={'build_py': build_py_with_version},
 )
@@ -0,0 +1,18 @@
+import pytest
+from core import ollama_client
+from tests.fake_ollama import FakeOllamaServer
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    """Run a stand-in Ollama server and point the shared HTTP client at it."""
+    with FakeOllamaServer() as server:
+        monkeypatch.setenv("CODEZ_OLLAMA_BACKEND", "http")
+        # Tests opt in to the caches explicitly, whatever the user config says
+        monkeypatch.setenv("CODEZ_RESPONSE_CACHE", "0")
+        monkeypatch.setenv("CODEZ_SEMANTIC_CACHE", "0")
+        ollama_client.reset_client(ollama_client.OllamaClient(host=server.url))
+        try:
+            yield server
+        finally:
+            ollama_client.reset_client()
@@ -0,0 +1,105 @@
+import os
+import stat
+import sys
+import threading
+import time
+from core import model
+
+ABORT_BUDGET = 0.5  # seconds from ESC to the stream ending
+
+
+def _cancel_after_first_chunk(stream, stop_event):
+    chunks = [next(stream)]
+    cancelled_at = time.perf_counter()
+    stop_event.set()
+    chunks.extend(stream)
+    return chunks, time.perf_counter() - cancelled_at
+
+
+def test_http_stream_aborts_within_budget(fake_ollama):
+    fake_ollama.chunk_delay = 0.6  # each token takes longer than the budget
+    fake_ollama.responder = lambda prompt: "slow " * 50
+    stop_event = threading.Event()
+    chunks, latency = _cancel_after_first_chunk(model.stream_ollama("hi", "test-model", stop_event=stop_event), stop_event)
+    assert chunks == ["slow "]
+    assert latency < ABORT_BUDGET
+    # The server notices the disconnect on its next write and stops generating.
+    assert fake_ollama.aborted.wait(3.0)
+
+
+def test_http_client_usable_after_cancel(fake_ollama):
+    fake_ollama.chunk_delay = 0.2
+    fake_ollama.responder = lambda prompt: "word " * 20
+    stop_event = threading.Event()
+    chunks, latency = _cancel_after_first_chunk(model.stream_ollama("hi", "test-model", stop_event=stop_event), stop_event)
+    assert len(chunks) < 20 and latency < ABORT_BUDGET
+    fake_ollama.chunk_delay = 0.0
+    fake_ollama.responder = lambda prompt: "next answer"
+    assert "".join(model.stream_ollama("again", "test-model")) == "next answer"
+
+
+SLOW_CLI = f"""#!{sys.executable}
+import sys, time
+for i in range(100):
+    print("tok %d" % i, flush=True)
+    time.sleep(0.5)
+"""
+
+
+def test_subprocess_stream_kills_child(tmp_path, monkeypatch):
+    cli = tmp_path / "ollama"
+    cli.write_text(SLOW_CLI)
+    cli.chmod(cli.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", str(tmp_path) + os.pathsep + os.environ.get("PATH", ""))
+    monkeypatch.setenv("CODEZ_OLLAMA_BACKEND", "subprocess")
+    stop_event = threading.Event()
+    chunks, latency = _cancel_after_first_chunk(model.stream_ollama("hi", "test-model", stop_event=stop_event), stop_event)
+    assert chunks[0].startswith("tok 0")
+    assert latency < ABORT_BUDGET
+
+
+def test_repl_keeps_partial_output_on_cancel(fake_ollama, monkeypatch):
+    import io
+    from rich.console import Console
+    from core import repl
+    monkeypatch.setattr(repl, "console", Console(file=io.StringIO(), width=80))
+    fake_ollama.chunk_delay = 0.1
+    fake_ollama.responder = lambda prompt: "partial " * 100
+    stop_event = threading.Event()
+    threading.Timer(0.35, stop_event.set).start()
+    start = time.perf_counter()
+    text = repl.stream_model_response(model.stream_ollama("hi", "test-model", stop_event=stop_event), stop_event=stop_event)
+    assert time.perf_counter() - start < 0.35 + ABORT_BUDGET
+    assert text.startswith("partial ") and len(text) < len("partial " * 100)
+    assert "Generation cancelled" in repl.console.file.getvalue()
+
+
+def _watch(*keys):
+    """Type `keys` into an EscapeListener through a pipe; returns whether it cancelled."""
+    from core.io_utils import EscapeListener
+    read_fd, write_fd = os.pipe()
+    event = threading.Event()
+    listener = EscapeListener(event, poll_interval=0.01)
+    watcher = threading.Thread(target=listener._watch_posix, args=(read_fd,))
+    watcher.start()
+    try:
+        for key in keys:
+            os.write(write_fd, key)
+            time.sleep(0.1)
+        event.wait(0.3)
+    finally:
+        listener._done.set()
+        watcher.join()
+        os.close(read_fd)
+        os.close(write_fd)
+    return event.is_set()
+
+
+def test_escape_sequences_do_not_cancel():
+    if os.name == "nt":
+        return
+    assert not _watch(b"\x1b[A", b"\x1b[B", b"\x1b[H", b"\x1b[F")  # arrows, Home, End
+    assert not _watch(b"\x1bb")  # Alt+b
+    assert not _watch(b"a", b"b")
+    assert _watch(b"\x1b")
+    assert _watch(b"x", b"\x1b[D", b"y", b"\x1b")
@@ -0,0 +1,85 @@
+import pytest
+
+from core import context_packer, parser
+from core.embeddings import HashingEmbedder
+from core.tokenizer import HeuristicCounter
+
+needs_python_grammar = pytest.mark.skipif(not parser.grammar_available("python"),
+                                          reason="python grammar not built (build_grammars.sh)")
+
+
+def make_module(functions=60):
+    parts = ["import os\nimport sys\n\n"]
+    for i in range(functions):
+        parts.append(f"def step_{i}(value):\n    \"\"\"Step {i}.\"\"\"\n    return value + {i}\n\n")
+    parts.append("def refresh_token(session):\n    \"\"\"Renew an expired OAuth token.\"\"\"\n"
+                 "    session.token = session.client.renew(session.token)\n    return session.token\n")
+    return "".join(parts)
+
+
+def test_small_file_is_sent_whole():
+    packed = context_packer.pack_file("notes.txt", "short file\n", "anything", budget=100,
+                                      token_counter=HeuristicCounter())
+    assert packed.complete and packed.text == "short file\n"
+
+
+def test_line_windows_without_grammar_and_budget_is_respected():
+    lines = [f"line {i}: filler text about nothing" for i in range(400)]
+    lines[250] = "the retry limit for uploads is configured here"
+    content = "\n".join(lines)
+    counter = HeuristicCounter()
+    chunks = context_packer.file_chunks("notes.txt", content)
+    assert chunks[0].start_line == 1 and chunks[-1].end_line == 400
+    assert all(chunk.end_line - chunk.start_line < context_packer.WINDOW_LINES for chunk in chunks)
+
+    packed = context_packer.pack_file("notes.txt", content, "What is the retry limit for uploads?",
+                                      budget=300, token_counter=counter)
+    assert not packed.complete
+    assert packed.tokens <= 300
+    assert "the retry limit for uploads" in packed.text
+    assert "--- notes.txt:241-" in packed.text  # the window holding line 251, cut to fit
+    assert "omitted]" in packed.text
+
+
+@needs_python_grammar
+def test_chunks_follow_symbols_and_named_symbol_wins():
+    content = make_module()
+    chunks = context_packer.file_chunks("mod.py", content)
+    labels = [chunk.label for chunk in chunks]
+    assert labels[0] == "" and "step_0" in labels and labels[-1] == "refresh_token"
+
+    packed = context_packer.pack_file("mod.py", content, "Why does refresh_token fail?", budget=120,
+                                      token_counter=HeuristicCounter())
+    assert packed.chunks[0].label == "refresh_token"
+    start = content[:content.index("def refresh_token")].count("\n") + 1
+    assert f"--- mod.py:{start}-{start + 3} (refresh_token) ---" in packed.text
+
+
+@needs_python_grammar
+def test_large_class_is_split_into_members(monkeypatch):
+    monkeypatch.setattr(context_packer, "MAX_CHUNK_LINES", 20)
+    methods = "".join(f"    def m{i}(self):\n        return {i}\n\n" for i in range(20))
+    content = "class Big:\n    \"\"\"Many methods.\"\"\"\n\n" + methods
+    chunks = context_packer.file_chunks("big.py", content)
+    assert chunks[0].label == "Big" and chunks[0].start_line == 1
+    assert [chunk.label for chunk in chunks[1:]] == [f"m{i}" for i in range(20)]
+
+
+def test_embedding_score_breaks_lexical_ties():
+    chunks = [context_packer.FileChunk(1, 1, "", "alpha beta gamma"),
+              context_packer.FileChunk(2, 2, "", "renew session token expiry")]
+    lexical = context_packer.rank_chunks(chunks, "zeta")
+    assert lexical == [0.0, 0.0]
+    scores = context_packer.rank_chunks(chunks, "token expiry", embedder=HashingEmbedder())
+    assert scores[1] > scores[0]
+
+
+def test_window_anchors_use_file_line_numbers():
+    content = "\n".join(f"row {i} filler words here" for i in range(100, 300))
+    content = content.replace("row 250 filler", "row 250 checksum mismatch")
+    packed = context_packer.pack_file("big.log", content, "checksum mismatch", budget=500,
+                                      token_counter=HeuristicCounter(), first_line=100)
+    assert "(lines 100-299," in packed.text
+    chunk = next(chunk for chunk in packed.chunks if "checksum" in chunk.text)
+    assert chunk.start_line <= 251 <= chunk.end_line
+    assert f"--- big.log:{chunk.start_line}-" in packed.text
@@ -0,0 +1,103 @@
+import os
+
+from core import file_cache
+from core.file_cache import FileCache, file_digest, file_stamp
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def write(tmp_path, name, text, mtime=1_000_000):
+    path = tmp_path / name
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def cached(cache, path, kind="text"):
+    """Cache the file's text the way /read does: stamp first, then read."""
+    stamp = file_stamp(path)
+    text = open(path).read()
+    cache.put(path, kind, text, len(text), stamp, file_digest(path))
+    return text
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = FileCache(max_bytes=250, clock=FakeClock(2_000_000))
+    paths = [write(tmp_path, f"f{i}.txt", str(i) * 100) for i in range(3)]
+    cached(cache, paths[0])
+    cached(cache, paths[1])
+    assert cache.get(paths[0], "text") is not None  # now the most recently used
+    cached(cache, paths[2])
+    assert cache.get(paths[1], "text") is None
+    assert cache.get(paths[0], "text") and cache.get(paths[2], "text")
+    stats = cache.stats()
+    assert (stats.entries, stats.bytes, stats.evictions) == (2, 200, 1)
+    assert (stats.hits, stats.misses) == (3, 1)
+
+    cache.put(paths[1], "text", "x" * 300, 300, file_stamp(paths[1]))  # larger than the budget
+    assert cache.stats().entries == 2 and cache.get(paths[1], "text") is None
+
+
+def test_changed_or_replaced_file_is_a_miss(tmp_path):
+    cache = FileCache(clock=FakeClock(2_000_000))
+    path = write(tmp_path, "a.py", "x = 1\n")
+    cached(cache, path)
+    cached(cache, path, "render:80")
+    write(tmp_path, "a.py", "x = 2\n", mtime=1_000_001)  # same size, new mtime
+    assert cache.get(path, "text") is None
+    assert cache.stats().invalidations == 1
+
+    cached(cache, path)
+    replacement = write(tmp_path, "b.py", "x = 3\n", mtime=1_000_001)
+    os.replace(replacement, path)  # same size and mtime, new inode
+    assert cache.get(path, "text") is None
+
+    os.remove(path)
+    assert cache.get(path, "render:80") is None
+    assert cache.stats().entries == 0
+
+
+def test_content_hash_on_demand_and_for_racy_entries(tmp_path):
+    clock = FakeClock(2_000_000)
+    cache = FileCache(clock=clock)
+    path = write(tmp_path, "a.py", "x = 1\n")
+    cached(cache, path)
+    # Rewritten without its stamp changing (e.g. a coarse-mtime filesystem)
+    with open(path, "r+") as f:
+        f.write("y")
+    os.utime(path, (1_000_000, 1_000_000))
+    assert cache.get(path, "text") == "x = 1\n"  # the stamp alone cannot tell
+    assert cache.get(path, "text", verify=True) is None
+
+    # Cached within a second of the file's mtime: hashed until the mtime is safely in the past
+    clock.now = 1_000_000.5
+    cached(cache, path)
+    with open(path, "r+") as f:
+        f.write("z")
+    os.utime(path, (1_000_000, 1_000_000))
+    assert cache.get(path, "text") is None
+
+
+def test_invalidate_clear_and_shared_cache(tmp_path, monkeypatch):
+    cache = FileCache(clock=FakeClock(2_000_000))
+    path = write(tmp_path, "a.py", "x = 1\n")
+    cached(cache, path)
+    cached(cache, path, "render:100")
+    assert cache.invalidate(path) == 2 and cache.stats().bytes == 0
+    cached(cache, path)
+    cache.clear()
+    assert cache.stats().entries == 0
+
+    monkeypatch.setenv(file_cache.FILE_CACHE_ENV, "0.5")
+    file_cache.set_file_cache(None)
+    try:
+        assert file_cache.get_file_cache().max_bytes == 512 * 1024
+        assert file_cache.get_file_cache() is file_cache.get_file_cache()
+    finally:
+        file_cache.set_file_cache(None)
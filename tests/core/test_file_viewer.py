@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from core import file_viewer
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Tiny blocks put plenty of lines across block boundaries
+    monkeypatch.setattr(file_viewer, "BLOCK_BYTES", 64)
+
+
+def write(tmp_path, name, data: bytes):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", "cp1252"])
+def test_windows_match_the_decoded_lines(tmp_path, small_blocks, encoding):
+    rng = random.Random(5)
+    lines = ["".join(rng.choice("ab é\t") for _ in range(rng.randrange(0, 30))) for _ in range(300)]
+    path = write(tmp_path, "text.txt", ("\r\n".join(lines) + "\r\n").encode(encoding))
+    with file_viewer.FileView(path) as view:
+        assert not view.binary
+        assert view.encoding == {"utf-16": "utf-16-le", "utf-8-sig": "utf-8"}.get(encoding, encoding)
+        for start in (1, 2, 37, 150, 299, 300):
+            window = view.window(start, start + 9)
+            assert window.text.split("\n") == lines[start - 1:start + 9]
+            assert window.end_line == min(start + 9, 300)
+            assert window.at_eof == (window.end_line == 300)
+        assert view.window(301, 310) is None
+        assert view.line_count == 300
+
+
+def test_last_line_without_newline_and_prefetch(tmp_path):
+    path = write(tmp_path, "log.txt", b"".join(b"entry %d\n" % i for i in range(1000)) + b"tail")
+    with file_viewer.FileView(path) as view:
+        window = view.window(995, 2000)
+        assert window.text.split("\n")[-1] == "tail" and window.end_line == 1001 and window.at_eof
+        view.prefetch(1, 200)  # advisory, must not fail
+        assert view.line_offset(1002) is None
+
+
+def test_binary_detection_and_encoding_sniffing():
+    assert file_viewer.looks_binary(b"\x7fELF\x02\x01\x01\x00\x00")
+    assert not file_viewer.looks_binary("plain text\twith tabs\n".encode())
+    assert not file_viewer.looks_binary("text".encode("utf-16"))
+    assert file_viewer.sniff_encoding("naïve".encode("utf-8")) == ("utf-8", 0)
+    assert file_viewer.sniff_encoding("naïve €".encode("cp1252")) == ("cp1252", 0)
+    assert file_viewer.sniff_encoding(b"\x81\x8d") == ("latin-1", 0)
+    # A multi-byte character cut at the end of the sample is still UTF-8
+    assert file_viewer.sniff_encoding("abc é".encode("utf-8")[:-1]) == ("utf-8", 0)
+
+
+def test_long_lines_are_truncated(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_viewer, "MAX_WINDOW_BYTES", 1000)
+    path = write(tmp_path, "min.js", b"x" * 5000 + b"\nend\n")
+    with file_viewer.FileView(path) as view:
+        window = view.window(1, 2)
+        assert window.truncated and len(window.text) == 1000
+
+
+def test_parse_read_target_and_view_reuse(tmp_path):
+    path = write(tmp_path, "a.py", b"print(1)\n")
+    assert file_viewer.parse_read_target(f"{path}:10-20") == (path, 10, 20)
+    assert file_viewer.parse_read_target(f"{path}:7") == (path, 7, None)
+    assert file_viewer.parse_read_target(path) == (path, None, None)
+    odd = write(tmp_path, "b:12", b"x\n")  # a real file whose name looks like a range
+    assert file_viewer.parse_read_target(odd) == (odd, None, None)
+
+    view = file_viewer.open_view(path)
+    assert file_viewer.open_view(path) is view
+    write(tmp_path, "a.py", b"print(1)\nprint(2)\n")
+    fresh = file_viewer.open_view(path)
+    assert fresh is not view and fresh.window(1, 5).text == "print(1)\nprint(2)"
@@ -0,0 +1,83 @@
+import sqlite3
+from core.llm_interactive import LLMInteractiveSession
+from core.sqlite_memory import SQLiteSessionMemory, fts_query
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def test_fts_query_quotes_every_word():
+    assert fts_query('parse "AND" OR foo.bar()*') == '"parse" "AND" "OR" "foo" "bar"'
+    assert fts_query("tree sitter", any_term=True) == '"tree" OR "sitter"'
+    assert fts_query("?! --") is None
+
+
+def test_search_across_sessions(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), token_estimator=word_count)
+    memory.add_turn("How do I parse TOML files?", "Use tomllib.")
+    first = memory.session_id
+    memory.new_session()
+    memory.add_turn("Parsing JSON is slow", "Try orjson.")
+    memory.add_turn("What about YAML?", "Use a safe loader.")
+    hits = memory.search("parse")
+    assert {h.session_id for h in hits} == {first, memory.session_id}
+    assert "«parse»" in [h.user for h in hits if h.session_id == first][0]
+    assert [h.user for h in memory.search("parse", session_id=first)] == ["How do I «parse» TOML files?"]
+    assert memory.search("parse AND") == []
+
+
+def test_index_follows_deletes_and_backfills(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count)
+    memory.add_turn("flaky websocket test", "a")
+    memory.clear()
+    assert memory.search("websocket") == []
+    memory.add_turn("flaky websocket test", "b")
+    memory.close()
+    # A database from before the index existed is indexed on open
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DROP TABLE turns_fts")
+    reopened = SQLiteSessionMemory(db_path, token_estimator=word_count)
+    assert [h.response for h in reopened.search("websocket")] == ["b"]
+
+
+def test_relevant_turns_come_from_before_the_window(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), max_token_budget=20, token_estimator=word_count)
+    memory.add_turn("the cache key uses sha256", "noted")
+    for i in range(20):
+        memory.add_turn(f"q{i}", f"a{i}")
+    window = memory.get_context_turns()
+    assert window[-1] == {"user": "q19", "response": "a19"}
+    assert memory.get_relevant_turns("which cache key?") == [{"user": "the cache key uses sha256", "response": "noted"}]
+    # Turns still in the window are not repeated
+    assert memory.get_relevant_turns("q19") == []
+
+
+def test_relevant_turns_stay_within_the_budget(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), max_token_budget=20, token_estimator=word_count)
+    memory.add_turn("cache " * 30, "long")
+    memory.add_turn("cache short", "ok")
+    for i in range(8):
+        memory.add_turn(f"q{i}", f"a{i}")
+    assert len(memory.get_context_turns()) == 2
+    # 12 tokens are left: the short match fits, the 30-word one does not
+    assert memory.get_relevant_turns("cache") == [{"user": "cache short", "response": "ok"}]
+    for i in range(8, 11):
+        memory.add_turn(f"q{i}", f"a{i}")
+    assert len(memory.get_context_turns()) == 5
+    # A full window leaves no room at all
+    assert memory.get_relevant_turns("cache") == []
+
+
+def test_build_messages_adds_relevant_turns_to_the_new_message(tmp_path):
+    session = LLMInteractiveSession("test-model", db_path=str(tmp_path / "m.db"), max_token_budget=20,
+                                    token_estimator=word_count)
+    session.memory.add_turn("the deploy script lives in ops", "ok")
+    for i in range(20):
+        session.memory.add_turn(f"q{i}", f"a{i}")
+    messages = session.build_messages("where is the deploy script?")
+    assert "Relevant earlier conversation" not in messages[0]["content"]
+    assert messages[-1]["content"].startswith("Relevant earlier conversation:\nUser: the deploy script lives in ops")
+    session.retrieval_turns = 0
+    assert session.build_messages("where is the deploy script?")[-1]["content"] == "where is the deploy script?"
@@ -0,0 +1,77 @@
+import json
+from core.context_manager import ContextManager
+from core.journal import TurnJournal
+
+
+def turn(i):
+    return {"user": f"q{i}", "response": f"a{i}"}
+
+
+def test_turns_survive_without_close(tmp_path):
+    path = str(tmp_path / "s.json")
+    journal = TurnJournal(path)
+    journal.load()
+    for i in range(3):
+        journal.append(turn(i))
+    # No close(): the process "crashed"
+    assert TurnJournal(path).load() == [turn(0), turn(1), turn(2)]
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / "s.json")
+    journal = TurnJournal(path)
+    journal.load()
+    journal.append(turn(0))
+    journal.close()
+    with open(path + ".journal", "ab") as f:
+        f.write(b'{"seq": 2, "user": "q1", "resp')
+    recovered = TurnJournal(path)
+    assert recovered.load() == [turn(0)]
+    recovered.append(turn(1))
+    recovered.close()
+    assert TurnJournal(path).load() == [turn(0), turn(1)]
+
+
+def test_compaction_writes_snapshot_and_empties_journal(tmp_path):
+    path = str(tmp_path / "s.json")
+    journal = TurnJournal(path, compact_every=4)
+    journal.load()
+    turns = []
+    for i in range(4):
+        turns.append(turn(i))
+        journal.append(turn(i))
+    assert journal.needs_compaction
+    journal.compact(turns)
+    assert not journal.needs_compaction
+    assert (tmp_path / "s.json.journal").read_bytes() == b""
+    assert json.loads((tmp_path / "s.json").read_text())["seq"] == 4
+    journal.append(turn(4))
+    assert TurnJournal(path).load() == turns + [turn(4)]
+
+
+def test_crash_between_snapshot_and_truncate_replays_nothing_twice(tmp_path):
+    path = str(tmp_path / "s.json")
+    journal = TurnJournal(path)
+    journal.load()
+    for i in range(3):
+        journal.append(turn(i))
+    journal.close()
+    records = (tmp_path / "s.json.journal").read_bytes()
+    journal.compact([turn(i) for i in range(3)])
+    # Put the old records back, as if the truncation never happened
+    (tmp_path / "s.json.journal").write_bytes(records)
+    assert TurnJournal(path).load() == [turn(0), turn(1), turn(2)]
+
+
+def test_context_manager_reads_legacy_file_and_keeps_max_turns(tmp_path):
+    path = tmp_path / "session.json"
+    path.write_text(json.dumps([turn(i) for i in range(3)], indent=2))
+    manager = ContextManager(str(path), max_turns=4, compact_every=3)
+    assert manager.get_context() == [turn(0), turn(1), turn(2)]
+    for i in range(3, 8):
+        manager.add_turn(f"q{i}", f"a{i}")
+    assert manager.get_context() == [turn(i) for i in range(4, 8)]
+    assert ContextManager(str(path), max_turns=4).get_context() == [turn(i) for i in range(4, 8)]
+    manager.clear()
+    assert not path.exists()
+    assert ContextManager(str(path)).get_context() == []
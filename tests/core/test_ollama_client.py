@@ -0,0 +1,66 @@
+import time
+import pytest
+from core import model
+from core.ollama_client import OllamaClient, OllamaConnectionError, OllamaError, resolve_host
+
+
+def test_query_ollama_over_http(fake_ollama):
+    assert model.query_ollama("hello", "test-model") == "echo: hello"
+    path, payload = fake_ollama.requests[-1]
+    assert path == "/api/generate"
+    assert payload["prompt"] == "hello" and payload["stream"] is False
+
+
+def test_large_prompt_is_sent_in_body(fake_ollama):
+    # Far beyond ARG_MAX on most systems; fine as a request body.
+    big = "x" * (4 * 1024 * 1024)
+    assert model.query_ollama(big, "test-model") == "echo: " + big
+
+
+def test_connection_is_reused_across_queries(fake_ollama):
+    for i in range(5):
+        model.query_ollama(f"q{i}", "test-model")
+    assert len(fake_ollama.connections) == 1
+
+
+def test_get_ollama_models_over_http(fake_ollama):
+    models, err = model.get_ollama_models()
+    assert models == ["test-model"]
+    assert err is None
+
+
+def test_unknown_model_raises(fake_ollama):
+    with pytest.raises(OllamaError, match="not found"):
+        model.query_ollama("hello", "missing-model")
+
+
+def test_unreachable_server_raises_connection_error():
+    client = OllamaClient(host="http://127.0.0.1:9")
+    with pytest.raises(OllamaConnectionError):
+        client.list_models()
+    client.close()
+
+
+def test_resolve_host(monkeypatch):
+    monkeypatch.delenv("OLLAMA_HOST", raising=False)
+    assert resolve_host() == "http://127.0.0.1:11434"
+    monkeypatch.setenv("OLLAMA_HOST", "0.0.0.0:1234/")
+    assert resolve_host() == "http://0.0.0.0:1234"
+
+
+def test_stream_ollama_yields_chunks_incrementally(fake_ollama):
+    chunks = list(model.stream_ollama("one two three", "test-model"))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "echo: one two three"
+    assert fake_ollama.requests[-1][1]["stream"] is True
+
+
+def test_stream_ollama_first_chunk_before_generation_finishes(fake_ollama):
+    fake_ollama.chunk_delay = 0.05
+    start = time.perf_counter()
+    stream = model.stream_ollama("a b c d e f g h i j", "test-model")
+    next(stream)
+    first = time.perf_counter() - start
+    list(stream)
+    total = time.perf_counter() - start
+    assert first < total / 3
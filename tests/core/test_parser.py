@@ -0,0 +1,170 @@
+import os
+import random
+import threading
+import pytest
+from core import parser
+
+needs_python_grammar = pytest.mark.skipif(not parser.grammar_available("python"),
+                                          reason="python grammar not built (build_grammars.sh)")
+
+
+def test_missing_grammar_and_unknown_language(monkeypatch, tmp_path):
+    monkeypatch.setitem(parser.LANGUAGES, "nolang", (str(tmp_path / "none.so"), "nolang"))
+    with pytest.raises(FileNotFoundError):
+        parser.get_parser("nolang")
+    assert "nolang" not in parser.loaded_languages()
+    assert parser.warm_up(["nolang"]) == []
+    with pytest.raises(ValueError):
+        parser.get_language("cobol")
+
+
+@needs_python_grammar
+def test_grammar_is_loaded_once_and_parsers_are_per_thread(monkeypatch):
+    language = parser.get_language("python")
+    assert parser.get_language("py") is language
+    # Once loaded, the grammar file is not probed again
+    monkeypatch.setattr(parser.os.path, "exists", lambda path: False)
+    assert parser.grammar_available("python")
+    main = parser.get_parser("python")
+    assert parser.get_parser("python") is main
+    others = []
+    thread = threading.Thread(target=lambda: others.append(parser.get_parser("python")))
+    thread.start()
+    thread.join()
+    assert others[0] is not main
+
+
+@needs_python_grammar
+def test_warm_up_loads_available_grammars():
+    assert "python" in parser.warm_up()
+    assert "python" in parser.loaded_languages()
+    assert parser.extract_functions("def f():\n    pass\n", "python") == ["def f():\n    pass"]
+
+
+SOURCE = '''# Loads things.
+def load(path: str,
+         mode="r") -> bytes:
+    """Read ünïcode — all of it."""
+    return open(path, mode).read()
+
+class Store(Base):
+    def save(self, item):
+        def check():
+            pass
+'''
+
+
+@needs_python_grammar
+def test_extract_symbols_is_structured():
+    source = SOURCE.encode("utf-8")
+    load, store, save, check = parser.extract_symbols(memoryview(source), "python")
+    assert (load.kind, load.name, load.start_line, load.end_line) == ("function", "load", 2, 5)
+    assert load.signature == 'def load(path: str, mode="r") -> bytes'
+    assert load.docstring == "Read ünïcode — all of it."
+    assert source[load.start_byte:load.end_byte].decode().startswith("def load")
+    assert (store.kind, store.signature) == ("class", "class Store(Base)")
+    assert (save.kind, save.parent) == ("method", "Store")
+    assert (check.kind, check.parent) == ("function", "save")
+
+
+@needs_python_grammar
+def test_extract_functions_handles_non_ascii_and_deep_nesting():
+    functions = parser.extract_functions(SOURCE, "python")
+    assert functions[0].endswith("return open(path, mode).read()")
+    deep = "x = " + "[" * 5000 + "]" * 5000 + "\ndef after():\n    pass\n"
+    assert parser.extract_functions(deep, "python") == ["def after():\n    pass"]
+
+
+@needs_python_grammar
+def test_unknown_node_types_are_skipped_when_compiling(monkeypatch):
+    monkeypatch.setitem(parser.SYMBOL_NODE_TYPES, "python", {"function_definition": "function", "no_such_node": "class"})
+    monkeypatch.setattr(parser, "_queries", {})
+    assert [s.name for s in parser.extract_symbols(b"def f():\n    pass\n", "python")] == ["f"]
+
+
+@needs_python_grammar
+def test_parse_cache_reparses_incrementally_and_reports_changes():
+    source = "".join(f"def f{i}(a):\n    return a + {i}\n\n" for i in range(50)).encode()
+    source = b"class Box:\n    def get(self):\n        return 1\n\n" + source
+    cache = parser.ParseCache()
+    first = cache.parse("mod.py", source)
+    assert first.changes is None and not first.incremental
+
+    # Body edit that shifts everything below it, plus a rename further down
+    edited = source.replace(b"return a + 10\n", b"total = a + 10\n    return total * 2\n")
+    edited = edited.replace(b"def f30(", b"def g30(")
+    result = cache.parse("mod.py", edited)
+    assert result.incremental
+    assert result.symbols == parser.extract_symbols(edited, "python")
+    assert [s.name for s in result.changes.changed] == ["f10"]
+    assert [s.name for s in result.changes.added] == ["g30"]
+    assert [s.name for s in result.changes.removed] == ["f30"]
+
+    # A new method inside the class is reported with its parent, and re-reading unchanged bytes reports nothing
+    grown = edited.replace(b"        return 1\n", b"        return 1\n\n    def put(self, v):\n        pass\n")
+    result = cache.parse("mod.py", grown)
+    assert result.symbols == parser.extract_symbols(grown, "python")
+    assert [(s.kind, s.name, s.parent) for s in result.changes.added] == [("method", "put", "Box")]
+    assert not cache.parse("mod.py", grown).changes
+
+
+@needs_python_grammar
+def test_parse_cache_recovers_from_a_failed_reparse(monkeypatch):
+    cache = parser.ParseCache()
+    cache.parse("mod.py", SOURCE.encode())
+    edited = SOURCE.replace("def load(", "def read(").encode()
+
+    def fail(*args):
+        raise RuntimeError("changed-range walk failed")
+
+    with monkeypatch.context() as patch:
+        # Fails after the cached tree was edited in place
+        patch.setattr(parser, "_widen_to_straddlers", fail)
+        result = cache.parse("mod.py", edited)
+    assert not result.incremental and result.changes is None
+    assert result.symbols == parser.extract_symbols(edited, "python")
+    # The next edit starts from the fresh tree
+    again = edited.replace(b"def read(", b"def fetch(")
+    result = cache.parse("mod.py", again)
+    assert result.incremental and result.symbols == parser.extract_symbols(again, "python")
+    assert [s.name for s in result.changes.added] == ["fetch"]
+
+
+@needs_python_grammar
+def test_parse_cache_matches_a_full_parse_after_renames_and_boundary_deletions():
+    source = (b"class Worker:\n    def __init__(self):\n        self.reset()\n\n    def reset(self):\n"
+              b"        \"\"\"Start over.\"\"\"\n        self.items = []\n\n    def run(self):\n        return 1\n\n"
+              b"def helper():\n    def inner():\n        pass\n    return inner\n")
+    edits = [
+        source.replace(b"class Worker", b"class Wrker"),  # methods after the edit get a new parent
+        source.replace(b"def helper", b"def hlper"),
+        # From a call up to the docstring of the method below it: `reset` is gone
+        source.replace(b"self.reset()\n\n    def reset(self):\n        ", b""),
+    ]
+    for edited in edits:
+        cache = parser.ParseCache()
+        cache.parse("mod.py", source)
+        assert cache.parse("mod.py", edited).symbols == parser.extract_symbols(edited, "python")
+
+
+@needs_python_grammar
+@pytest.mark.parametrize("path", ["core/summarizer.py", "core/journal.py", "core/file_cache.py"])
+def test_parse_cache_matches_a_full_parse_after_random_edits(path):
+    source = open(os.path.join(parser.PROJECT_ROOT, path), "rb").read()
+    rng = random.Random(path)
+    snippets = [b"x", b"class ", b"def ", b"\n", b"    ", b"#", b'"""', b"(", b")", b":"]
+    cache = parser.ParseCache()
+    cache.parse(path, source)
+    for _ in range(150):
+        a = rng.randrange(len(source))
+        b = min(len(source), a + rng.choice([1, 2, 5, 20, 60, 200]))
+        roll = rng.random()
+        if roll < 0.4:
+            edited = source[:a] + source[b:]
+        elif roll < 0.7:
+            c = rng.randrange(len(source))
+            edited = source[:a] + source[c:c + rng.randrange(1, 80)] + source[a:]
+        else:
+            edited = source[:a] + rng.choice(snippets) + source[b:]
+        assert cache.parse(path, edited).symbols == parser.extract_symbols(edited, "python")
+        source = edited
@@ -0,0 +1,67 @@
+from core.llm_interactive import LLMInteractiveSession
+from core.prompt_builder import PromptCacheStats, build_messages, is_prefix, messages_to_prompt, stable_window_drop
+
+
+def test_build_messages_puts_per_query_context_last():
+    turns = [{"user": "q1", "response": "a1"}]
+    messages = build_messages("SYS", turns, "q2", extra_context="web result")
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+    assert messages[-1]["content"] == "web result\n\nq2"
+    assert messages_to_prompt(messages).endswith("User: web result\n\nq2\nModel:")
+
+
+def test_stable_window_drops_in_blocks():
+    assert stable_window_drop([10, 10, 10], budget=30) == 0
+    # Overflowing drops down to half the budget, not just one turn
+    assert stable_window_drop([10, 10, 10, 10], budget=30) == 3
+    # The newest turn survives if it fits on its own
+    assert stable_window_drop([10, 10, 25], budget=30) == 2
+    assert stable_window_drop([10, 40], budget=30) == 2
+
+
+def test_history_prefix_is_stable_across_turns():
+    session = LLMInteractiveSession(model_name="test-model", persist=False, max_token_budget=40,
+                                    token_estimator=lambda s: len(s.split()))
+    previous = None
+    rebuilds = 0
+    for i in range(30):
+        messages = session.build_messages(f"q{i}", system_prompt="SYS")
+        if previous is not None and not is_prefix(previous, messages):
+            rebuilds += 1
+        previous = messages
+        session.memory.add_turn(f"q{i}", f"a{i}")
+    # Each turn is 4 tokens: the window refills for several turns between rebuilds
+    assert 0 < rebuilds <= 6
+
+
+def test_chat_reuses_server_prefix(fake_ollama):
+    session = LLMInteractiveSession(model_name="test-model", persist=False, max_token_budget=1000)
+    session.system_prompt = "You are a helpful assistant " * 20
+    session.ask("first question")
+    first = session.last_stats
+    session.ask("second question")
+    second = session.last_stats
+    assert fake_ollama.requests[-1][0] == "/api/chat"
+    assert fake_ollama.requests[-1][1]["keep_alive"]
+    assert not first.prefix_stable and second.prefix_stable
+    assert second.evaluated_tokens < first.evaluated_tokens
+    assert second.hit_ratio > 0.5
+
+
+def test_sqlite_window_start_survives_restart(tmp_path):
+    from core.sqlite_memory import SQLiteSessionMemory
+    db_path = str(tmp_path / "memory.db")
+    memory = SQLiteSessionMemory(db_path, max_token_budget=20, token_estimator=lambda s: len(s.split()))
+    for i in range(8):
+        memory.add_turn(f"q{i}", f"a{i}")
+        turns = memory.get_context_turns()
+    reopened = SQLiteSessionMemory(db_path, max_token_budget=20, token_estimator=lambda s: len(s.split()))
+    assert reopened.get_context_turns() == turns
+
+
+def test_reuse_estimate_stays_within_the_prompt():
+    # The server's exact count can exceed our estimate of the prompt
+    assert PromptCacheStats(100, 130, False).reused_tokens == 0
+    assert PromptCacheStats(100, 130, False).hit_ratio == 0.0
+    assert PromptCacheStats(100, 0, True).hit_ratio == 1.0
+    assert PromptCacheStats(100, None, True).hit_ratio is None
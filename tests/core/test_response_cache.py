@@ -0,0 +1,155 @@
+import threading
+import pytest
+from core import model, response_cache
+from core.llm_interactive import LLMInteractiveSession
+from core.response_cache import ResponseCache, cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache.db"), memory_entries=2)
+
+
+@pytest.fixture
+def cached_ollama(fake_ollama, tmp_path, monkeypatch):
+    monkeypatch.setenv("CODEZ_RESPONSE_CACHE", "1")
+    response_cache.set_cache(ResponseCache(str(tmp_path / "cache.db")))
+    try:
+        yield fake_ollama
+    finally:
+        response_cache.set_cache(None)
+
+
+def test_key_covers_model_options_and_prompt():
+    base = cache_key("m", "hi")
+    assert base == cache_key("m", "hi", {})
+    assert base != cache_key("other", "hi")
+    assert base != cache_key("m", "hi", {"temperature": 0})
+    assert base != cache_key("m", "hi!")
+    messages = [{"role": "user", "content": "hi"}]
+    assert cache_key("m", messages) == cache_key("m", [dict(content="hi", role="user")])
+
+
+def test_put_get_and_disk_fallback(cache, tmp_path):
+    cache.put("k", "m", "answer", 2.5)
+    assert cache.get("k") == ("answer", 2.5)
+    assert cache.get("missing") is None
+    # A fresh instance (empty LRU) reads the entry back from SQLite
+    reopened = ResponseCache(str(tmp_path / "cache.db"))
+    assert reopened.get("k").response == "answer"
+    stats = cache.stats()
+    assert (stats.entries, stats.hits, stats.misses, stats.saved_seconds) == (1, 1, 1, 2.5)
+
+
+def test_memory_front_is_lru_bounded(cache):
+    for key in "abc":
+        cache.put(key, "m", key, 0.1)
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a").response == "a"
+    assert list(cache._memory) == ["c", "a"]
+
+
+def test_size_eviction_drops_least_recently_used(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=25, clock=clock)
+    for key in "abc":
+        cache.put(key, "m", "x" * 10, 0.1)
+        clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats().entries == 2 and cache.stats().evictions == 1
+    cache.get("b")
+    clock.now += 1
+    cache.put("d", "m", "x" * 10, 0.1)
+    assert cache.get("b") is not None and cache.get("c") is None
+
+
+def test_age_eviction(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_age=60, clock=clock)
+    cache.put("k", "m", "old", 0.1)
+    clock.now += 61
+    assert cache.get("k") is None
+    assert cache.stats().entries == 0
+
+
+def test_memory_hits_stay_off_disk_until_flushed(cache, monkeypatch):
+    cache.put("k", "m", "answer", 0.1)
+    connect = response_cache.sqlite3.connect
+    opened = []
+    monkeypatch.setattr(response_cache.sqlite3, "connect", lambda *a, **kw: opened.append(a) or connect(*a, **kw))
+    threads = [threading.Thread(target=lambda: [cache.get("k") for _ in range(50)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert opened == [] and cache.hits == 200
+    assert cache.stats().entries == 1 and cache._touched == {}
+
+
+def test_config_choice_is_read_once(monkeypatch):
+    monkeypatch.delenv("CODEZ_RESPONSE_CACHE", raising=False)
+    monkeypatch.setattr(response_cache, "_config_enabled", None)
+    loads = []
+    monkeypatch.setattr(response_cache, "_load_config_value", lambda key: loads.append(key))
+    monkeypatch.setattr(response_cache, "_save_config_value", lambda key, value: None)
+    assert not response_cache.is_enabled() and not response_cache.is_enabled()
+    response_cache.set_enabled(True)
+    assert response_cache.is_enabled() and loads == ["response_cache"]
+
+
+def test_clear(cache):
+    cache.put("k", "m", "answer", 0.1)
+    cache.clear()
+    assert cache.get("k") is None and cache.stats().entries == 0
+
+
+def test_disabled_by_default(fake_ollama):
+    assert response_cache.get_active_cache() is None
+    model.query_ollama("hello", "test-model")
+    model.query_ollama("hello", "test-model")
+    assert len(fake_ollama.requests) == 2
+
+
+def test_query_ollama_hit_skips_server(cached_ollama):
+    assert model.query_ollama("hello", "test-model") == "echo: hello"
+    assert model.query_ollama("hello", "test-model") == "echo: hello"
+    assert len(cached_ollama.requests) == 1
+
+
+def test_stream_chat_hit_reports_saved_latency(cached_ollama):
+    messages = [{"role": "user", "content": "one two three"}]
+    first = {}
+    text = "".join(model.stream_chat(messages, "test-model", stats=first))
+    assert "cache_hit" not in first
+    second = {}
+    assert "".join(model.stream_chat(messages, "test-model", stats=second)) == text
+    assert second["cache_hit"] is True and second["saved_seconds"] >= 0
+    assert len(cached_ollama.requests) == 1
+
+
+def test_cancelled_stream_is_not_cached(cached_ollama):
+    stop_event = threading.Event()
+    messages = [{"role": "user", "content": "a b c d e"}]
+    stream = model.stream_chat(messages, "test-model", stop_event=stop_event)
+    next(stream)
+    stop_event.set()
+    list(stream)
+    assert response_cache.get_cache().stats().entries == 0
+
+
+def test_interactive_session_ask_uses_cache(cached_ollama, tmp_path):
+    first = LLMInteractiveSession("test-model", persist=False)
+    second = LLMInteractiveSession("test-model", persist=False)
+    first.system_prompt = second.system_prompt = "be brief"
+    assert first.ask("hello") == second.ask("hello")
+    assert first.last_cache_saving is None
+    assert second.last_cache_saving is not None
+    assert len(cached_ollama.requests) == 1
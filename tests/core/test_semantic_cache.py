@@ -0,0 +1,140 @@
+import pytest
+from core import model, semantic_cache
+from core.embeddings import HashingEmbedder, OllamaEmbedder
+from core.semantic_cache import SemanticCache, context_fingerprint
+
+pytest.importorskip("numpy")
+
+QUESTION = "what does the parse function in this file do"
+PARAPHRASE = "what does the parse function do in this file"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticCache(HashingEmbedder(), threshold=0.8, db_path=str(tmp_path / "cache.db"))
+
+
+@pytest.fixture
+def semantic_ollama(fake_ollama, cache, monkeypatch):
+    monkeypatch.setenv("CODEZ_SEMANTIC_CACHE", "1")
+    semantic_cache.set_cache(cache)
+    try:
+        yield fake_ollama
+    finally:
+        semantic_cache.set_cache(None)
+
+
+def test_hashing_embedder_is_deterministic_and_normalised():
+    embedder = HashingEmbedder(dim=64)
+    vector = embedder.embed(QUESTION)
+    assert vector == embedder.embed(QUESTION)
+    assert abs(sum(v * v for v in vector) - 1.0) < 1e-9
+
+
+def test_fingerprint_ignores_question_wording_only():
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": f"File content:\nx = 1\n\n{QUESTION}"}]
+    reworded = messages[:1] + [{"role": "user", "content": f"File content:\nx = 1\n\n{PARAPHRASE}"}]
+    other_file = messages[:1] + [{"role": "user", "content": f"File content:\nx = 2\n\n{QUESTION}"}]
+    fp = context_fingerprint("m", messages, QUESTION)
+    assert fp == context_fingerprint("m", reworded, PARAPHRASE)
+    assert fp != context_fingerprint("m", other_file, QUESTION)
+    assert fp != context_fingerprint("other", messages, QUESTION)
+    assert fp != context_fingerprint("m", [{"role": "system", "content": "other"}] + messages[1:], QUESTION)
+
+
+def test_fingerprint_follows_the_latest_exchange():
+    def chat(*history):
+        turns = []
+        for user, answer in history:
+            turns += [{"role": "user", "content": user}, {"role": "assistant", "content": answer}]
+        return [{"role": "system", "content": "sys"}] + turns + [{"role": "user", "content": "why?"}]
+
+    parser_chat = context_fingerprint("m", chat(("what does parse do", "it reads tokens")), "why?")
+    cache_chat = context_fingerprint("m", chat(("is the cache on", "no, it is off")), "why?")
+    assert parser_chat != cache_chat
+    # Older history does not matter once the latest exchange is the same
+    longer = chat(("hi", "hello"), ("what does parse do", "it reads tokens"))
+    assert context_fingerprint("m", longer, "why?") == parser_chat
+
+
+def test_matrix_grows_geometrically():
+    cache = SemanticCache(HashingEmbedder(), threshold=0.8, max_entries=150)
+    capacities = []
+    for i in range(200):
+        cache.put(f"question number {i}", "fp", f"answer {i}", 0.1)
+        if cache._matrix.shape[0] not in capacities:
+            capacities.append(cache._matrix.shape[0])
+    assert capacities == [64, 128, 256]
+    assert cache.stats().entries == 150 and cache._entries[0]["response"] == "answer 50"
+    assert cache.lookup("question number 199", "fp").response == "answer 199"
+
+
+def test_config_choice_is_read_once(monkeypatch):
+    monkeypatch.delenv("CODEZ_SEMANTIC_CACHE", raising=False)
+    monkeypatch.setattr(semantic_cache, "_config_enabled", None)
+    loads = []
+    monkeypatch.setattr(semantic_cache, "_load_config_value", lambda key: loads.append(key))
+    monkeypatch.setattr(semantic_cache, "_save_config_value", lambda key, value: None)
+    assert not semantic_cache.is_enabled() and not semantic_cache.is_enabled()
+    semantic_cache.set_enabled(True)
+    assert semantic_cache.is_enabled() and loads == ["semantic_cache"]
+
+
+def test_lookup_returns_top_match_above_threshold(cache):
+    cache.put(QUESTION, "fp", "it parses", 1.5)
+    cache.put("how do I install the package", "fp", "pip install", 1.0)
+    hit = cache.lookup(PARAPHRASE, "fp")
+    assert hit.response == "it parses" and hit.question == QUESTION and hit.similarity >= 0.8
+    assert cache.lookup("tell me a joke about cats", "fp") is None
+    # Same question against a different context never matches
+    assert cache.lookup(QUESTION, "other-fp") is None
+    stats = cache.stats()
+    assert (stats.entries, stats.lookups, stats.hits) == (2, 3, 1)
+
+
+def test_false_hit_drops_entry(cache):
+    cache.put(QUESTION, "fp", "it parses", 1.5)
+    assert cache.mark_false_hit() is False
+    cache.lookup(PARAPHRASE, "fp")
+    assert cache.mark_false_hit() is True
+    assert cache.lookup(PARAPHRASE, "fp") is None
+    stats = cache.stats()
+    assert stats.false_hits == 1 and stats.false_hit_rate == 1.0
+
+
+def test_entries_persist_and_are_bounded(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SemanticCache(HashingEmbedder(), threshold=0.8, max_entries=2, db_path=path)
+    for i, question in enumerate(["alpha beta", "gamma delta", "epsilon zeta"]):
+        cache.put(question, "fp", f"answer {i}", 0.1)
+    assert cache.stats().entries == 2
+    reopened = SemanticCache(HashingEmbedder(), threshold=0.8, max_entries=2, db_path=path)
+    assert reopened.lookup("alpha beta", "fp") is None
+    assert reopened.lookup("epsilon zeta", "fp").response == "answer 2"
+
+
+def test_ollama_embedder_uses_embed_endpoint(fake_ollama):
+    vector = OllamaEmbedder(model="embed-model").embed("hello")
+    assert vector == HashingEmbedder().embed("hello")
+    assert fake_ollama.requests[-1] == ("/api/embed", {"model": "embed-model", "input": ["hello"]})
+
+
+def test_paraphrase_is_answered_from_cache(semantic_ollama):
+    prefix = "File content:\nx = 1\n\n"
+    first = model.query_ollama(prefix + QUESTION, "test-model", question=QUESTION)
+    stats = {}
+    second = model.query_ollama(prefix + PARAPHRASE, "test-model", question=PARAPHRASE, stats=stats)
+    assert second == first
+    assert stats["cache_hit"] and stats["cached_question"] == QUESTION
+    assert [path for path, _ in semantic_ollama.requests].count("/api/generate") == 1
+
+
+def test_embedding_failure_falls_back_to_model(semantic_ollama):
+    class Broken:
+        name = "broken"
+
+        def embed(self, text):
+            raise RuntimeError("no embedding model")
+
+    semantic_cache.set_cache(SemanticCache(Broken()))
+    assert model.query_ollama(QUESTION, "test-model", question=QUESTION) == f"echo: {QUESTION}"
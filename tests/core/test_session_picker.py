@@ -0,0 +1,28 @@
+from core import repl
+from core.sqlite_memory import SQLiteSessionMemory
+
+
+def test_select_session_pages_through_catalog(tmp_path, monkeypatch):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), token_estimator=lambda text: 1)
+    ids = []
+    for i in range(12):
+        memory.new_session()
+        memory.add_turn(f"question {i}", "a")
+        ids.append(memory.session_id)
+    answers = iter(["n", "1"])
+    prompts = []
+
+    def ask(prompt, choices, **kwargs):
+        prompts.append(choices)
+        return next(answers)
+    monkeypatch.setattr(repl.Prompt, "ask", ask)
+    monkeypatch.setattr(repl.console, "print", lambda *a, **k: None)
+    # Newest first: page two holds the two oldest sessions
+    assert repl.select_session(memory, page_size=10) == ids[0]
+    assert "n" in prompts[0] and "p" not in prompts[0]
+    assert prompts[1] == ["0", "1", "q", "p"]
+
+
+def test_select_session_returns_none_without_matches(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"))
+    assert repl.select_session(memory, search="nothing") is None
@@ -0,0 +1,220 @@
+import random
+import sqlite3
+import pytest
+from core.llm_interactive import InMemorySessionMemory
+from core.sqlite_memory import SQLiteSessionMemory
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def test_window_matches_in_memory_policy(tmp_path):
+    rng = random.Random(7)
+    sqlite_memory = SQLiteSessionMemory(str(tmp_path / "m.db"), max_token_budget=60, token_estimator=word_count)
+    in_memory = InMemorySessionMemory(max_token_budget=60, token_estimator=word_count)
+    for i in range(200):
+        response = " ".join(["w"] * rng.choice([1, 5, 20, 70]))
+        for memory in (sqlite_memory, in_memory):
+            memory.add_turn(f"q{i}", response)
+        assert sqlite_memory.get_context_turns() == in_memory.get_context_turns()
+
+
+def test_window_reads_only_window_rows(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), max_token_budget=40, token_estimator=word_count)
+    for i in range(1000):
+        memory.add_turn(f"q{i}", f"a{i}")
+    statements = []
+    memory._conn.set_trace_callback(statements.append)
+    turns = memory.get_context_turns()
+    assert turns[-1] == {"user": "q999", "response": "a999"}
+    assert len(turns) * 4 <= 40
+    reads = [s for s in statements if s.startswith("SELECT user, response FROM turns")]
+    assert reads and all("AND id >=" in s for s in reads)
+
+
+def test_recount_after_counter_switch(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    memory = SQLiteSessionMemory(db_path, max_token_budget=1000, token_estimator=word_count)
+    memory.add_turn("one two", "three")
+
+    def doubled(text):
+        return 2 * len(text.split())
+    doubled.name = "doubled"
+    SQLiteSessionMemory(db_path, max_token_budget=1000, token_estimator=doubled)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT tokens, cum_tokens FROM turns').fetchone() == (10, 10)
+
+
+def count_rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM turns').fetchone()[0]
+
+
+def test_connection_runs_in_wal_mode(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"))
+    assert memory._conn.execute('PRAGMA journal_mode').fetchone()[0] == "wal"
+    memory.close()
+
+
+def test_group_commit(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count, batch_size=3, commit_interval=60)
+    memory.add_turn("q1", "a1")
+    memory.add_turn("q2", "a2")
+    # Pending writes are visible to the memory itself but not yet committed
+    assert len(memory.get_context_turns()) == 2
+    assert count_rows(db_path) == 0
+    memory.add_turn("q3", "a3")
+    assert count_rows(db_path) == 3
+    memory.add_turn("q4", "a4")
+    memory.close()
+    assert count_rows(db_path) == 4
+
+
+def test_failed_write_keeps_the_rest_of_the_group(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count, batch_size=10, commit_interval=60)
+    with pytest.raises(TypeError):
+        memory.add_turn("q0", "a0", meta={"unserializable": object()})
+    # The session created by the undone write is gone with it
+    assert memory.session_id is None
+    memory.add_turn("q1", "a1")
+    with pytest.raises(TypeError):
+        memory.add_turn("q2", "a2", meta={"unserializable": object()})
+    memory.add_turn("q3", "a3")
+    memory.close()
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT user, cum_tokens FROM turns').fetchall() == [("q1", 4), ("q3", 8)]
+        assert conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] == 1
+
+
+def test_batch_commits_once(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count)
+    with memory.batch():
+        for i in range(10):
+            memory.add_turn(f"q{i}", f"a{i}")
+        assert count_rows(db_path) == 0
+    assert count_rows(db_path) == 10
+
+
+def test_shared_between_threads(tmp_path):
+    import threading
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), max_token_budget=50, token_estimator=word_count)
+    errors = []
+
+    def writer():
+        try:
+            for i in range(200):
+                memory.add_turn(f"q{i}", f"a{i}")
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while thread.is_alive():
+        memory.get_context_turns()
+    thread.join()
+    assert not errors
+    assert memory.get_context_turns()[-1] == {"user": "q199", "response": "a199"}
+
+
+def test_turns_are_scoped_to_the_active_session(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), token_estimator=word_count, project_root="/a", model="m1")
+    memory.add_turn("first question", "a1")
+    first = memory.session_id
+    memory.new_session()
+    assert memory.get_context_turns() == []
+    memory.add_turn("second question", "a2", meta={"file": "x.py"})
+    second = memory.session_id
+    assert second != first
+    assert memory.get_context() == [{"user": "second question", "response": "a2"}]
+    info = memory.switch_session(first)
+    assert (info.title, info.project_root, info.model, info.turn_count) == ("first question", "/a", "m1", 1)
+    assert memory.get_context_turns() == [{"user": "first question", "response": "a1"}]
+    memory.clear()
+    assert memory.get_session(first) is None
+    assert [s.id for s in memory.list_sessions()] == [second]
+
+
+def test_resumes_latest_session_for_project(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count, project_root="/a")
+    memory.add_turn("q", "in a")
+    memory.close()
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count, project_root="/b")
+    memory.add_turn("q", "in b")
+    memory.close()
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count, project_root="/a")
+    assert memory.get_context_turns() == [{"user": "q", "response": "in a"}]
+    assert [s.project_root for s in memory.list_sessions()] == ["/b", "/a"]
+    assert [s.project_root for s in memory.list_sessions("/a")] == ["/a"]
+    fresh = SQLiteSessionMemory(db_path, token_estimator=word_count, project_root="/c")
+    assert fresh.session_id is None and fresh.get_context_turns() == []
+
+
+def test_import_json_sessions_once(tmp_path):
+    import json
+    session_dir = tmp_path / "sessions"
+    session_dir.mkdir()
+    (session_dir / "session_1.json").write_text(json.dumps([
+        {"user": "old q", "response": "old a"},
+        {"user": "file q", "response": "file a", "file": "/x.py", "cancelled": False},
+    ]))
+    (session_dir / "session_2.json").write_text("not json")
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), token_estimator=word_count)
+    assert memory.import_json_sessions(str(session_dir)) == 1
+    assert memory.import_json_sessions(str(session_dir)) == 0
+    (info,) = memory.list_sessions()
+    assert (info.title, info.turn_count) == ("old q", 2)
+    memory.switch_session(info.id)
+    assert memory.get_context()[1] == {"user": "file q", "response": "file a"}
+    with sqlite3.connect(memory.db_path) as conn:
+        assert json.loads(conn.execute('SELECT meta FROM turns ORDER BY id DESC').fetchone()[0])["file"] == "/x.py"
+
+
+def test_migrates_global_session_table(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE session (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT NOT NULL, '
+                     'response TEXT NOT NULL, tokens INTEGER, cum_tokens INTEGER)')
+        conn.execute('CREATE TABLE session_state (key TEXT PRIMARY KEY, value TEXT)')
+        conn.executemany('INSERT INTO session (id, user, response) VALUES (?, ?, ?)',
+                         [(i, f"q{i}", f"a{i}") for i in range(10, 15)])
+        conn.execute("INSERT INTO session_state VALUES ('window_start_id', '13')")
+    memory = SQLiteSessionMemory(db_path, token_estimator=word_count)
+    assert memory.get_context_turns() == [{"user": "q13", "response": "a13"}, {"user": "q14", "response": "a14"}]
+    assert memory.get_session().turn_count == 5
+    with sqlite3.connect(db_path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "session" not in tables and "session_state" not in tables
+
+
+def test_session_catalog_paging_and_search(tmp_path):
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), token_estimator=word_count)
+    for i in range(25):
+        memory.new_session()
+        memory.add_turn(f"{'parser' if i % 5 == 0 else 'other'} question {i}", "a")
+    assert memory.count_sessions() == 25
+    first, second, last = (memory.list_sessions(limit=10, offset=o) for o in (0, 10, 20))
+    assert [len(p) for p in (first, second, last)] == [10, 10, 5]
+    assert first[0].title == "other question 24"
+    assert {s.id for s in first} & {s.id for s in second} == set()
+    assert memory.count_sessions(search="PARSER") == 5
+    assert [s.title for s in memory.list_sessions(search="parser", limit=2)] == ["parser question 20",
+                                                                              "parser question 15"]
+
+
+def test_import_skips_known_files_without_reading_them(tmp_path, monkeypatch):
+    import json
+    session_dir = tmp_path / "sessions"
+    session_dir.mkdir()
+    (session_dir / "session_1.json").write_text(json.dumps([{"user": "q", "response": "a"}]))
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), token_estimator=word_count)
+    assert memory.import_json_sessions(str(session_dir)) == 1
+
+    def no_stat(path):
+        raise AssertionError(f"stat'ed {path}")
+    monkeypatch.setattr("os.path.getmtime", no_stat)
+    assert memory.import_json_sessions(str(session_dir)) == 0
@@ -0,0 +1,50 @@
+import threading
+import time
+from core import model
+from core.startup import StartupTimeline
+
+
+def test_background_phases_overlap_foreground_work():
+    timeline = StartupTimeline()
+    release = threading.Event()
+    future = timeline.run_in_background("slow", lambda: release.wait(1.0) and "done")
+    with timeline.phase("banner"):
+        time.sleep(0.05)
+        release.set()
+    assert future.result(timeout=1.0) == "done"
+    phases = {p.name: p for p in timeline.phases}
+    assert phases["slow"].thread == "codez-slow"
+    assert phases["slow"].start <= phases["banner"].end
+    assert phases["banner"].start < phases["slow"].end
+
+
+def test_background_exception_is_delivered_through_future():
+    timeline = StartupTimeline()
+    future = timeline.run_in_background("boom", lambda: 1 / 0)
+    assert isinstance(future.exception(timeout=1.0), ZeroDivisionError)
+    assert timeline.phases[0].end is not None
+
+
+def test_render_marks_unfinished_phases():
+    from rich.console import Console
+    timeline = StartupTimeline()
+    timeline.mark("prompt ready")
+    timeline.run_in_background("stuck", threading.Event().wait)
+    console = Console(width=120, record=True)
+    console.print(timeline.render())
+    text = console.export_text()
+    assert "prompt ready" in text and "running" in text
+
+
+def test_preload_model_sends_load_request(fake_ollama):
+    assert model.preload_model("test-model") is True
+    path, payload = fake_ollama.requests[-1]
+    assert path == "/api/generate"
+    assert "prompt" not in payload and payload["keep_alive"]
+
+
+def test_get_ollama_models_non_interactive_does_not_prompt(fake_ollama, monkeypatch):
+    fake_ollama.models = []
+    monkeypatch.setattr("builtins.input", lambda *a: (_ for _ in ()).throw(AssertionError("prompted")))
+    monkeypatch.setattr(model.subprocess, "run", lambda *a, **k: type("R", (), {"returncode": 0, "stdout": "NAME\n"})())
+    assert model.get_ollama_models(interactive=False) == ([], None)
@@ -0,0 +1,99 @@
+import io
+from rich.console import Console
+from core.stream_utils import FrameWriter, split_settled, stream_markdown, stream_response
+
+
+def test_split_settled_stops_at_paragraph_break():
+    settled, pending = split_settled("First para.\n\nSecond, still gro")
+    assert settled == "First para.\n\n"
+    assert pending == "Second, still gro"
+
+
+def test_split_settled_keeps_open_code_fence_pending():
+    text = "Intro\n\n```python\ndef f():\n\n    return 1\n"
+    settled, pending = split_settled(text)
+    assert settled == "Intro\n\n"
+    assert pending.startswith("```python")
+
+
+def test_split_settled_after_closing_fence():
+    settled, pending = split_settled("```\ncode\n```\nmore")
+    assert settled == "```\ncode\n```\n"
+    assert pending == "more"
+
+
+def test_stream_markdown_returns_raw_text_and_renders_visible_text():
+    out = io.StringIO()
+    console = Console(file=out, width=80)
+    chunks = ["<think>hidden", " reasoning</think>", "Hello ", "world.\n\n", "Bye."]
+    text = stream_markdown(chunks, console, transform=lambda t: t.replace("<think>hidden reasoning</think>", ""))
+    assert text == "".join(chunks)
+    rendered = out.getvalue()
+    assert "Hello world." in rendered and "Bye." in rendered
+    assert "reasoning" not in rendered
+
+
+def test_stream_markdown_writes_plain_frames_when_not_a_terminal():
+    out = CountingFile()
+    stats = {}
+    chunks = ["# Title\n", "\n", "Some ", "**bold** text.\n\n", "```py\nx = 1\n", "```\n", "Bye."]
+    text = stream_markdown(chunks, Console(file=out, width=80), stats=stats)
+    assert text == "".join(chunks)
+    assert out.getvalue() == text + "\n"  # unrendered markdown, no escape codes
+    assert stats["stream"].chars == len(text) + 1 and stats["stream"].frames == out.writes == 4
+
+    out = io.StringIO()
+    stream_markdown(chunks, Console(file=out, force_terminal=True, width=80), stats=stats)
+    assert "\x1b[" in out.getvalue() and "**bold**" not in out.getvalue()
+    assert stats["stream"].chars == len(text) and stats["stream"].frames >= 2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFile(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_frame_writer_coalesces_until_newline_or_frame_interval():
+    out = CountingFile()
+    clock = FakeClock()
+    writer = FrameWriter(Console(file=out, width=80), fps=10, clock=clock)
+    writer.write("a")  # the first character is drawn at once
+    for char in "bcdef":
+        writer.write(char)
+    assert out.getvalue() == "a"
+    clock.now = 0.1
+    writer.write("g")
+    assert out.getvalue() == "abcdefg"
+    writer.write("h\ni")
+    assert out.getvalue() == "abcdefgh\ni"
+    writer.write("j")
+    writer.flush()
+    assert out.getvalue() == "abcdefgh\nij"
+    stats = writer.stats()
+    assert (stats.chars, stats.frames) == (11, 4)
+    assert stats.frames_per_second == 40 and stats.chars_per_second == 110
+
+
+def test_styled_frames_on_a_terminal_and_plain_text_otherwise():
+    out = io.StringIO()
+    with FrameWriter(Console(file=out, force_terminal=True, width=80), style="grey70") as writer:
+        writer.write("[not markup]\n")
+    assert "\x1b[" in out.getvalue() and "[not markup]" in out.getvalue()
+
+    out = CountingFile()
+    stats = stream_response("x" * 500 + "\ny", Console(file=out, width=80), delay=0)
+    assert out.getvalue() == "x" * 500 + "\ny\n"
+    assert out.writes == stats.frames == 1
@@ -0,0 +1,155 @@
+import threading
+from core.llm_interactive import LLMInteractiveSession
+from core.summarizer import RollingSummarizer
+
+
+def word_count(text):
+    return len(text.split())
+
+
+class FakeSummarize:
+    """Summarizes turns as their questions and merged summaries as "first-last", so results are checkable."""
+    def __init__(self, gate=None):
+        self.calls = 0
+        self.gate = gate
+
+    def __call__(self, text, max_tokens, stop_event=None):
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls += 1
+        if text.startswith("User: "):
+            return " ".join(line.split()[1] for line in text.splitlines() if line.startswith("User: "))
+        words = text.replace("-", " ").split()
+        return f"{words[0]}-{words[-1]}"
+
+
+def make_session(tmp_path=None, max_tokens=40, summarize=None, **kwargs):
+    if tmp_path is None:
+        session = LLMInteractiveSession("test-model", persist=False, max_token_budget=20, token_estimator=word_count)
+    else:
+        session = LLMInteractiveSession("test-model", db_path=str(tmp_path / "m.db"), max_token_budget=20,
+                                        token_estimator=word_count, **kwargs)
+    session.summarizer = RollingSummarizer(summarize or FakeSummarize(), word_count, session.memory, max_tokens=max_tokens)
+    return session
+
+
+def run_turns(session, start, stop):
+    for i in range(start, stop):
+        with session.generating():
+            session.build_messages(f"q{i}")
+        session.memory.add_turn(f"q{i}", f"a{i} " * 3)
+    with session.generating():
+        session.build_messages("next")
+    session.summarizer.wait()
+
+
+def test_evicted_turns_are_summarized_into_the_prompt():
+    session = make_session()
+    run_turns(session, 0, 12)
+    blocks = session.summarizer.blocks
+    assert blocks and blocks[0].first_id == 1
+    assert blocks[-1].last_id == session.memory.window_start_id - 1
+    assert all(a.last_id < b.first_id for a, b in zip(blocks, blocks[1:]))
+    system = session.build_messages("again")[0]["content"]
+    assert "Summary of the earlier conversation:\nq0 q1" in system
+
+
+def test_summary_stays_within_allowance_by_merging():
+    session = make_session(max_tokens=6)
+    run_turns(session, 0, 60)
+    blocks = session.summarizer.blocks
+    assert sum(b.tokens for b in blocks) <= 6
+    assert blocks[0].level > 0
+    assert blocks[0].first_id == 1 and session.summarizer.render().startswith("q0-")
+
+
+def test_build_messages_does_not_wait_for_the_summary():
+    gate = threading.Event()
+    session = make_session(summarize=FakeSummarize(gate))
+    for i in range(12):
+        with session.generating():
+            session.build_messages(f"q{i}")
+        session.memory.add_turn(f"q{i}", f"a{i} " * 3)
+    with session.generating():
+        messages = session.build_messages("next")
+    assert "Summary" not in messages[0]["content"]
+    gate.set()
+    session.summarizer.wait()
+    assert "Summary" in session.build_messages("next")[0]["content"]
+
+
+def test_summaries_are_cached_per_session(tmp_path):
+    first = make_session(tmp_path)
+    run_turns(first, 0, 12)
+    expected = first.summarizer.blocks
+    first.close()
+    summarize = FakeSummarize()
+    resumed = make_session(tmp_path, summarize=summarize)
+    assert resumed.summarizer.blocks == expected
+    with resumed.generating():
+        resumed.build_messages("next")
+    resumed.summarizer.wait()
+    assert summarize.calls == 0
+    resumed.new_session()
+    assert resumed.summarizer.blocks == []
+    assert "Summary" not in resumed.build_messages("fresh")[0]["content"]
+
+
+class InterruptibleSummarize(FakeSummarize):
+    """Blocks like a slow model until released or stopped; a stopped call returns partial text."""
+    def __init__(self):
+        super().__init__(threading.Event())
+        self.started = threading.Event()
+        self.stopped = threading.Event()
+
+    def __call__(self, text, max_tokens, stop_event=None):
+        self.started.set()
+        while not self.gate.is_set() and not stop_event.is_set():
+            self.gate.wait(0.01)
+        if stop_event.is_set():
+            self.stopped.set()
+            return "partial"
+        return super().__call__(text, max_tokens, stop_event)
+
+
+def test_summaries_only_run_between_requests_and_are_aborted_by_the_next():
+    summarize = InterruptibleSummarize()
+    session = make_session(summarize=summarize)
+    for i in range(12):
+        with session.generating():
+            session.build_messages(f"q{i}")
+            session.memory.add_turn(f"q{i}", f"a{i} " * 3)
+            assert not summarize.started.is_set()  # held while a request is in flight
+    assert summarize.started.wait(5)
+    with session.generating():
+        session.build_messages("next")
+        # The next request aborts the summary in progress; its partial text is not kept
+        assert summarize.stopped.wait(5)
+        summarize.gate.set()
+        assert summarize.calls == 0 and session.summarizer.blocks == []
+    # The range is summarized again once the reply is done
+    session.summarizer.wait()
+    assert session.summarizer.blocks and "partial" not in session.summarizer.render()
+
+
+def test_close_stops_the_worker_before_the_memory_closes(tmp_path):
+    summarize = InterruptibleSummarize()
+    session = make_session(tmp_path, summarize=summarize)
+    for i in range(12):
+        session.build_messages(f"q{i}")
+        session.memory.add_turn(f"q{i}", f"a{i} " * 3)
+    session.summarizer.resume()
+    assert summarize.started.wait(5)
+    worker = session.summarizer._worker
+    session.close()
+    assert not worker.is_alive()
+    assert summarize.calls == 0
+
+
+def test_summaries_are_opt_in(monkeypatch):
+    monkeypatch.delenv("CODEZ_SUMMARY_TOKENS", raising=False)
+    assert LLMInteractiveSession("test-model", persist=False).summarizer is None
+    monkeypatch.setenv("CODEZ_SUMMARY_TOKENS", "300")
+    session = LLMInteractiveSession("test-model", persist=False)
+    assert session.summarizer.max_tokens == 300
+    session.close()
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import pytest
+from core import parser
+from core.symbol_index import SymbolIndex, walk_repository
+
+needs_python_grammar = pytest.mark.skipif(not parser.grammar_available("python"),
+                                          reason="python grammar not built (build_grammars.sh)")
+
+
+def write(root, path, text):
+    full = root / path
+    full.parent.mkdir(parents=True, exist_ok=True)
+    full.write_text(text, encoding="utf-8")
+
+
+def test_walk_honours_gitignore_without_git(tmp_path):
+    write(tmp_path, ".gitignore", "generated/\n*_pb2.py\n/local.py\n!keep_pb2.py\n")
+    for path in ["app/main.py", "app/api_pb2.py", "app/keep_pb2.py", "generated/x.py", "local.py",
+                 "app/local.py", "node_modules/lib.js", "README.md"]:
+        write(tmp_path, path, "")
+    assert walk_repository(str(tmp_path)) == ["app/keep_pb2.py", "app/local.py", "app/main.py"]
+
+
+def test_walk_uses_git_when_available(tmp_path):
+    try:
+        subprocess.run(["git", "init", "-q", str(tmp_path)], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git not available")
+    write(tmp_path, ".gitignore", "out/\n")
+    write(tmp_path, "src/a.py", "")
+    write(tmp_path, "out/b.py", "")
+    assert walk_repository(str(tmp_path)) == ["src/a.py"]
+
+
+def test_languages_without_grammar_are_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser, "grammar_available", lambda language: False)
+    write(tmp_path, "main.go", "package main\n")
+    index = SymbolIndex(str(tmp_path), db_path=str(tmp_path / "index.db"))
+    stats = index.update(workers=1)
+    assert stats.missing_grammars == ("go",) and stats.files == 0
+
+
+@needs_python_grammar
+def test_incremental_update_and_lookup(tmp_path):
+    repo = tmp_path / "repo"
+    write(repo, "pkg/util.py", "def load(path):\n    return open(path).read()\n\n\nclass Store:\n    def save(self):\n        pass\n")
+    write(repo, "pkg/other.py", "def helper():\n    pass\n")
+    index = SymbolIndex(str(repo), db_path=str(tmp_path / "index.db"))
+    stats = index.update(workers=1)
+    assert (stats.files, stats.parsed, stats.symbols) == (2, 2, 4)
+
+    load = index.find("load")[0]
+    assert (load.path, load.kind, load.start_line, load.end_line) == ("pkg/util.py", "function", 1, 2)
+    assert index.source(load) == "def load(path):\n    return open(path).read()"
+    assert [(s.name, s.kind) for s in index.find("sav")] == [("save", "method")]
+
+    # Touched but identical: not re-parsed; edited: re-parsed; deleted: dropped
+    os.utime(repo / "pkg/other.py", ns=(1, 1))
+    write(repo, "pkg/util.py", "# ünïcode\ndef load(path, mode='r'):\n    pass\n")
+    stats = index.update(workers=1)
+    assert (stats.parsed, stats.unchanged, stats.symbols) == (1, 1, 2)
+    assert index.source(index.find("load")[0]) == "def load(path, mode='r'):\n    pass"
+    (repo / "pkg/other.py").unlink()
+    stats = index.update(workers=1)
+    assert (stats.removed, stats.symbols) == (1, 1)
+
+
+@needs_python_grammar
+def test_stale_source_is_refused(tmp_path):
+    write(tmp_path, "a.py", "def f():\n    pass\n")
+    index = SymbolIndex(str(tmp_path), db_path=str(tmp_path / "index.db"))
+    index.update(workers=1)
+    symbol = index.find("f")[0]
+    write(tmp_path, "a.py", "x = 1\ndef f():\n    pass\n")
+    with pytest.raises(LookupError):
+        index.source(symbol)
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import pytest
+from core.llm_interactive import InMemorySessionMemory, LLMInteractiveSession
+from core.sqlite_memory import SQLiteSessionMemory
+from core.tokenizer import (CachedCounter, HeuristicCounter, find_tokenizer_file,
+                            get_token_counter)
+
+CODE = "def getUserName(self, user_id):\n    return self._users[user_id].name.strip()\n"
+
+
+class CountingCounter:
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return len(text.split())
+
+
+def test_heuristic_counts_code_symbols():
+    counter = HeuristicCounter()
+    # Word-based estimates see ~10 "words" here; BPE tokenizers produce ~25 tokens
+    assert counter(CODE) >= 20
+    assert counter("hello world") == 2
+    assert counter("") == 0
+
+
+def test_calibration_moves_scale_towards_server_counts():
+    counter = HeuristicCounter()
+    estimated = counter(CODE)
+    for _ in range(20):
+        counter.calibrate(counter(CODE), int(estimated * 1.5))
+    assert counter(CODE) == pytest.approx(estimated * 1.5, rel=0.05)
+
+
+def test_calibrated_scale_is_part_of_the_name():
+    counter = CachedCounter(HeuristicCounter())
+    assert counter.name == "heuristic"
+    counter.calibrate(counter(CODE), counter(CODE) * 2)
+    assert counter.name == "heuristic@1.20" and counter.counter.scale == 1.2
+
+
+def test_first_request_calibrates_and_recounts_stored_turns(tmp_path):
+    counter = CachedCounter(HeuristicCounter())
+    session = LLMInteractiveSession("test-model", db_path=str(tmp_path / "m.db"), token_estimator=counter)
+    for i in range(3):
+        session.memory.add_turn(f"question {i}", f"answer {i} " * 5)
+    messages = session.build_messages("next")
+    estimate = sum(counter(m["content"]) for m in messages)
+
+    # Fewer tokens than estimated: possibly a warm KV cache, so no calibration
+    session.record_stats(messages, {"prompt_eval_count": estimate // 2})
+    assert counter.name == "heuristic"
+
+    session.new_session()
+    for i in range(3):
+        session.memory.add_turn(f"question {i}", f"answer {i} " * 5)
+    session.record_stats(messages, {"prompt_eval_count": estimate * 2})
+    assert counter.name != "heuristic"
+    rows = session.memory._conn.execute(
+        'SELECT user, response, tokens, cum_tokens FROM turns WHERE session_id = ? ORDER BY id',
+        (session.memory.session_id,)).fetchall()
+    expected = [counter(f"User: {user}\nModel: {response}\n") for user, response, _, _ in rows]
+    assert [row[2] for row in rows] == expected
+    assert rows[-1][3] == sum(expected)
+    session.close()
+
+
+def test_cached_counter_memoizes_by_text():
+    inner = CountingCounter()
+    counter = CachedCounter(inner, max_entries=2)
+    assert counter("a b") == counter("a b") == 2
+    assert inner.calls == 1
+    counter("c")
+    counter("d")
+    counter("a b")
+    assert inner.calls == 4
+
+
+def test_get_token_counter_falls_back_to_heuristic(monkeypatch):
+    monkeypatch.delenv("CODEZ_TOKENIZER_DIR", raising=False)
+    counter = get_token_counter("no-such-model:7b")
+    assert counter.name == "heuristic"
+    assert get_token_counter("no-such-model:7b") is counter
+
+
+def test_find_tokenizer_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODEZ_TOKENIZER_DIR", str(tmp_path))
+    os.makedirs(tmp_path / "qwen2.5-coder")
+    (tmp_path / "qwen2.5-coder" / "tokenizer.json").write_text("{}")
+    assert find_tokenizer_file("qwen2.5-coder:1.5b-instruct") == str(tmp_path / "qwen2.5-coder" / "tokenizer.json")
+    assert find_tokenizer_file("llama3") is None
+
+
+def test_sqlite_memory_counts_each_turn_once(tmp_path):
+    counter = CountingCounter()
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"), max_token_budget=1000, token_estimator=counter)
+    for i in range(5):
+        memory.add_turn(f"q{i}", f"a{i}")
+    assert counter.calls == 5
+    memory.get_context_prompt()
+    memory.get_context_turns()
+    assert counter.calls == 5
+
+
+def test_sqlite_memory_backfills_legacy_rows(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE session (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT NOT NULL, response TEXT NOT NULL)')
+        conn.execute("INSERT INTO session (user, response) VALUES ('old question', 'old answer')")
+    counter = CountingCounter()
+    memory = SQLiteSessionMemory(db_path, token_estimator=counter)
+    assert memory.get_context_turns() == [{"user": "old question", "response": "old answer"}]
+    memory.get_context_turns()
+    assert counter.calls == 1
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT tokens FROM turns').fetchone()[0] == 6
+
+
+def test_in_memory_counts_each_turn_once():
+    counter = CountingCounter()
+    memory = InMemorySessionMemory(max_token_budget=1000, token_estimator=counter)
+    for i in range(5):
+        memory.add_turn(f"q{i}", f"a{i}")
+        memory.get_context_prompt()
+    assert counter.calls == 5
+
+
+def test_session_counter_follows_model():
+    session = LLMInteractiveSession(model_name="a-model", persist=False)
+    session.memory.add_turn("q", "a")
+    session.model_name = "b-model"
+    assert session.memory.token_estimator is get_token_counter("b-model")
+    assert session.memory.get_context_turns() == [{"user": "q", "response": "a"}]
@@ -0,0 +1,98 @@
+import pytest
+from core.embeddings import HashingEmbedder, OllamaEmbedder
+from core.sqlite_memory import SQLiteSessionMemory
+from core.vector_store import ChunkIndex, VectorStore, code_chunks
+
+np = pytest.importorskip("numpy")
+
+
+def random_vectors(n, dim=32, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def exact_top(vectors, query, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(vectors @ (query / np.linalg.norm(query))))[:k])
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_top_k_matches_exact_search(tmp_path, dtype, monkeypatch):
+    # Small blocks so that the blockwise merge is exercised
+    monkeypatch.setattr("core.vector_store.BLOCK_BYTES", 32 * 4 * 1024)
+    vectors = random_vectors(5000)
+    store = VectorStore(str(tmp_path), dim=32, dtype=dtype)
+    store.add(range(5000), vectors)
+    queries = vectors[[3, 1200, 4999]] + 0.01
+    for query, hits in zip(queries, store.search_batch(queries, k=5)):
+        assert [h.id for h in hits][:3] == exact_top(vectors, query, 3)
+        assert hits[0].score == pytest.approx(1.0, abs=0.02)
+        assert [h.score for h in hits] == sorted((h.score for h in hits), reverse=True)
+
+
+def test_reopen_delete_replace_and_compact(tmp_path):
+    vectors = random_vectors(100)
+    store = VectorStore(str(tmp_path), dim=32, dtype="float16")
+    store.add(range(100), vectors)
+    store.close()
+
+    store = VectorStore(str(tmp_path))
+    assert (len(store), store.dim, store.dtype) == (100, 32, "float16")
+    assert store.delete([5, 6, 1000]) == 2
+    assert store.search(vectors[5], k=1)[0].id != 5
+    # Replacing an id keeps one row for it
+    store.add([7], vectors[50:51])
+    assert [h.id for h in store.search(vectors[50], k=2)] in ([50, 7], [7, 50])
+    assert len(store) == 98
+    # Deleting more than a quarter compacts the files in place
+    store.delete(range(60))
+    assert store._count == len(store) == 40 and store._deleted == 0
+    assert store.search(vectors[80], k=1)[0].id == 80
+    with pytest.raises(ValueError):
+        VectorStore(str(tmp_path), dim=16)
+
+
+def test_chunk_index_is_incremental(tmp_path):
+    index = ChunkIndex(str(tmp_path / "index"), HashingEmbedder())
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"))
+    memory.add_turn("how do I rotate the api keys", "run scripts/rotate_keys.sh")
+    memory.add_turn("what port does the dev server use", "8080")
+    assert index.index_session(memory) == 2
+    assert index.index_session(memory) == 0
+    memory.add_turn("why is the build slow", "the docker cache is cold")
+    assert index.index_session(memory) == 1
+
+    code = "def load_config(path):\n    return read(path)\n\n\ndef save_report(data):\n    write(data)\n"
+    assert index.index_file("app/util.py", code) > 0
+    assert index.index_file("app/util.py", code) == 0
+    hit = index.search("rotate the api keys", k=1)[0]
+    assert hit.source.startswith("session:") and "rotate_keys" in hit.text
+    assert index.search("load config path", k=1, source_prefix="app/")[0].source == "app/util.py"
+
+    index.index_file("app/util.py", "def other():\n    pass\n")
+    assert all("load_config" not in h.text for h in index.search("load config path", k=10))
+
+
+def test_chunk_index_resets_for_another_embedder(tmp_path):
+    index = ChunkIndex(str(tmp_path), HashingEmbedder(dim=64))
+    index.index_file("a.py", "x = 1\n")
+    index.close()
+    index = ChunkIndex(str(tmp_path), HashingEmbedder(dim=32))
+    assert len(index) == 0
+    index.index_file("a.py", "x = 1\n")
+    assert index.search("x", k=1)[0].source == "a.py"
+
+
+def test_code_without_grammar_falls_back_to_line_windows():
+    code = "\n".join(f"line {i}" for i in range(100))
+    chunks = code_chunks("notes.unknown_ext", code)
+    assert [c.ref for c in chunks] == ["1-40", "41-80", "81-100"]
+
+
+def test_ollama_embedder_batches_requests(fake_ollama, tmp_path):
+    index = ChunkIndex(str(tmp_path / "index"), OllamaEmbedder(model="embed-test"))
+    memory = SQLiteSessionMemory(str(tmp_path / "m.db"))
+    for i in range(3):
+        memory.add_turn(f"question {i}", f"answer {i}")
+    index.index_session(memory)
+    embeds = [payload for path, payload in fake_ollama.requests if path == "/api/embed"]
+    assert len(embeds) == 1 and len(embeds[0]["input"]) == 3
@@ -0,0 +1,156 @@
+"""
+Local stand-in for the Ollama REST API, used by tests and benchmarks.
+
+Serves just enough of `/api/tags`, `/api/generate`, `/api/chat` and `/api/embed` to
+exercise the HTTP backend without a real model. Streaming replies are sent
+NDJSON over chunked transfer encoding, one chunk per word, with an optional
+per-chunk delay. `/api/chat` mimics the server's prompt cache: one "token"
+per word, and prompt_eval_count only counts tokens after the prefix shared
+with the previous request.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.embeddings import HashingEmbedder
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_stream(self, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                line = json.dumps(chunk).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-generation: stop, like Ollama frees the slot.
+            self.server.aborted.set()
+            self.close_connection = True
+
+    def do_GET(self):
+        server = self.server
+        server.record(self, None)
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name} for name in server.models]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        server = self.server
+        payload = self._read_json()
+        server.record(self, payload)
+        if self.path == "/api/generate":
+            if payload.get("model") not in server.models:
+                self._send_json({"error": f"model '{payload.get('model')}' not found"}, status=404)
+                return
+            text = server.responder(payload.get("prompt", ""))
+            if payload.get("stream", True):
+                self._send_stream(server.stream_chunks(payload["model"], text, "response"))
+            else:
+                self._send_json({"model": payload["model"], "response": text, "done": True})
+        elif self.path == "/api/chat":
+            messages = payload.get("messages", [])
+            text = server.responder(messages[-1]["content"] if messages else "")
+            counters = {"prompt_eval_count": server.prompt_eval_count(messages), "eval_count": len(text.split())}
+            if payload.get("stream", True):
+                chunks = server.stream_chunks(payload["model"], text, "message")
+                self._send_stream(dict(chunk, **counters) if chunk["done"] else chunk for chunk in chunks)
+            else:
+                reply = {"model": payload["model"], "message": {"role": "assistant", "content": text}, "done": True}
+                self._send_json(dict(reply, **counters))
+        elif self.path == "/api/embed":
+            inputs = payload.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json({"model": payload.get("model"), "embeddings": [server.embedder.embed(text) for text in inputs]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server bound to an ephemeral localhost port.
+    `requests` records (path, payload) for each call and `connections`
+    the set of client ports seen, so tests can assert on keep-alive reuse;
+    `aborted` is set when a client disconnects in the middle of a stream.
+    """
+    daemon_threads = True
+
+    def __init__(self, models=("test-model",), responder=None, chunk_delay=0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.models = list(models)
+        self.responder = responder or (lambda prompt: f"echo: {prompt}")
+        self.chunk_delay = chunk_delay
+        self.embedder = HashingEmbedder()
+        self.requests = []
+        self.connections = set()
+        self.aborted = threading.Event()
+        self._cached_tokens = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stream_chunks(self, model, text, key):
+        for piece in re.findall(r"\S*\s*", text):
+            if not piece:
+                continue
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield {"model": model, key: self._content(key, piece), "done": False}
+        yield {"model": model, key: self._content(key, ""), "done": True}
+
+    @staticmethod
+    def _content(key, text):
+        return {"role": "assistant", "content": text} if key == "message" else text
+
+    def prompt_eval_count(self, messages):
+        tokens = [w for m in messages for w in f"{m['role']}: {m['content']}".split()]
+        with self._lock:
+            previous, self._cached_tokens = self._cached_tokens, tokens
+        shared = 0
+        for a, b in zip(previous, tokens):
+            if a != b:
+                break
+            shared += 1
+        return len(tokens) - shared
+
+    def record(self, handler, payload):
+        with self._lock:
+            self.requests.append((handler.path, payload))
+            self.connections.add(handler.client_address[1])
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -1,7 +1,9 @@
+import os
 import unittest
 from unittest.mock import patch, MagicMock
 from core import model
 
+@patch.dict(os.environ, {"CODEZ_OLLAMA_BACKEND": "subprocess"})
 class TestOllamaModel(unittest.TestCase):
     @patch("core.model.subprocess.run")
     def test_get_ollama_models_with_models(self, mock_run):
@@ -0,0 +1,103 @@
+"""
+Startup-time regression tests, based on `python -X importtime`.
+
+The module checks are the real guard; the millisecond budgets are generous
+so they only trip on a gross regression (e.g. the REPL being imported eagerly).
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HELP_IMPORT_BUDGET_MS = 600
+CHAT_IMPORT_BUDGET_MS = 1200
+CHAT_PROMPT_BUDGET_MS = 3000
+
+
+def import_times(statement):
+    """Run `statement` under -X importtime and return {module: cumulative_ms}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", statement],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(.+)$", line)
+        if match:
+            times[match.group(2).strip()] = int(match.group(1)) / 1000
+    return times
+
+
+def test_help_does_not_import_repl_stack():
+    times = import_times("import codechat.__main__")
+    for heavy in ("core.repl", "core.model", "prompt_toolkit", "httpx", "pyfiglet"):
+        assert heavy not in times, f"`codez --help` imports {heavy}"
+    assert times["codechat.__main__"] < HELP_IMPORT_BUDGET_MS
+
+
+def test_chat_time_to_prompt_imports():
+    times = import_times("import core.repl")
+    # The banner is pre-rendered, httpx loads on the background discovery thread
+    # and markdown/syntax renderers load after the prompt
+    for deferred in ("pyfiglet", "httpx", "rich.markdown", "rich.syntax"):
+        assert deferred not in times, f"`codez chat` imports {deferred} before the first prompt"
+    assert times["core.repl"] < CHAT_IMPORT_BUDGET_MS
+
+
+def test_index_command_does_not_import_repl_stack(tmp_path):
+    (tmp_path / "a.py").write_text("def f():\n    return 1\n")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-m", "codechat", "index", str(tmp_path), "-j", "1"],
+        cwd=str(tmp_path), env=dict(os.environ, PYTHONPATH=PROJECT_ROOT, XDG_CACHE_HOME=str(tmp_path / "cache")),
+        capture_output=True, text=True, check=True,
+    )
+    assert "Indexed 1 files" in result.stdout
+    for heavy in ("core.repl", "core.model", "prompt_toolkit"):
+        assert not re.search(rf"\| {re.escape(heavy)}$", result.stderr, re.M), f"`codez index` imports {heavy}"
+
+
+def test_chat_reaches_prompt(fake_ollama, tmp_path):
+    """Run `codez chat --startup-profile` against the fake server with stdin closed: it stops at the prompt."""
+    config_dir = tmp_path / "config" / "codez"
+    config_dir.mkdir(parents=True)
+    (config_dir / "config.json").write_text(json.dumps({"model": "test-model"}))
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT, CODEZ_OLLAMA_BACKEND="http", OLLAMA_HOST=fake_ollama.url,
+               XDG_CONFIG_HOME=str(tmp_path / "config"), XDG_CACHE_HOME=str(tmp_path / "cache"),
+               XDG_DATA_HOME=str(tmp_path / "data"), CODEZ_SESSION_DIR=str(tmp_path / "sessions"), COLUMNS="120")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "codechat", "chat", "--startup-profile"],
+        cwd=str(tmp_path), env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60,
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert result.returncode == 0, result.stderr
+    assert "Using saved model: test-model" in result.stdout
+    assert (tmp_path / "sessions" / "session_memory.db").exists()
+    match = re.search(r"prompt ready\s*│\s*\S+\s*│\s*(\d+) ms", result.stdout)
+    assert match, result.stdout
+    assert int(match.group(1)) < CHAT_PROMPT_BUDGET_MS
+    # Interpreter start-up, imports, prompt and shutdown together
+    assert elapsed_ms < 3 * CHAT_PROMPT_BUDGET_MS
+
+
+def test_version_is_baked_in():
+    from codechat.version_utils import get_version
+    result = subprocess.run(
+        [sys.executable, "-c", "from codechat.version_utils import get_version; print(get_version())"],
+        cwd=os.path.join(PROJECT_ROOT, "tests"), env=dict(os.environ, PYTHONPATH=PROJECT_ROOT),
+        capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == get_version() != "unknown"
+
+
+def test_build_writes_version_file(tmp_path):
+    subprocess.run(
+        [sys.executable, "setup.py", "-q", "build_py", "--build-lib", str(tmp_path)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    from codechat.version_utils import get_version
+    assert f'__version__ = "{get_version()}"' in (tmp_path / "codechat" / "_version.py").read_text()